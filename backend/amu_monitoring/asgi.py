@@ -12,6 +12,10 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'amu_monitoring.settings')
+# Sync views run on a thread created for each request under ASGI, so a
+# persistent connection would be left open when that thread goes away.
+# Set DB_CONN_MAX_AGE explicitly to override.
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
 
@@ -0,0 +1,47 @@
+"""
+Running independent ORM queries at the same time from async views.
+
+Django's async ORM methods (`aget`, `async for`, ...) all hop onto the one
+thread that owns the request's database connection, so gathering them still
+runs the queries back to back. `run_concurrently` instead runs each callable
+on its own worker thread, which means its own database connection, so the
+queries really do overlap. Worker threads keep their connections between
+calls, subject to CONN_MAX_AGE and CONN_HEALTH_CHECKS like any request thread.
+
+Only use it for independent reads: the callables see separate connections,
+so they don't share a transaction with each other or with the caller.
+"""
+import asyncio
+from functools import partial
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from amu_monitoring.db import release_connections
+
+
+def _on_worker(func):
+    def run():
+        try:
+            return func()
+        finally:
+            # What request_finished does for request threads: drop the
+            # connection if it is past CONN_MAX_AGE or unusable
+            close_old_connections()
+            release_connections()
+    return run
+
+
+async def run_in_worker(func, *args, **kwargs):
+    """
+    Call a blocking function from async code on the shared worker pool.
+
+    Prefer this to a plain sync_to_async for ORM calls: under ASGI the
+    default thread-sensitive mode runs them on a thread made for the current
+    request, whose connection is never reused and, with CONN_MAX_AGE set,
+    never closed either.
+    """
+    return await sync_to_async(_on_worker(partial(func, *args, **kwargs)), thread_sensitive=False)()
+
+
+async def run_concurrently(*funcs):
+    """Call each zero-argument callable on its own thread and return their results in order."""
+    return await asyncio.gather(*(run_in_worker(func) for func in funcs))
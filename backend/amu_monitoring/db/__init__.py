@@ -0,0 +1,98 @@
+"""
+Database connection statistics.
+
+Django 4.2 has no connection pool: each thread holds one connection per
+alias, kept open between requests for CONN_MAX_AGE seconds and re-checked
+before reuse when CONN_HEALTH_CHECKS is on. With persistent connections a
+threaded server's connections behave like a pool of one connection per
+worker thread, and `pool_stats` reports on them the way a pool would:
+
+- open: connections currently held by this process
+- in_use: connections checked out by a request (or worker call) in flight
+- idle: open connections waiting for their thread's next request
+- checkouts / reuses: requests that used the database, and how many of them
+  found a connection already open instead of paying for a new one
+- connect_ms: time spent establishing connections, the cost a pool hides
+
+Counts are per process. They are collected by the backend in
+`amu_monitoring.db.postgresql`.
+"""
+import threading
+from django.core.signals import request_finished
+from django.db import connections
+
+
+class PoolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._open = {}  # id(connection wrapper) -> checked out?
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._open = {key: False for key in self._open}
+            self.connects = 0
+            self.closes = 0
+            self.checkouts = 0
+            self.reuses = 0
+            self.health_check_failures = 0
+            self.connect_seconds = 0.0
+            self.max_connect_seconds = 0.0
+
+    def connected(self, wrapper, seconds):
+        with self._lock:
+            self._open[id(wrapper)] = False
+            self.connects += 1
+            self.connect_seconds += seconds
+            self.max_connect_seconds = max(self.max_connect_seconds, seconds)
+
+    def closed(self, wrapper):
+        with self._lock:
+            if self._open.pop(id(wrapper), None) is not None:
+                self.closes += 1
+
+    def health_check_failed(self):
+        with self._lock:
+            self.health_check_failures += 1
+
+    def checkout(self, wrapper, reused):
+        with self._lock:
+            self._open[id(wrapper)] = True
+            self.checkouts += 1
+            self.reuses += reused
+
+    def release(self, wrapper):
+        with self._lock:
+            if id(wrapper) in self._open:
+                self._open[id(wrapper)] = False
+
+    def snapshot(self):
+        with self._lock:
+            in_use = sum(self._open.values())
+            return {
+                'open': len(self._open),
+                'in_use': in_use,
+                'idle': len(self._open) - in_use,
+                'connects': self.connects,
+                'closes': self.closes,
+                'checkouts': self.checkouts,
+                'reuses': self.reuses,
+                'health_check_failures': self.health_check_failures,
+                'connect_ms_total': round(self.connect_seconds * 1000, 3),
+                'connect_ms_avg': round(self.connect_seconds * 1000 / self.connects, 3) if self.connects else None,
+                'connect_ms_max': round(self.max_connect_seconds * 1000, 3),
+            }
+
+
+pool_stats = PoolStats()
+
+
+def release_connections(**kwargs):
+    """Return the current thread's connections to idle; runs at the end of every request."""
+    for connection in connections.all(initialized_only=True):
+        if getattr(connection, 'checked_out', False):
+            connection.checked_out = False
+            pool_stats.release(connection)
+
+
+request_finished.connect(release_connections)
@@ -0,0 +1,42 @@
+"""
+The stock PostgreSQL backend, reporting to `amu_monitoring.db.pool_stats`.
+Use it with ENGINE = 'amu_monitoring.db.postgresql'.
+"""
+import time
+from django.db.backends.postgresql import base
+from amu_monitoring.db import pool_stats
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    checked_out = False
+
+    def get_new_connection(self, conn_params):
+        started = time.perf_counter()
+        connection = super().get_new_connection(conn_params)
+        pool_stats.connected(self, time.perf_counter() - started)
+        return connection
+
+    def ensure_connection(self):
+        if self.checked_out:
+            return super().ensure_connection()
+        reused = self.connection is not None
+        # Set first: connecting runs queries that come back through here
+        self.checked_out = True
+        try:
+            super().ensure_connection()
+        except Exception:
+            self.checked_out = False
+            raise
+        pool_stats.checkout(self, reused)
+
+    def close_if_health_check_failed(self):
+        connected = self.connection is not None
+        super().close_if_health_check_failed()
+        if connected and self.connection is None:
+            pool_stats.health_check_failed()
+
+    def _close(self):
+        if self.connection is not None:
+            pool_stats.closed(self)
+            self.checked_out = False
+        return super()._close()
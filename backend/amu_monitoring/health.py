@@ -0,0 +1,30 @@
+import time
+from django.db import connection
+from django.views import View
+from amu_monitoring.db import pool_stats
+from amu_monitoring.responses import JsonResponse
+
+
+class DatabaseHealthView(View):
+    """
+    Round-trips a trivial query and reports this process's connection
+    statistics (see amu_monitoring.db). 503 when the database is unreachable.
+    """
+
+    def get(self, request):
+        settings_dict = connection.settings_dict
+        payload = {
+            'conn_max_age': settings_dict['CONN_MAX_AGE'],
+            'conn_health_checks': settings_dict['CONN_HEALTH_CHECKS'],
+        }
+        try:
+            started = time.perf_counter()
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+            payload['ping_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        except Exception as e:
+            payload.update(status='unavailable', error=str(e), pool=pool_stats.snapshot())
+            return JsonResponse(payload, status=503)
+        payload.update(status='ok', pool=pool_stats.snapshot())
+        return JsonResponse(payload)
@@ -0,0 +1,177 @@
+"""
+Load drivers for the benchmark and load-test commands.
+
+By default requests go through the real WSGI/ASGI handlers (middleware, URL
+routing, views, database) without a socket or HTTP server in front, so the
+numbers isolate the application's own cost. HTTPTransport sends the same
+requests to a running server instead.
+"""
+import asyncio
+import io
+import math
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection, HTTPException, HTTPSConnection
+from urllib.parse import urlsplit
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connections
+
+
+class WSGITransport:
+    """Calls the WSGI application directly, as a threaded WSGI server would."""
+
+    def __init__(self, host='localhost'):
+        self.application = WSGIHandler()
+        self.host = host
+
+    def request(self, method, path, query='', body=b'', headers=None):
+        """Returns (status code, body)."""
+        headers = dict(headers or {})
+        status = []
+        environ = {
+            'REQUEST_METHOD': method, 'PATH_INFO': path, 'QUERY_STRING': query, 'SCRIPT_NAME': '',
+            'SERVER_NAME': self.host, 'SERVER_PORT': '80', 'HTTP_HOST': self.host,
+            'SERVER_PROTOCOL': 'HTTP/1.1', 'wsgi.input': io.BytesIO(body), 'wsgi.errors': io.StringIO(),
+            'wsgi.url_scheme': 'http', 'wsgi.multithread': True, 'wsgi.multiprocess': False,
+            'CONTENT_LENGTH': str(len(body)), 'CONTENT_TYPE': headers.pop('Content-Type', ''),
+        }
+        environ.update((f"HTTP_{name.upper().replace('-', '_')}", value) for name, value in headers.items())
+        response = self.application(environ, lambda s, response_headers: status.append(s))
+        try:
+            content = b''.join(response)
+        finally:
+            response.close()
+        return int(status[0].split()[0]), content
+
+
+class HTTPTransport:
+    """Sends requests to a running server over one keep-alive connection per thread."""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.connection_class = HTTPSConnection if parts.scheme == 'https' else HTTPConnection
+        self.netloc = parts.netloc
+        self.prefix = parts.path.rstrip('/')
+        self._local = threading.local()
+
+    def request(self, method, path, query='', body=b'', headers=None):
+        """Returns (status code, body)."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = self.connection_class(self.netloc, timeout=60)
+        try:
+            connection.request(
+                method, self.prefix + path + (f'?{query}' if query else ''), body=body or None, headers=headers or {},
+            )
+            response = connection.getresponse()
+            return response.status, response.read()
+        except (HTTPException, OSError):
+            connection.close()
+            self._local.connection = None
+            raise
+
+
+def run_wsgi(path, query, n, concurrency, host='localhost', headers=None, executor=None):
+    """
+    Send `n` GETs through the WSGI application from a thread pool. Returns
+    (latencies, elapsed, failures). Pass an `executor` to keep the same
+    threads, and so the same database connections, across runs.
+    """
+    transport = WSGITransport(host)
+    failures = 0
+
+    def one(_):
+        nonlocal failures
+        started = time.perf_counter()
+        status, _ = transport.request('GET', path, query, headers=headers)
+        if status != 200:
+            failures += 1
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    if executor is not None:
+        latencies = list(executor.map(one, range(n)))
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(one, range(n)))
+    return latencies, time.perf_counter() - started, failures
+
+
+def close_worker_connections(executor, workers):
+    """Close the database connections held by each of an executor's worker threads."""
+    # The barrier keeps every task on its own thread; it only times out if
+    # the executor started fewer threads than `workers`
+    barrier = threading.Barrier(workers, timeout=5)
+
+    def close(_):
+        try:
+            barrier.wait()
+        except threading.BrokenBarrierError:
+            pass
+        connections.close_all()
+
+    list(executor.map(close, range(workers)))
+
+
+def run_asgi(path, query, n, concurrency, host='localhost', headers=None):
+    """
+    Drive the ASGI application on one event loop, as an ASGI server worker
+    would. Returns (latencies, elapsed, failures).
+    """
+    return asyncio.run(_run_asgi(path, query, n, concurrency, host, headers or {}))
+
+
+async def _run_asgi(path, query, n, concurrency, host, headers):
+    application = ASGIHandler()
+    semaphore = asyncio.Semaphore(concurrency)
+    failures = 0
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'root_path': '',
+        'query_string': query.encode(),
+        'headers': [(b'host', host.encode())] + [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+        'server': (host, 80), 'client': ('127.0.0.1', 0),
+    }
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def one():
+        nonlocal failures
+        status = []
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+
+        async with semaphore:
+            started = time.perf_counter()
+            await application(dict(scope), receive, send)
+            if status[0] != 200:
+                failures += 1
+            return time.perf_counter() - started
+
+    started = time.perf_counter()
+    latencies = await asyncio.gather(*(one() for _ in range(n)))
+    return list(latencies), time.perf_counter() - started, failures
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    return ordered[max(math.ceil(len(ordered) * fraction) - 1, 0)]
+
+
+def summarize(latencies, elapsed):
+    """Latency percentiles, mean and max in milliseconds, and requests per second."""
+    latencies = sorted(latencies)
+    return {
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'mean_ms': statistics.fmean(latencies) * 1000,
+        'max_ms': latencies[-1] * 1000,
+        'rps': len(latencies) / elapsed,
+    }
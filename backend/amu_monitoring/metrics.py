@@ -0,0 +1,229 @@
+"""
+Request metrics in the Prometheus text format.
+
+`MetricsMiddleware` records, per route (the URL pattern, not the raw path,
+so ids don't blow up the label set): request latency, the number of SQL
+queries and the time spent in them, and the response size. `MetricsView`
+serves them, plus the connection counters from amu_monitoring.db, at
+/metrics.
+
+Queries are counted by an execute wrapper installed on every database
+connection as it is opened. It charges each query to the request in the
+current context, which asgiref carries over to the worker threads async
+views run their queries on (see amu_monitoring.concurrency).
+
+Requests slower than SLOW_REQUEST_MS are logged with the statements that
+took the most database time.
+
+Metrics are kept per process; with several workers, scrape each one.
+"""
+import bisect
+import contextvars
+import logging
+import threading
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from django.views import View
+from amu_monitoring.db import pool_stats
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250, 1000)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+# Distinct statements remembered per request for the slow-request log
+MAX_STATEMENTS = 200
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series = {}  # label values -> [per-bucket counts (last is +Inf), sum]
+
+    def observe(self, labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((labels, list(counts), total) for labels, (counts, total) in self._series.items())
+        for labels, counts, total in series:
+            label_text = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {total}')
+            lines.append(f'{self.name}_count{{{label_text}}} {cumulative}')
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+REQUEST_LABELS = ('method', 'route', 'status')
+
+request_latency = Histogram(
+    'http_request_duration_seconds', 'Time to produce the response.', REQUEST_LABELS, LATENCY_BUCKETS,
+)
+request_queries = Histogram(
+    'http_request_db_queries', 'SQL queries run per request.', REQUEST_LABELS, QUERY_COUNT_BUCKETS,
+)
+request_db_time = Histogram(
+    'http_request_db_duration_seconds', 'Time spent in SQL queries per request.', REQUEST_LABELS, LATENCY_BUCKETS,
+)
+response_size = Histogram(
+    'http_response_size_bytes', 'Response body size (non-streaming responses only).', REQUEST_LABELS, SIZE_BUCKETS,
+)
+HISTOGRAMS = (request_latency, request_queries, request_db_time, response_size)
+
+
+class QueryLog:
+    """The SQL run on behalf of one request, from any thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = {}  # sql -> [count, seconds]
+
+    def add(self, sql, seconds):
+        with self._lock:
+            self.count += 1
+            self.seconds += seconds
+            entry = self.statements.get(sql)
+            if entry is not None:
+                entry[0] += 1
+                entry[1] += seconds
+            elif len(self.statements) < MAX_STATEMENTS:
+                self.statements[sql] = [1, seconds]
+
+    def slowest(self, n=3):
+        with self._lock:
+            return sorted(self.statements.items(), key=lambda item: item[1][1], reverse=True)[:n]
+
+
+current_queries = contextvars.ContextVar('current_queries', default=None)
+
+
+def _record_query(execute, sql, params, many, context):
+    queries = current_queries.get()
+    if queries is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        queries.add(sql, time.perf_counter() - started)
+
+
+def _instrument(sender, connection, **kwargs):
+    # The wrapper list belongs to the connection wrapper and outlives reconnects
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+connection_created.connect(_instrument)
+
+
+class MetricsMiddleware:
+    """Records latency, query count, DB time and response size for every request. Goes first in MIDDLEWARE."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_seconds = settings.SLOW_REQUEST_MS / 1000
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        queries = QueryLog()
+        token = current_queries.set(queries)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_queries.reset(token)
+        self.record(request, response, queries, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        queries = QueryLog()
+        token = current_queries.set(queries)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_queries.reset(token)
+        self.record(request, response, queries, time.perf_counter() - started)
+        return response
+
+    def record(self, request, response, queries, elapsed):
+        match = request.resolver_match
+        labels = (request.method, match.route if match is not None else 'unmatched', str(response.status_code))
+        request_latency.observe(labels, elapsed)
+        request_queries.observe(labels, queries.count)
+        request_db_time.observe(labels, queries.seconds)
+        if not response.streaming:
+            response_size.observe(labels, len(response.content))
+
+        if elapsed >= self.slow_seconds:
+            statements = ''.join(
+                f'\n  {seconds * 1000:8.1f} ms  x{count:<4} {sql[:500]}'
+                for sql, (count, seconds) in queries.slowest()
+            )
+            logger.warning(
+                'Slow request: %s %s -> %s in %.0f ms, %d queries, %.0f ms in the database%s',
+                request.method, request.get_full_path(), response.status_code, elapsed * 1000,
+                queries.count, queries.seconds * 1000, statements,
+            )
+
+
+def render_metrics():
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+
+    pool = pool_stats.snapshot()
+    for name, kind, documentation, value in (
+        ('db_connections_open', 'gauge', 'Database connections held by this process.', pool['open']),
+        ('db_connections_in_use', 'gauge', 'Connections checked out by a request in flight.', pool['in_use']),
+        ('db_connections_idle', 'gauge', 'Open connections waiting for a request.', pool['idle']),
+        ('db_connects_total', 'counter', 'Connections established.', pool['connects']),
+        ('db_connect_seconds_total', 'counter', 'Time spent establishing connections.', pool['connect_ms_total'] / 1000),
+        ('db_checkouts_total', 'counter', 'Requests that used the database.', pool['checkouts']),
+        ('db_connection_reuses_total', 'counter', 'Checkouts that found a connection already open.', pool['reuses']),
+        ('db_health_check_failures_total', 'counter', 'Connections dropped by a failed health check.',
+         pool['health_check_failures']),
+    ):
+        lines.extend((f'# HELP {name} {documentation}', f'# TYPE {name} {kind}', f'{name} {value}'))
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsView(View):
+    def get(self, request):
+        return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,98 @@
+"""
+Keyset (cursor) pagination for the list endpoints.
+
+A page is fetched with `WHERE (key1, key2) < (last1, last2) ORDER BY key1, key2
+LIMIT n`, so the cost of a page does not grow with how far into the history the
+client has scrolled. The cursor handed back to the client is an opaque,
+URL-safe encoding of the last row's key values.
+"""
+import base64
+import json
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, fields):
+    """
+    The key values in `cursor`, parsed with the key `fields` (model fields,
+    in key order). Raises InvalidCursor for anything that doesn't decode to
+    one valid value per key.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+    if not isinstance(values, list) or len(values) != len(fields):
+        raise InvalidCursor('Invalid cursor')
+
+    parsed = []
+    for field, value in zip(fields, values):
+        # Keys are encoded as strings (dates, datetimes) or numbers (ids)
+        if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+            raise InvalidCursor('Invalid cursor')
+        try:
+            parsed.append(field.clean(value, None))
+        except (ValidationError, TypeError, ValueError):
+            raise InvalidCursor('Invalid cursor')
+    return parsed
+
+
+def wants_pagination(request):
+    """The legacy unpaginated list shape is kept behind ?paginate=false."""
+    return request.GET.get('paginate', 'true').lower() not in ('false', '0', 'no')
+
+
+def get_page_size(request):
+    try:
+        page_size = int(request.GET.get('page_size', settings.API_PAGE_SIZE))
+    except ValueError:
+        raise InvalidCursor('page_size must be an integer')
+    return max(1, min(page_size, settings.API_MAX_PAGE_SIZE))
+
+
+def _after(keys, values):
+    """Build the keyset predicate selecting rows strictly after `values`."""
+    condition = Q()
+    for i, (field, descending) in enumerate(keys):
+        step = Q(**{f"{field}__{'lt' if descending else 'gt'}": values[i]})
+        for j in range(i):
+            step &= Q(**{keys[j][0]: values[j]})
+        condition |= step
+    return condition
+
+
+def paginate(queryset, request, keys):
+    """
+    Return one page of `queryset` as `{'results': [...], 'next_cursor': ...}`.
+
+    `keys` is a list of `(field, descending)` pairs that must uniquely order
+    the rows, e.g. `[('date', True), ('id', True)]`. `queryset` must be a
+    `.values()` queryset that includes every key field.
+    """
+    page_size = get_page_size(request)
+    cursor = request.GET.get('cursor')
+
+    queryset = queryset.order_by(*[f"-{field}" if descending else field for field, descending in keys])
+    if cursor:
+        fields = [queryset.model._meta.get_field(field) for field, _ in keys]
+        queryset = queryset.filter(_after(keys, decode_cursor(cursor, fields)))
+
+    rows = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor([rows[-1][field] for field, _ in keys])
+
+    return {'results': rows, 'next_cursor': next_cursor}
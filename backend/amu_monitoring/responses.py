@@ -0,0 +1,114 @@
+"""
+Fast JSON encoding for API responses.
+
+`dumps` uses orjson when it is installed (`pip install orjson`) and the
+standard library otherwise. Both produce compact JSON that decodes to the
+same values as DjangoJSONEncoder's output, and handle what `.values()` rows
+contain: dates, datetimes and times (formatted as DjangoJSONEncoder does:
+ISO 8601, milliseconds, UTC as "Z"), timedeltas, decimals and UUIDs (as
+strings), and numpy values.
+
+`JsonResponse` is a drop-in replacement for django.http.JsonResponse that
+encodes with `dumps`.
+"""
+import datetime
+import decimal
+import json
+import uuid
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse as DjangoJsonResponse
+from django.utils.duration import duration_iso_string
+from django.utils.functional import Promise
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND = 'orjson' if orjson is not None else 'json'
+
+
+def _format_datetime(o):
+    # As DjangoJSONEncoder: milliseconds, and UTC as "Z"
+    text = o.isoformat()
+    if o.microsecond:
+        text = text[:23] + text[26:]
+    return text[:-6] + 'Z' if text.endswith('+00:00') else text
+
+
+def _format_time(o):
+    if o.tzinfo is not None and o.utcoffset() is not None:
+        raise ValueError("JSON can't represent timezone-aware times.")
+    text = o.isoformat()
+    return text[:12] if o.microsecond else text
+
+
+# Exact types, looked up before the isinstance checks below: these are most
+# of what rows contain, and orjson hands every one of them to _default
+_FORMATTERS = {
+    datetime.date: datetime.date.isoformat,
+    datetime.datetime: _format_datetime,
+    datetime.time: _format_time,
+}
+
+
+def _default(o):
+    """
+    Types neither encoder handles by itself (orjson: decimals, timedeltas,
+    lazy strings, subclasses), plus dates and times, which orjson is told to
+    pass through so they come out exactly as DjangoJSONEncoder writes them.
+    """
+    formatter = _FORMATTERS.get(type(o))
+    if formatter is not None:
+        return formatter(o)
+    if isinstance(o, (datetime.date, datetime.time)):
+        # Subclasses, e.g. pandas.Timestamp
+        return DjangoJSONEncoder().default(o)
+    if isinstance(o, datetime.timedelta):
+        return duration_iso_string(o)
+    if isinstance(o, (decimal.Decimal, uuid.UUID, Promise)):
+        return str(o)
+    if hasattr(o, 'tolist'):
+        # numpy scalars and arrays
+        return o.tolist()
+    raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+
+
+class _Encoder(json.JSONEncoder):
+    def default(self, o):
+        return _default(o)
+
+
+# ensure_ascii (escaping non-ASCII characters) is the stdlib's fast path
+_stdlib_encoder = _Encoder(separators=(',', ':'))
+
+
+def stdlib_dumps(data):
+    """`data` as UTF-8 encoded JSON bytes, with the standard library."""
+    return _stdlib_encoder.encode(data).encode()
+
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(data):
+        """`data` as UTF-8 encoded JSON bytes."""
+        return orjson.dumps(data, default=_default, option=_OPTIONS)
+else:
+    dumps = stdlib_dumps
+
+
+class JsonResponse(DjangoJsonResponse):
+    """
+    django.http.JsonResponse, encoded with `dumps`. Passing `encoder` or
+    `json_dumps_params` falls back to Django's own encoding.
+    """
+
+    def __init__(self, data, encoder=None, safe=True, json_dumps_params=None, **kwargs):
+        if encoder is not None or json_dumps_params is not None:
+            super().__init__(data, encoder or DjangoJSONEncoder, safe, json_dumps_params, **kwargs)
+            return
+        if safe and not isinstance(data, dict):
+            raise TypeError('In order to allow non-dict objects to be serialized set the safe parameter to False.')
+        kwargs.setdefault('content_type', 'application/json')
+        HttpResponse.__init__(self, content=dumps(data), **kwargs)
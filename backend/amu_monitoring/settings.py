@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 import os
 from pathlib import Path
 from dotenv import load_dotenv
+from django.conf import global_settings
 
 # Load environment variables from .env file
 load_dotenv()
@@ -42,6 +43,7 @@ INSTALLED_APPS = [
     'farms',
     'treatments',
     'reference_data',
+    'analytics',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
@@ -50,6 +52,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover every other middleware
+    'amu_monitoring.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -58,6 +62,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'amu_monitoring.users.middleware.JWTAuthenticationMiddleware',
 ]
 
 ROOT_URLCONF = 'amu_monitoring.urls'
@@ -84,16 +89,111 @@ WSGI_APPLICATION = 'amu_monitoring.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Connections are kept open between requests for DB_CONN_MAX_AGE seconds
+# (0 opens one per request, 'None' keeps them indefinitely) and checked with
+# a cheap query before being reused after a request boundary. The backend is
+# the stock PostgreSQL one plus the counters behind /api/health/db/.
+DB_CONN_MAX_AGE = os.getenv('DB_CONN_MAX_AGE', '60')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'amu_monitoring.db.postgresql',
         'NAME': os.getenv('DB_NAME', 'AMU_DB'),
         'USER': os.getenv('DB_USER', 'postgres'),
         'PASSWORD': os.getenv('DB_PASSWORD', 'albaqarah@2'),
         'HOST': os.getenv('DB_HOST', 'localhost'),
         'PORT': os.getenv('DB_PORT', '5432'),
+        'CONN_MAX_AGE': None if DB_CONN_MAX_AGE == 'None' else int(DB_CONN_MAX_AGE),
+        'CONN_HEALTH_CHECKS': os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True',
+    }
+}
+
+
+# Caches
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Local memory by default; set REDIS_URL to share cached data between workers.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+if os.getenv('REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL'),
     }
+
+# Cache alias holding the serialized reference drug catalogue
+REFERENCE_DATA_CACHE = os.getenv('REFERENCE_DATA_CACHE', 'default')
+
+# Logged treatments are checked against the approved molecules and MRL limits
+# for the farm's species: 'enforce' rejects unapproved antibiotics, 'warn'
+# accepts them and reports the failure, 'off' skips the check.
+TREATMENT_COMPLIANCE_CHECK = os.getenv('TREATMENT_COMPLIANCE_CHECK', 'enforce')
+
+
+# Logging
+# https://docs.djangoproject.com/en/4.2/topics/logging/
+# The project's own loggers write to stderr at LOG_LEVEL. Requests slower
+# than SLOW_REQUEST_MS are logged with the SQL that took longest; per-route
+# latency, query and response-size histograms are served at /metrics.
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', '500'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {'format': '%(asctime)s %(levelname)s %(name)s: %(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'simple'},
+    },
+    'loggers': {
+        name: {'handlers': ['console'], 'level': LOG_LEVEL, 'propagate': False}
+        for name in ('amu_monitoring', 'farms', 'treatments', 'reference_data', 'analytics')
+    },
+}
+
+
+# Password hashing
+# https://docs.djangoproject.com/en/4.2/topics/auth/passwords/
+# PASSWORD_HASHER picks the algorithm for new hashes: scrypt (default),
+# argon2 (needs argon2-cffi) or pbkdf2. Hashes made with any of the others,
+# or with Django's other stock hashers, still verify and are upgraded on the
+# user's next login, as are hashes made with older cost parameters.
+
+PASSWORD_HASHER_CHOICES = {
+    'scrypt': 'amu_monitoring.users.hashers.TunedScryptPasswordHasher',
+    'argon2': 'amu_monitoring.users.hashers.TunedArgon2PasswordHasher',
+    'pbkdf2': 'amu_monitoring.users.hashers.TunedPBKDF2PasswordHasher',
+}
+# The stock classes the tuned ones extend. They share an algorithm name, and
+# Django resolves a stored hash to the last hasher listed for its algorithm,
+# so listing them as well would check hashes against the stock costs.
+TUNED_PASSWORD_HASHERS = {
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
 }
+PASSWORD_HASHER = os.getenv('PASSWORD_HASHER', 'scrypt')
+PASSWORD_HASHERS = [PASSWORD_HASHER_CHOICES[PASSWORD_HASHER]] + [
+    hasher for name, hasher in PASSWORD_HASHER_CHOICES.items() if name != PASSWORD_HASHER
+] + [
+    # Everything else Django ships with by default, e.g. bcrypt_sha256
+    hasher for hasher in global_settings.PASSWORD_HASHERS if hasher not in TUNED_PASSWORD_HASHERS
+]
+
+SCRYPT_WORK_FACTOR = int(os.getenv('SCRYPT_WORK_FACTOR', str(2 ** 14)))
+SCRYPT_BLOCK_SIZE = int(os.getenv('SCRYPT_BLOCK_SIZE', '8'))
+SCRYPT_PARALLELISM = int(os.getenv('SCRYPT_PARALLELISM', '1'))
+ARGON2_TIME_COST = int(os.getenv('ARGON2_TIME_COST', '2'))
+ARGON2_MEMORY_COST = int(os.getenv('ARGON2_MEMORY_COST', '102400'))  # KiB
+ARGON2_PARALLELISM = int(os.getenv('ARGON2_PARALLELISM', '8'))
+PBKDF2_ITERATIONS = int(os.getenv('PBKDF2_ITERATIONS', '600000'))
 
 
 # Password validation
@@ -153,3 +253,29 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+# JWT authentication
+JWT_ACCESS_TOKEN_LIFETIME_MINUTES = int(os.getenv('JWT_ACCESS_TOKEN_LIFETIME_MINUTES', str(24 * 60)))
+JWT_REFRESH_TOKEN_LIFETIME_DAYS = int(os.getenv('JWT_REFRESH_TOKEN_LIFETIME_DAYS', '30'))
+# Each process reloads the revoked-token list from the database this often
+JWT_REVOCATION_REFRESH_SECONDS = int(os.getenv('JWT_REVOCATION_REFRESH_SECONDS', '30'))
+# Decoded tokens are cached in-process for this many seconds to skip
+# repeated signature checks
+JWT_PRINCIPAL_CACHE_TTL = int(os.getenv('JWT_PRINCIPAL_CACHE_TTL', '60'))
+JWT_PRINCIPAL_CACHE_SIZE = int(os.getenv('JWT_PRINCIPAL_CACHE_SIZE', '10000'))
+
+# Seconds a window of AMU indicators (mg/PCU) is served from the cache
+AMU_INDICATOR_CACHE_TTL = int(os.getenv('AMU_INDICATOR_CACHE_TTL', '300'))
+
+# Keyset pagination for list endpoints
+API_PAGE_SIZE = int(os.getenv('API_PAGE_SIZE', '50'))
+API_MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', '500'))
+
+# Treatments returned by the farmer dashboard endpoint
+DASHBOARD_RECENT_TREATMENTS = int(os.getenv('DASHBOARD_RECENT_TREATMENTS', '20'))
+
+# Largest submission accepted by the bulk treatment endpoint
+BULK_TREATMENT_MAX_ROWS = int(os.getenv('BULK_TREATMENT_MAX_ROWS', '1000'))
+
+# Rows fetched per server-side cursor round trip in streaming exports
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '2000'))
+
@@ -0,0 +1,57 @@
+"""
+Streaming JSON exports.
+
+Rows are pulled from the database with a server-side cursor
+(`QuerySet.iterator(chunk_size=...)`) and written to the client as they are
+encoded, so memory per worker stays constant however many rows are exported.
+"""
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from amu_monitoring.responses import dumps
+
+EXPORT_FORMATS = ('ndjson', 'json')
+
+
+def _encoded_batches(rows, chunk_size):
+    batch = []
+    for row in rows:
+        batch.append(dumps(row))
+        if len(batch) >= chunk_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def stream_ndjson(rows, chunk_size):
+    """One JSON object per line."""
+    for batch in _encoded_batches(rows, chunk_size):
+        yield b'\n'.join(batch) + b'\n'
+
+
+def stream_json_array(rows, chunk_size):
+    """A single JSON array, written a chunk at a time."""
+    yield b'['
+    first = True
+    for batch in _encoded_batches(rows, chunk_size):
+        yield (b'' if first else b',') + b','.join(batch)
+        first = False
+    yield b']'
+
+
+def export_response(queryset, fmt, filename):
+    """
+    Stream a `.values()` queryset as NDJSON (`fmt='ndjson'`) or a JSON array
+    (`fmt='json'`) attachment.
+    """
+    chunk_size = settings.EXPORT_CHUNK_SIZE
+    rows = queryset.iterator(chunk_size=chunk_size)
+
+    if fmt == 'ndjson':
+        response = StreamingHttpResponse(stream_ndjson(rows, chunk_size), content_type='application/x-ndjson')
+        extension = 'ndjson'
+    else:
+        response = StreamingHttpResponse(stream_json_array(rows, chunk_size), content_type='application/json')
+        extension = 'json'
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{extension}"'
+    return response
@@ -0,0 +1,225 @@
+import datetime
+import decimal
+import json
+import uuid
+from unittest import mock
+
+import numpy as np
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import OperationalError, connection
+from django.test import AsyncClient, SimpleTestCase, TestCase, TransactionTestCase
+from django.utils import timezone
+from django.utils.functional import lazy
+
+from amu_monitoring.users.tokens import issue_access_token
+from reference_data.lookup import get_species_index
+from treatments.tests import make_farm, make_treatment, make_user
+from . import metrics, responses
+from .db import PoolStats, pool_stats
+from .responses import JsonResponse, stdlib_dumps
+
+
+def payload():
+    """One of everything a view hands JsonResponse."""
+    return {
+        'id': 7,
+        'ratio': 0.1,
+        'big': 2 ** 53,
+        'flags': [True, False, None],
+        'name': 'Amoxicillin – 50 µg',
+        'nested': {'rows': [{'date': datetime.date(2024, 5, 1)}], 1: 'int key'},
+        'created_at': datetime.datetime(2024, 5, 1, 8, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+        'whole_ms': datetime.datetime(2024, 5, 1, 8, 30, 15, 123000, tzinfo=datetime.timezone.utc),
+        'local': datetime.datetime(2024, 5, 1, 8, 30, 15, 123000, tzinfo=timezone.get_fixed_timezone(330)),
+        'naive': datetime.datetime(2024, 5, 1, 8, 30),
+        'time': datetime.time(8, 30, 15, 123456),
+        'duration': datetime.timedelta(days=1, seconds=5),
+        'amount': decimal.Decimal('12.50'),
+        'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'label': lazy(lambda: 'Pending', str)(),
+    }
+
+
+class JsonResponseTests(SimpleTestCase):
+    def django_encoded(self, data):
+        return json.loads(json.dumps(data, cls=DjangoJSONEncoder))
+
+    def test_matches_django_json_encoder(self):
+        data = payload()
+        expected = self.django_encoded(data)
+        for name, dumps in (('default', responses.dumps), ('stdlib', stdlib_dumps)):
+            with self.subTest(backend=name):
+                self.assertEqual(json.loads(dumps(data)), expected)
+        self.assertEqual(json.loads(JsonResponse(data).content), expected)
+        self.assertEqual(expected['created_at'], '2024-05-01T08:30:15.123Z')
+
+    def test_numpy_values(self):
+        data = {'count': np.int64(3), 'mean': np.float64(1.5), 'values': np.array([1, 2])}
+        for dumps in (responses.dumps, stdlib_dumps):
+            with self.subTest(dumps=dumps):
+                self.assertEqual(json.loads(dumps(data)), {'count': 3, 'mean': 1.5, 'values': [1, 2]})
+
+    def test_response_behaves_like_djangos(self):
+        response = JsonResponse({'ok': True}, status=201)
+        self.assertEqual((response.status_code, response['Content-Type']), (201, 'application/json'))
+        with self.assertRaises(TypeError):
+            JsonResponse([1, 2])
+        self.assertEqual(json.loads(JsonResponse([1, 2], safe=False).content), [1, 2])
+        # An explicit encoder goes through Django's own path
+        response = JsonResponse({'at': datetime.time(8, 30)}, encoder=DjangoJSONEncoder)
+        self.assertEqual(json.loads(response.content), {'at': '08:30:00'})
+        with self.assertRaises(TypeError):
+            responses.dumps({'unknown': object()})
+
+
+class PoolStatsTests(SimpleTestCase):
+    def setUp(self):
+        self.stats = PoolStats()
+        self.first, self.second = object(), object()
+
+    def counts(self, *keys):
+        snapshot = self.stats.snapshot()
+        return tuple(snapshot[key] for key in keys)
+
+    def test_checkout_reuse_and_release(self):
+        self.stats.connected(self.first, 0.004)
+        self.assertEqual(self.counts('open', 'in_use', 'idle', 'connects'), (1, 0, 1, 1))
+        # The request that opened the connection
+        self.stats.checkout(self.first, reused=False)
+        self.assertEqual(self.counts('in_use', 'idle', 'checkouts', 'reuses'), (1, 0, 1, 0))
+        self.stats.release(self.first)
+        self.assertEqual(self.counts('in_use', 'idle'), (0, 1))
+        # The thread's next request finds it open
+        self.stats.checkout(self.first, reused=True)
+        self.assertEqual(self.counts('in_use', 'checkouts', 'reuses'), (1, 2, 1))
+
+        self.stats.connected(self.second, 0.002)
+        self.stats.checkout(self.second, reused=False)
+        self.assertEqual(self.counts('open', 'in_use', 'connects', 'checkouts', 'reuses'), (2, 2, 2, 3, 1))
+        self.assertEqual(self.counts('connect_ms_total', 'connect_ms_avg', 'connect_ms_max'), (6.0, 3.0, 4.0))
+
+    def test_close(self):
+        self.stats.connected(self.first, 0.001)
+        self.stats.checkout(self.first, reused=False)
+        self.stats.closed(self.first)
+        self.assertEqual(self.counts('open', 'in_use', 'closes'), (0, 0, 1))
+        # Closing again, or releasing after the close, changes nothing
+        self.stats.closed(self.first)
+        self.stats.release(self.first)
+        self.assertEqual(self.counts('open', 'in_use', 'closes'), (0, 0, 1))
+
+    def test_reset_keeps_open_connections(self):
+        self.stats.connected(self.first, 0.001)
+        self.stats.checkout(self.first, reused=False)
+        self.stats.health_check_failed()
+        self.stats.reset()
+        self.assertEqual(
+            self.counts('open', 'in_use', 'connects', 'checkouts', 'health_check_failures', 'connect_ms_avg'),
+            (1, 0, 0, 0, 0, None),
+        )
+
+
+class DatabaseHealthTests(TestCase):
+    URL = '/api/health/db/'
+
+    def test_requests_check_the_connection_out_and_back_in(self):
+        self.client.get(self.URL)
+        before = pool_stats.snapshot()
+        response = self.client.get(self.URL)
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['status'], 'ok')
+        # Checked out while the request ran, released once it finished
+        self.assertGreaterEqual(body['pool']['in_use'], 1)
+        self.assertFalse(connection.checked_out)
+        after = pool_stats.snapshot()
+        self.assertEqual(after['checkouts'] - before['checkouts'], 1)
+        self.assertEqual(after['reuses'] - before['reuses'], 1)
+        self.assertEqual(after['connects'], before['connects'])
+
+    def test_unreachable_database_is_503(self):
+        with mock.patch.object(connection, 'cursor', side_effect=OperationalError('connection refused')):
+            response = self.client.get(self.URL)
+        self.assertEqual(response.status_code, 503)
+        body = response.json()
+        self.assertEqual((body['status'], body['error']), ('unavailable', 'connection refused'))
+        self.assertIn('pool', body)
+        self.assertNotIn('ping_ms', body)
+
+
+class MetricsAssertions:
+    def setUp(self):
+        # The histograms are per process, shared with every other test
+        for histogram in metrics.HISTOGRAMS:
+            histogram.clear()
+
+    def sample(self, name, route, method='GET', status='200'):
+        """The value of one series in /metrics, or None when it isn't there."""
+        prefix = f'{name}{{method="{method}",route="{route}",status="{status}"}} '
+        for line in metrics.render_metrics().splitlines():
+            if line.startswith(prefix):
+                return float(line[len(prefix):])
+        return None
+
+
+class MetricsTests(MetricsAssertions, TestCase):
+    def test_query_count_per_route(self):
+        get_species_index()
+        for _ in range(2):
+            self.assertEqual(self.client.get('/api/reference/molecules/', {'species': 'BOV'}).status_code, 404)
+        route = 'api/reference/molecules/'
+        # One catalogue version lookup per request
+        self.assertEqual(self.sample('http_request_db_queries_sum', route, status='404'), 2)
+        self.assertEqual(self.sample('http_request_db_queries_count', route, status='404'), 2)
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        self.assertIn(f'http_request_db_queries_bucket{{method="GET",route="{route}",status="404",le="0"}} 0', text)
+        self.assertIn(f'http_request_db_queries_bucket{{method="GET",route="{route}",status="404",le="1"}} 2', text)
+        self.assertIn('db_checkouts_total ', text)
+
+    def test_ids_are_not_part_of_the_route(self):
+        treatment = make_treatment(make_farm(make_user('farmer@example.com')))
+        self.client.post(f'/api/treatments/{treatment.id}/action/', '{}', content_type='application/json')
+        self.assertEqual(
+            self.sample('http_request_duration_seconds_count', 'api/treatments/<int:treatment_id>/action/', 'POST', '400'), 1,
+        )
+        self.client.get('/no/such/page/')
+        self.assertEqual(self.sample('http_request_duration_seconds_count', 'unmatched', status='404'), 1)
+
+    def test_slow_requests_are_logged(self):
+        with self.settings(SLOW_REQUEST_MS=0):
+            with self.assertLogs('amu_monitoring.metrics', 'WARNING') as logs:
+                self.client.get('/api/health/db/')
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('Slow request: GET /api/health/db/ -> 200', logs.output[0])
+        self.assertIn('SELECT 1', logs.output[0])
+
+    def test_fast_requests_are_not_logged(self):
+        with self.settings(SLOW_REQUEST_MS=60_000):
+            with self.assertNoLogs('amu_monitoring.metrics', 'WARNING'):
+                self.client.get('/api/health/db/')
+
+
+class AsyncMetricsTests(MetricsAssertions, TransactionTestCase):
+    # The async view queries on worker threads with their own connections,
+    # which can't see data inside a test transaction
+
+    def setUp(self):
+        super().setUp()
+        # As in farms.tests, so the workers' connections don't outlive the test
+        conn_max_age = connection.settings_dict['CONN_MAX_AGE']
+        connection.settings_dict['CONN_MAX_AGE'] = 0
+        self.addCleanup(connection.settings_dict.__setitem__, 'CONN_MAX_AGE', conn_max_age)
+
+        farmer = make_user('farmer@example.com')
+        make_treatment(make_farm(farmer))
+        self.auth = {'AUTHORIZATION': f'Bearer {issue_access_token(farmer)}'}
+
+    async def test_queries_on_worker_threads_are_counted(self):
+        response = await AsyncClient().get('/api/dashboard/async/', headers=self.auth)
+        self.assertEqual(response.status_code, 200)
+        # The farms and the treatments, each queried on its own worker thread
+        self.assertGreaterEqual(self.sample('http_request_db_queries_sum', 'api/dashboard/async/'), 2)
+        self.assertEqual(self.sample('http_request_db_queries_count', 'api/dashboard/async/'), 1)
@@ -17,15 +17,22 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from amu_monitoring.users.views import RegisterView, UpdateProfileView
-from amu_monitoring.users.login_view import LoginView
+from amu_monitoring.users.login_view import LoginView, LogoutView, TokenRefreshView
+from amu_monitoring.health import DatabaseHealthView
+from amu_monitoring.metrics import MetricsView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/register/', RegisterView.as_view(), name='register'),
     path('api/login/', LoginView.as_view(), name='login'),
+    path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('api/logout/', LogoutView.as_view(), name='logout'),
     path('api/update-profile/', UpdateProfileView.as_view(), name='update_profile'),
+    path('metrics', MetricsView.as_view(), name='metrics'),
+    path('api/health/db/', DatabaseHealthView.as_view(), name='health_db'),
     path('api/', include('farms.urls')),
     path('api/treatments/', include('treatments.urls')),
     path('api/reference/', include('reference_data.urls')),
+    path('api/analytics/', include('analytics.urls')),
 ]
 
@@ -1,13 +1,13 @@
-from django.http import JsonResponse
+from amu_monitoring.responses import JsonResponse
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from django.views import View
-from django.contrib.auth.hashers import check_password
-from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
 from .models import User
+from .revocation import revocation_list, revoke_token
+from .tokens import decode_token, issue_access_token, issue_refresh_token
 import json
 import jwt
-import datetime
 
 @method_decorator(csrf_exempt, name='dispatch')
 class LoginView(View):
@@ -23,29 +23,23 @@ class LoginView(View):
             try:
                 user = User.objects.get(email_address=email_address)
                 
-                # Check password
-                if not check_password(password, user.password):
-                    # Fallback for legacy plaintext passwords (optional, but good for transition)
-                    if user.password == password:
-                        # Auto-migrate to hash
-                        from django.contrib.auth.hashers import make_password
-                        user.password = make_password(password)
-                        user.save()
-                    else:
-                        return JsonResponse({'error': 'Invalid email or password.'}, status=401)
+                # Check password. If the stored hash uses an outdated algorithm
+                # or cost, check_password calls upgrade_hash to re-hash it.
+                # Legacy plaintext passwords are migrated by the
+                # hash_plaintext_passwords command, not here.
+                def upgrade_hash(raw_password):
+                    User.objects.filter(id=user.id).update(password=make_password(raw_password))
+
+                if not check_password(password, user.password, setter=upgrade_hash):
+                    return JsonResponse({'error': 'Invalid email or password.'}, status=401)
                 
                 # Generate JWT
-                token_payload = {
-                    'user_id': user.id,
-                    'email': user.email_address,
-                    'role': user.role,
-                    'exp': datetime.datetime.utcnow() + datetime.timedelta(days=1)
-                }
-                token = jwt.encode(token_payload, settings.SECRET_KEY, algorithm='HS256')
+                token = issue_access_token(user)
 
                 return JsonResponse({
                     'message': 'Login successful.',
                     'token': token,
+                    'refresh_token': issue_refresh_token(user),
                     'user_name': f"{user.first_name} {user.last_name}",
                     'email': user.email_address,
                     'role': user.role,
@@ -61,3 +55,63 @@ class LoginView(View):
                 return JsonResponse({'error': 'Invalid email or password.'}, status=401)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
+
+@method_decorator(csrf_exempt, name='dispatch')
+class TokenRefreshView(View):
+    """Mint a new access token from a refresh token, without a password check."""
+    def post(self, request):
+        try:
+            data = json.loads(request.body)
+            refresh_token = data.get('refresh_token')
+            if not refresh_token:
+                return JsonResponse({'error': 'Refresh token is required.'}, status=400)
+
+            try:
+                payload = decode_token(refresh_token, 'refresh')
+            except jwt.InvalidTokenError:
+                return JsonResponse({'error': 'Invalid or expired refresh token.'}, status=401)
+
+            if revocation_list.is_revoked(payload.get('jti'), payload['user_id'], payload.get('iat')):
+                return JsonResponse({'error': 'Refresh token has been revoked.'}, status=401)
+
+            try:
+                user = User.objects.get(id=payload['user_id'])
+            except User.DoesNotExist:
+                return JsonResponse({'error': 'Invalid or expired refresh token.'}, status=401)
+
+            # Rotate: each refresh token can be used once. If a concurrent
+            # request already used it, this one loses.
+            if not revoke_token(payload):
+                return JsonResponse({'error': 'Refresh token has been revoked.'}, status=401)
+
+            return JsonResponse({
+                'token': issue_access_token(user),
+                'refresh_token': issue_refresh_token(user),
+            }, status=200)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+
+@method_decorator(csrf_exempt, name='dispatch')
+class LogoutView(View):
+    """Revoke the caller's access token and, if given, their refresh token."""
+    def post(self, request):
+        try:
+            data = json.loads(request.body or '{}')
+            principal = request.principal
+
+            if principal is not None and principal.jti:
+                revoke_token({'jti': principal.jti, 'user_id': principal.id, 'exp': principal.expires_at})
+
+            refresh_token = data.get('refresh_token')
+            if refresh_token:
+                try:
+                    payload = decode_token(refresh_token, 'refresh')
+                except jwt.InvalidTokenError:
+                    payload = None
+                # Only let callers revoke their own refresh tokens
+                if payload and (principal is None or payload['user_id'] == principal.id):
+                    revoke_token(payload)
+
+            return JsonResponse({'message': 'Logged out.'}, status=200)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
@@ -0,0 +1,38 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+
+class Command(BaseCommand):
+    help = 'Measure password verifications (logins) per second on one core for each hasher choice'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=3.0, help='Time spent per hasher (default: 3)')
+
+    def handle(self, *args, **options):
+        password = 'correct horse battery staple'
+        self.stdout.write(f"New passwords use: {settings.PASSWORD_HASHER}")
+
+        for name, path in settings.PASSWORD_HASHER_CHOICES.items():
+            hasher = import_string(path)()
+            try:
+                encoded = hasher.encode(password, hasher.salt())
+            except ValueError as e:
+                # e.g. argon2-cffi not installed
+                self.stdout.write(self.style.WARNING(f"{name:<8} skipped: {e}"))
+                continue
+
+            # Single-threaded, so the rate is per core
+            logins = 0
+            started = time.perf_counter()
+            deadline = started + options['seconds']
+            while time.perf_counter() < deadline:
+                hasher.verify(password, encoded)
+                logins += 1
+            elapsed = time.perf_counter() - started
+
+            self.stdout.write(
+                f"{name:<8} {logins / elapsed:8.1f} logins/sec/core  "
+                f"({elapsed / logins * 1000:.1f} ms per login)"
+            )
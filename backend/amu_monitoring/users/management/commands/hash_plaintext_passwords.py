@@ -0,0 +1,49 @@
+import re
+
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX, identify_hasher, make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from amu_monitoring.users.models import User
+
+# "<algorithm>$...$...", the shape of every Django hash
+HASH_SHAPE = re.compile(r'^[a-z0-9_]+\$.+\$')
+
+
+def is_plaintext(password):
+    """
+    True for a stored password that is neither a hash nor deliberately unusable.
+    Hashes from algorithms this deployment doesn't list still look like hashes
+    and are left alone rather than hashed a second time.
+    """
+    if not password or password.startswith(UNUSABLE_PASSWORD_PREFIX):
+        return False
+    try:
+        identify_hasher(password)
+    except ValueError:
+        return not HASH_SHAPE.match(password)
+    return False
+
+
+class Command(BaseCommand):
+    help = 'Hash any passwords still stored in plaintext (one-off migration for legacy accounts)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only count the affected accounts')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        plaintext = [
+            user for user in User.objects.only('id', 'password').iterator(chunk_size=2000)
+            if is_plaintext(user.password)
+        ]
+
+        if options['dry_run'] or not plaintext:
+            self.stdout.write(f"{len(plaintext)} accounts with plaintext passwords")
+            return
+
+        for user in plaintext:
+            user.password = make_password(user.password)
+        with transaction.atomic():
+            User.objects.bulk_update(plaintext, ['password'], batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(f"Hashed {len(plaintext)} plaintext passwords"))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from amu_monitoring.users.models import RevokedToken, User
+from amu_monitoring.users.revocation import revoke_user_tokens
+
+
+class Command(BaseCommand):
+    help = 'Force-revoke every token of a user, and/or purge expired revocation rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Email address of the user whose tokens should be revoked')
+        parser.add_argument(
+            '--purge-expired',
+            action='store_true',
+            help='Delete revocation rows whose tokens have expired anyway',
+        )
+
+    def handle(self, *args, **options):
+        if not options['user'] and not options['purge_expired']:
+            raise CommandError('Pass --user and/or --purge-expired')
+
+        if options['user']:
+            try:
+                user = User.objects.get(email_address=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User not found: {options['user']}")
+            revoke_user_tokens(user.id)
+            self.stdout.write(self.style.SUCCESS(f"Revoked all tokens of {user.email_address}"))
+
+        if options['purge_expired']:
+            deleted, _ = RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+            self.stdout.write(self.style.SUCCESS(f"Purged {deleted} expired revocations"))
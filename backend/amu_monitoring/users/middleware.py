@@ -0,0 +1,180 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import wraps
+from typing import Optional
+import jwt
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from amu_monitoring.responses import JsonResponse
+from amu_monitoring.concurrency import run_in_worker
+from .revocation import revocation_list
+from .tokens import decode_token
+
+
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated caller, as described by their access token."""
+    id: int
+    email: str
+    role: str
+    district: Optional[str]
+    # Token identity, for revocation checks and logout
+    jti: Optional[str] = None
+    issued_at: Optional[float] = None
+    expires_at: Optional[int] = None
+
+
+class PrincipalCache:
+    """
+    Small thread-safe LRU of token -> (principal, cached_until) so hot
+    dashboards don't re-verify the same signature on every request. Entries
+    never outlive the token's own expiry.
+    """
+
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            principal, cached_until = entry
+            if cached_until <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return principal
+
+    def set(self, token, principal, expires_at):
+        with self._lock:
+            self._entries[token] = (principal, min(time.time() + self.ttl, expires_at))
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache(
+    ttl=settings.JWT_PRINCIPAL_CACHE_TTL,
+    max_size=settings.JWT_PRINCIPAL_CACHE_SIZE,
+)
+
+
+class JWTAuthenticationMiddleware:
+    """
+    Verify an `Authorization: Bearer <token>` header once per request and
+    attach the caller as `request.principal` (None when no token is sent).
+    A token that is sent but invalid, expired or revoked is rejected with 401.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _authenticate(self, request):
+        """Sets request.principal; returns an error response for a bad token."""
+        request.principal = None
+
+        header = request.headers.get('Authorization', '')
+        if not header.startswith('Bearer '):
+            return None
+        token = header[len('Bearer '):].strip()
+        principal = principal_cache.get(token)
+        if principal is None:
+            try:
+                payload = decode_token(token, 'access')
+            except jwt.InvalidTokenError:
+                return JsonResponse({'error': 'Invalid or expired token.'}, status=401)
+            principal = Principal(
+                id=payload['user_id'],
+                email=payload.get('email'),
+                role=payload['role'],
+                district=payload.get('district'),
+                jti=payload.get('jti'),
+                issued_at=payload.get('iat'),
+                expires_at=payload['exp'],
+            )
+            principal_cache.set(token, principal, payload['exp'])
+        request.principal = principal
+        return None
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        error = self._authenticate(request)
+        if error is not None:
+            return error
+        # Checked on every request, cached principal or not: an in-memory
+        # lookup, no query
+        principal = request.principal
+        if principal is not None and revocation_list.is_revoked(principal.jti, principal.id, principal.issued_at):
+            request.principal = None
+            return JsonResponse({'error': 'Token has been revoked.'}, status=401)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        error = self._authenticate(request)
+        if error is not None:
+            return error
+        principal = request.principal
+        if principal is not None and await revocation_list.ais_revoked(principal.jti, principal.id, principal.issued_at):
+            request.principal = None
+            return JsonResponse({'error': 'Token has been revoked.'}, status=401)
+        return await self.get_response(request)
+
+
+def resolve_user_id(request, email=None, role=None):
+    """
+    Return the id of the calling user: the token's principal when present,
+    otherwise the user with `email` (the legacy, pre-token way of identifying
+    callers). Raises User.DoesNotExist if neither identifies a user.
+    """
+    from .models import User
+
+    if request.principal is not None and (role is None or request.principal.role == role):
+        return request.principal.id
+    if not email:
+        raise User.DoesNotExist
+    users = User.objects.filter(email_address=email)
+    if role is not None:
+        users = users.filter(role=role)
+    return users.values_list('id', flat=True).get()
+
+
+async def aresolve_user_id(request, email=None, role=None):
+    """resolve_user_id() for async views; a token principal needs no query."""
+    if request.principal is not None and (role is None or request.principal.role == role):
+        return request.principal.id
+    return await run_in_worker(resolve_user_id, request, email, role)
+
+
+def role_required(role):
+    """
+    View decorator admitting only callers whose access token carries `role`:
+    401 without a token, 403 for any other role. There is no ?email=
+    fallback, so use it on endpoints that have no legacy callers.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.principal is None:
+                return JsonResponse({'error': 'Authentication required'}, status=401)
+            if request.principal.role != role:
+                return JsonResponse({'error': f'{role.title()} access required'}, status=403)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_user_address_user_district_user_phone_number_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['role', 'district'], name='user_role_district_idx'),
+        ),
+    ]
@@ -19,6 +19,31 @@ class User(models.Model):
     address = models.TextField(blank=True, null=True)
     phone_number = models.CharField(max_length=15, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # Vet lookup for assignment: role='vet' within a district
+            models.Index(fields=['role', 'district'], name='user_role_district_idx'),
+        ]
+
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
-    
\ No newline at end of file
+    
+
+class RevokedToken(models.Model):
+    """
+    A revoked JWT, identified by its jti, or - when jti is empty - every token
+    issued to `user` before `revoked_at`. Rows are only needed until
+    `expires_at`, after which the tokens they cover have expired anyway.
+    """
+    jti = models.CharField(max_length=64, unique=True, blank=True, null=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='revoked_tokens')
+    revoked_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['expires_at'], name='revokedtoken_expires_idx'),
+        ]
+
+    def __str__(self):
+        return self.jti or f"All tokens of {self.user} before {self.revoked_at}"
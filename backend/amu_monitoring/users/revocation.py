@@ -0,0 +1,107 @@
+"""
+Token revocation.
+
+Revocations are stored in the RevokedToken table, and each process keeps an
+in-memory copy (a set of revoked jtis plus per-user cutoff times) that it
+reloads from the database every JWT_REVOCATION_REFRESH_SECONDS. Checking a
+token on the request path is then a set/dict lookup, not a query.
+Revocations made in this process apply immediately; other processes pick
+them up on their next reload.
+"""
+import datetime
+import threading
+import time
+from django.conf import settings
+from amu_monitoring.concurrency import run_in_worker
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from .models import RevokedToken
+from .tokens import REFRESH_TOKEN_LIFETIME
+
+
+class RevocationList:
+    def __init__(self, refresh_interval):
+        self.refresh_interval = refresh_interval
+        self._jtis = frozenset()
+        self._user_cutoffs = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def stale(self):
+        loaded_at = self._loaded_at
+        return loaded_at is None or time.monotonic() - loaded_at >= self.refresh_interval
+
+    def _reload_if_stale(self):
+        if not self.stale:
+            return
+        with self._lock:
+            if not self.stale:
+                return
+            jtis, cutoffs = set(), {}
+            live = RevokedToken.objects.filter(expires_at__gt=timezone.now()).values_list('jti', 'user_id', 'revoked_at')
+            for jti, user_id, revoked_at in live:
+                if jti:
+                    jtis.add(jti)
+                else:
+                    cutoffs[user_id] = max(cutoffs.get(user_id, 0), revoked_at.timestamp())
+            # Swap in whole new containers so readers never see a partial load
+            self._jtis, self._user_cutoffs = frozenset(jtis), cutoffs
+            self._loaded_at = time.monotonic()
+
+    def is_revoked(self, jti, user_id, issued_at):
+        self._reload_if_stale()
+        if jti and jti in self._jtis:
+            return True
+        cutoff = self._user_cutoffs.get(user_id)
+        return cutoff is not None and (issued_at is None or issued_at < cutoff)
+
+    async def ais_revoked(self, jti, user_id, issued_at):
+        """is_revoked() for async callers; only leaves the event loop when a reload is due."""
+        if self.stale:
+            await run_in_worker(self._reload_if_stale)
+        return self.is_revoked(jti, user_id, issued_at)
+
+    def add_token(self, jti):
+        with self._lock:
+            self._jtis = self._jtis | {jti}
+
+    def add_user_cutoff(self, user_id, cutoff):
+        with self._lock:
+            cutoffs = dict(self._user_cutoffs)
+            cutoffs[user_id] = max(cutoffs.get(user_id, 0), cutoff)
+            self._user_cutoffs = cutoffs
+
+
+revocation_list = RevocationList(settings.JWT_REVOCATION_REFRESH_SECONDS)
+
+
+def revoke_token(payload):
+    """
+    Revoke one token given its decoded payload. Returns False if it was
+    already revoked, so callers can use this to make tokens single-use.
+    """
+    jti = payload.get('jti')
+    if not jti:
+        return False
+    try:
+        with transaction.atomic():
+            RevokedToken.objects.create(
+                jti=jti,
+                user_id=payload['user_id'],
+                expires_at=datetime.datetime.fromtimestamp(payload['exp'], tz=datetime.timezone.utc),
+            )
+    except IntegrityError:
+        return False
+    revocation_list.add_token(jti)
+    return True
+
+
+def revoke_user_tokens(user_id):
+    """Revoke every token issued to the user so far (forced logout)."""
+    now = timezone.now()
+    revocation = RevokedToken.objects.create(
+        user_id=user_id,
+        expires_at=now + REFRESH_TOKEN_LIFETIME,
+    )
+    revocation_list.add_user_cutoff(user_id, revocation.revoked_at.timestamp())
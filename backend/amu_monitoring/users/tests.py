@@ -0,0 +1,225 @@
+import datetime
+import json
+import time
+from io import StringIO
+from unittest import mock
+
+import jwt
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher, make_password
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from treatments.tests import make_farm, make_user
+from . import middleware
+from .hashers import TunedScryptPasswordHasher
+from .middleware import principal_cache
+from .models import RevokedToken, User
+from .revocation import RevocationList, revoke_user_tokens
+from .tokens import decode_token, issue_access_token, issue_refresh_token
+
+
+class TokenTestCase(TestCase):
+    def setUp(self):
+        self.user = make_user('farmer@example.com')
+        self.user.password = make_password('secret')
+        self.user.save()
+        self.farm = make_farm(self.user)
+        make_farm(make_user('someone-else@example.com'))
+        # Principals are cached per process, across tests
+        principal_cache.clear()
+        self.addCleanup(principal_cache.clear)
+
+    def post(self, url, data, token=None):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if token else {}
+        return self.client.post(url, json.dumps(data), content_type='application/json', **headers)
+
+    def farms(self, token):
+        return self.client.get('/api/farms/', {'paginate': 'false'}, HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def login(self):
+        response = self.post('/api/login/', {'email_address': 'farmer@example.com', 'password': 'secret'})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+
+class TokenAuthenticationTests(TokenTestCase):
+    def test_login_token_scopes_requests(self):
+        response = self.farms(self.login()['token'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([farm['id'] for farm in response.json()], [self.farm.id])
+
+    def test_principal_comes_from_the_token(self):
+        token = issue_access_token(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.farms(token).status_code, 200)
+        self.assertFalse([q['sql'] for q in queries if 'users_user' in q['sql']])
+
+    def test_legacy_email_lookup_still_works(self):
+        response = self.client.get('/api/farms/', {'paginate': 'false', 'email': 'farmer@example.com'})
+        self.assertEqual([farm['id'] for farm in response.json()], [self.farm.id])
+
+    def test_bad_tokens_are_rejected(self):
+        expired = jwt.encode(
+            {'user_id': self.user.id, 'role': 'farmer', 'exp': int(time.time()) - 10},
+            settings.SECRET_KEY, algorithm='HS256',
+        )
+        forged = jwt.encode({'user_id': self.user.id, 'role': 'regulator', 'exp': int(time.time()) + 60}, 'wrong key')
+        for token in ('garbage', expired, forged, issue_refresh_token(self.user)):
+            with self.subTest(token=token):
+                self.assertEqual(self.farms(token).status_code, 401)
+
+    def test_signature_is_checked_once_per_token(self):
+        token = issue_access_token(self.user)
+        with mock.patch.object(middleware, 'decode_token', wraps=decode_token) as decode:
+            for _ in range(3):
+                self.assertEqual(self.farms(token).status_code, 200)
+        self.assertEqual(decode.call_count, 1)
+
+
+class TokenRefreshTests(TokenTestCase):
+    def refresh(self, refresh_token):
+        return self.post('/api/token/refresh/', {'refresh_token': refresh_token})
+
+    def test_refresh_mints_a_working_pair(self):
+        response = self.refresh(self.login()['refresh_token'])
+        self.assertEqual(response.status_code, 200)
+        tokens = response.json()
+        self.assertEqual(self.farms(tokens['token']).status_code, 200)
+        self.assertEqual(self.refresh(tokens['refresh_token']).status_code, 200)
+
+    def test_refresh_tokens_are_single_use(self):
+        refresh_token = self.login()['refresh_token']
+        self.assertEqual(self.refresh(refresh_token).status_code, 200)
+        self.assertEqual(self.refresh(refresh_token).status_code, 401)
+
+    def test_bad_refresh_tokens(self):
+        self.assertEqual(self.post('/api/token/refresh/', {}).status_code, 400)
+        for token in ('garbage', issue_access_token(self.user)):
+            with self.subTest(token=token):
+                self.assertEqual(self.refresh(token).status_code, 401)
+
+
+class TokenRevocationTests(TokenTestCase):
+    def test_logout_revokes_both_tokens(self):
+        tokens = self.login()
+        self.assertEqual(self.farms(tokens['token']).status_code, 200)
+        response = self.post('/api/logout/', {'refresh_token': tokens['refresh_token']}, tokens['token'])
+        self.assertEqual(response.status_code, 200)
+        # Even though the principal is still cached
+        self.assertEqual(self.farms(tokens['token']).status_code, 401)
+        self.assertEqual(self.post('/api/token/refresh/', {'refresh_token': tokens['refresh_token']}).status_code, 401)
+
+    def test_logout_only_revokes_the_callers_refresh_token(self):
+        other = make_user('other@example.com')
+        other_refresh = issue_refresh_token(other)
+        self.post('/api/logout/', {'refresh_token': other_refresh}, issue_access_token(self.user))
+        self.assertEqual(self.post('/api/token/refresh/', {'refresh_token': other_refresh}).status_code, 200)
+
+    def test_revoke_user_tokens(self):
+        access, refresh = issue_access_token(self.user), issue_refresh_token(self.user)
+        revoke_user_tokens(self.user.id)
+        self.assertEqual(self.farms(access).status_code, 401)
+        self.assertEqual(self.post('/api/token/refresh/', {'refresh_token': refresh}).status_code, 401)
+        # Tokens issued afterwards are unaffected
+        self.assertEqual(self.farms(issue_access_token(self.user)).status_code, 200)
+
+    def test_revocation_is_checked_in_memory(self):
+        token = issue_access_token(self.user)
+        self.farms(token)
+        with CaptureQueriesContext(connection) as queries:
+            self.farms(token)
+        self.assertFalse([q['sql'] for q in queries if 'revokedtoken' in q['sql'].lower()])
+
+    def test_other_processes_see_revocations_on_reload(self):
+        payload = decode_token(issue_access_token(self.user))
+        # As loaded by a process that wasn't the one revoking
+        revocations = RevocationList(refresh_interval=0)
+        self.assertFalse(revocations.is_revoked(payload['jti'], self.user.id, payload['iat']))
+        RevokedToken.objects.create(
+            jti=payload['jti'], user_id=self.user.id,
+            expires_at=datetime.datetime.fromtimestamp(payload['exp'], tz=datetime.timezone.utc),
+        )
+        self.assertTrue(revocations.is_revoked(payload['jti'], self.user.id, payload['iat']))
+        self.assertFalse(revocations.is_revoked('another-jti', self.user.id, payload['iat']))
+
+
+class PasswordRehashTests(TokenTestCase):
+    def stored_hash(self):
+        return User.objects.get(id=self.user.id).password
+
+    def test_login_upgrades_an_outdated_algorithm(self):
+        self.user.password = make_password('secret', hasher='pbkdf2_sha1')
+        self.user.save()
+        self.login()
+        self.assertEqual(self.stored_hash().split('$')[0], get_hasher('default').algorithm)
+        # The upgraded hash still logs in, and isn't rewritten again
+        upgraded = self.stored_hash()
+        self.login()
+        self.assertEqual(self.stored_hash(), upgraded)
+
+    def test_login_upgrades_an_outdated_cost(self):
+        with mock.patch.object(TunedScryptPasswordHasher, 'work_factor', 2 ** 10):
+            self.user.password = make_password('secret', hasher='scrypt')
+        self.user.save()
+        self.login()
+        self.assertTrue(self.stored_hash().startswith(f'scrypt${TunedScryptPasswordHasher.work_factor}$'))
+
+    def test_stock_hashers_verify_without_shadowing_the_tuned_ones(self):
+        self.assertIn('django.contrib.auth.hashers.BCryptSHA256PasswordHasher', settings.PASSWORD_HASHERS)
+        for algorithm in ('scrypt', 'argon2', 'pbkdf2_sha256'):
+            with self.subTest(algorithm=algorithm):
+                self.assertTrue(type(get_hasher(algorithm)).__name__.startswith('Tuned'))
+                self.assertTrue(check_password('secret', make_password('secret', hasher=algorithm)))
+        self.assertIs(type(identify_hasher(make_password('secret'))), type(get_hasher('default')))
+
+    def test_failed_login_leaves_the_hash(self):
+        self.user.password = make_password('secret', hasher='pbkdf2_sha1')
+        self.user.save()
+        response = self.post('/api/login/', {'email_address': 'farmer@example.com', 'password': 'wrong'})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(self.stored_hash(), self.user.password)
+
+
+class HashPlaintextPasswordsTests(TestCase):
+    def setUp(self):
+        self.passwords = {
+            'plaintext@example.com': 'hunter2',
+            'dollar@example.com': 'pa$$word',
+            'hashed@example.com': make_password('secret'),
+            'unusable@example.com': make_password(None),
+            'unknown@example.com': 'md5$salt$0123456789abcdef',
+            'bcrypt@example.com': 'bcrypt$$2b$12$abcdefghijklmnopqrstuv',
+            'empty@example.com': '',
+        }
+        for email, password in self.passwords.items():
+            User.objects.create(email_address=email, password=password, role='farmer')
+
+    def run_command(self, *args):
+        out = StringIO()
+        call_command('hash_plaintext_passwords', *args, stdout=out)
+        return out.getvalue()
+
+    def stored(self):
+        return dict(User.objects.values_list('email_address', 'password'))
+
+    def test_hashes_only_plaintext(self):
+        self.assertIn('Hashed 2 plaintext passwords', self.run_command())
+        stored = self.stored()
+        self.assertTrue(check_password('hunter2', stored['plaintext@example.com']))
+        self.assertTrue(check_password('pa$$word', stored['dollar@example.com']))
+        for email in ('hashed@example.com', 'unusable@example.com', 'unknown@example.com', 'bcrypt@example.com', 'empty@example.com'):
+            with self.subTest(email=email):
+                self.assertEqual(stored[email], self.passwords[email])
+
+    def test_is_idempotent(self):
+        self.run_command()
+        hashed = self.stored()
+        self.assertIn('0 accounts with plaintext passwords', self.run_command())
+        self.assertEqual(self.stored(), hashed)
+
+    def test_dry_run_changes_nothing(self):
+        self.assertIn('2 accounts with plaintext passwords', self.run_command('--dry-run'))
+        self.assertEqual(self.stored(), self.passwords)
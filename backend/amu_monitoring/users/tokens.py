@@ -0,0 +1,55 @@
+import datetime
+import time
+import uuid
+import jwt
+from django.conf import settings
+
+ACCESS_TOKEN_LIFETIME = datetime.timedelta(minutes=settings.JWT_ACCESS_TOKEN_LIFETIME_MINUTES)
+REFRESH_TOKEN_LIFETIME = datetime.timedelta(days=settings.JWT_REFRESH_TOKEN_LIFETIME_DAYS)
+
+
+def _encode(payload, lifetime, token_type):
+    # jti identifies the token for revocation; iat is a float so a token
+    # issued straight after a user-wide revocation is not caught by it
+    issued_at = time.time()
+    payload.update({
+        'type': token_type,
+        'jti': uuid.uuid4().hex,
+        'iat': issued_at,
+        'exp': int(issued_at + lifetime.total_seconds()),
+    })
+    return jwt.encode(payload, settings.SECRET_KEY, algorithm='HS256')
+
+
+def issue_access_token(user):
+    # Carry everything the API needs to scope a request, so authenticated
+    # requests never have to look the user up again
+    return _encode({
+        'user_id': user.id,
+        'email': user.email_address,
+        'role': user.role,
+        'district': user.district,
+    }, ACCESS_TOKEN_LIFETIME, 'access')
+
+
+def issue_refresh_token(user):
+    return _encode({'user_id': user.id}, REFRESH_TOKEN_LIFETIME, 'refresh')
+
+
+def decode_token(token, token_type='access'):
+    """
+    Verify `token` and return its payload. Raises jwt.InvalidTokenError if
+    the signature, expiry or token type is wrong.
+    """
+    payload = jwt.decode(
+        token,
+        settings.SECRET_KEY,
+        algorithms=['HS256'],
+        options={'require': ['exp', 'user_id']}
+    )
+    # Access tokens issued before refresh tokens existed carry no type
+    if payload.get('type', 'access') != token_type:
+        raise jwt.InvalidTokenError(f'Expected a {token_type} token')
+    if token_type == 'access' and 'role' not in payload:
+        raise jwt.InvalidTokenError('Token has no role')
+    return payload
@@ -1,8 +1,10 @@
-from django.http import JsonResponse
+from amu_monitoring.responses import JsonResponse
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from django.views import View
 from .models import User
+from .tokens import issue_access_token
+from treatments.assignment import fill_vet
 from django.contrib.auth.hashers import make_password
 import json
 import logging
@@ -13,9 +15,7 @@ logger = logging.getLogger(__name__)
 class RegisterView(View):
     def post(self, request):
         try:
-            print("RegisterView POST request received")
             data = json.loads(request.body)
-            print(f"Request data: {data}")
             
             first_name = data.get('first_name')
             last_name = data.get('last_name')
@@ -24,7 +24,7 @@ class RegisterView(View):
             role = data.get('role')
 
             if not all([first_name, last_name, email_address, password, role]):
-                print("Missing fields")
+                logger.info("Registration rejected: missing fields")
                 return JsonResponse({'error': 'All fields are required.'}, status=400)
             
             valid_roles = [choice[0] for choice in User.ROLE_CHOICES]
@@ -32,10 +32,9 @@ class RegisterView(View):
                 return JsonResponse({'error': 'Invalid role selected.'}, status=400)
 
             if User.objects.filter(email_address=email_address).exists():
-                print(f"User already exists: {email_address}")
+                logger.info("Registration rejected: %s is already registered", email_address)
                 return JsonResponse({'error': 'Email already registered.'}, status=400)
 
-            print(f"Creating user: {email_address} with role {role}")
             hashed_password = make_password(password)
             user = User.objects.create(
                 first_name=first_name,
@@ -44,10 +43,10 @@ class RegisterView(View):
                 password=hashed_password,
                 role=role
             )
-            print(f"User created successfully with ID: {user.id}")
+            logger.info("Registered user %s (%s) as %s", user.id, email_address, role)
             return JsonResponse({'message': 'User registered successfully.'}, status=201)
         except Exception as e:
-            print(f"Exception in RegisterView: {e}")
+            logger.exception("Registration failed")
             return JsonResponse({'error': str(e)}, status=500)
 
 @method_decorator(csrf_exempt, name='dispatch')
@@ -55,13 +54,16 @@ class UpdateProfileView(View):
     def post(self, request):
         try:
             data = json.loads(request.body)
-            email_address = data.get('email') # Identifying user by email for now
+            email_address = data.get('email') # Legacy: identifying user by email when no token is sent
             
-            if not email_address:
+            if not email_address and request.principal is None:
                 return JsonResponse({'error': 'Email is required to identify user.'}, status=400)
                 
             try:
-                user = User.objects.get(email_address=email_address)
+                if request.principal is not None:
+                    user = User.objects.get(id=request.principal.id)
+                else:
+                    user = User.objects.get(email_address=email_address)
             except User.DoesNotExist:
                 return JsonResponse({'error': 'User not found.'}, status=404)
 
@@ -72,9 +74,15 @@ class UpdateProfileView(View):
             if 'phone_number' in data: user.phone_number = data['phone_number']
             
             user.save()
+
+            # A vet who has just set their district can start on its queue
+            if user.role == 'vet':
+                fill_vet(user)
             
             return JsonResponse({
                 'message': 'Profile updated successfully.',
+                # Re-issued so the token's district matches the new profile
+                'token': issue_access_token(user),
                 'user': {
                     'state': user.state,
                     'district': user.district,
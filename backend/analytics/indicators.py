@@ -0,0 +1,123 @@
+"""
+Biomass-normalised antimicrobial use indicators.
+
+The headline indicator is mg/PCU: milligrams of active substance administered
+per population correction unit, i.e. per kg of estimated live weight of the
+animals at risk. A farm's PCU is `total_animals * avg_weight`; farms with no
+average weight recorded fall back to a standard weight for their species.
+
+Everything is computed with pandas group-bys over two frames (treatments and
+farms) loaded with one query each, so a window of a million treatments takes
+seconds. Results for a window are cached as a whole, for every level at once.
+"""
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.cache import cache
+
+from farms.models import Farm
+from treatments.models import Treatment
+
+# Standard weight at treatment (kg) per species, used when a farm has no
+# average weight recorded
+STANDARD_WEIGHTS_KG = {
+    'AVI': 1.0,
+    'BOV': 425.0,
+    'SUI': 65.0,
+    'CAP': 20.0,
+    'OVI': 20.0,
+    'EQU': 400.0,
+    'LEP': 1.4,
+    'PIS': 1.0,
+    'CAM': 500.0,
+    'API': 0.0001,
+}
+
+# Level -> columns the indicators are grouped by
+INDICATOR_LEVELS = {
+    'farm': ['farm_id', 'state', 'district', 'species_type'],
+    'district': ['state', 'district'],
+    'species': ['species_type'],
+}
+
+TREATMENT_COLUMNS = ['farm_id', 'quantity_mg']
+FARM_COLUMNS = ['farm_id', 'state', 'district', 'species_type', 'total_animals', 'avg_weight']
+
+
+def load_frames(date_from=None, date_to=None):
+    """Treatments in the window (rejected ones excluded) and every farm, as DataFrames."""
+    treatments = Treatment.objects.exclude(status='rejected')
+    if date_from: treatments = treatments.filter(date__gte=date_from)
+    if date_to: treatments = treatments.filter(date__lte=date_to)
+    treatments = pd.DataFrame.from_records(
+        treatments.order_by().values_list(*TREATMENT_COLUMNS).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE),
+        columns=TREATMENT_COLUMNS,
+    )
+    farms = pd.DataFrame.from_records(
+        Farm.objects.order_by().values_list('id', *FARM_COLUMNS[1:]).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE),
+        columns=FARM_COLUMNS,
+    )
+    return treatments, farms
+
+
+def farm_pcu(farms):
+    """Population correction units (kg of animals) per farm row."""
+    standard = farms['species_type'].map(STANDARD_WEIGHTS_KG).astype(float).fillna(0.0)
+    weight = farms['avg_weight'].astype(float)
+    weight = weight.where(weight > 0, standard)
+    return farms['total_animals'].astype(float).clip(lower=0) * weight
+
+
+def compute_indicators(treatments, farms, levels=INDICATOR_LEVELS):
+    """
+    Returns {level: DataFrame} with, per group: treatment_count,
+    quantity_recorded (treatments with a quantity), quantity_mg, pcu,
+    mg_per_pcu and treatments_per_1000_pcu.
+
+    PCU counts every farm in the group, treated or not, since the indicator
+    is use relative to the whole population at risk.
+    """
+    # An all-NULL column comes back from the database as object dtype
+    treatments = treatments.assign(quantity_mg=treatments['quantity_mg'].astype(float))
+    per_farm = treatments.groupby('farm_id', sort=False).agg(
+        treatment_count=('farm_id', 'size'),
+        quantity_recorded=('quantity_mg', 'count'),
+        quantity_mg=('quantity_mg', 'sum'),
+    )
+    frame = farms.join(per_farm, on='farm_id')
+    frame[['treatment_count', 'quantity_recorded', 'quantity_mg']] = (
+        frame[['treatment_count', 'quantity_recorded', 'quantity_mg']].fillna(0)
+    )
+    frame['district'] = frame['district'].fillna('')
+    frame['pcu'] = farm_pcu(frame)
+
+    measures = ['treatment_count', 'quantity_recorded', 'quantity_mg', 'pcu']
+    results = {}
+    for level, keys in levels.items():
+        grouped = frame.groupby(keys, sort=True)[measures].sum().reset_index()
+        pcu = grouped['pcu'].where(grouped['pcu'] > 0)
+        grouped['mg_per_pcu'] = grouped['quantity_mg'] / pcu
+        grouped['treatments_per_1000_pcu'] = grouped['treatment_count'] * 1000 / pcu
+        grouped[['treatment_count', 'quantity_recorded']] = grouped[['treatment_count', 'quantity_recorded']].astype(np.int64)
+        results[level] = grouped
+    return results
+
+
+def _records(frame):
+    frame = frame.round({'quantity_mg': 3, 'pcu': 3, 'mg_per_pcu': 6, 'treatments_per_1000_pcu': 6})
+    # NaN (no PCU) isn't valid JSON
+    return frame.astype(object).where(frame.notna(), None).to_dict('records')
+
+
+def get_indicators(date_from=None, date_to=None):
+    """
+    {level: [row, ...]} for the window, from the cache when it was computed
+    in the last AMU_INDICATOR_CACHE_TTL seconds.
+    """
+    key = f"amu-indicators:{date_from or ''}:{date_to or ''}"
+    indicators = cache.get(key)
+    if indicators is None:
+        results = compute_indicators(*load_frames(date_from, date_to))
+        indicators = {level: _records(frame) for level, frame in results.items()}
+        cache.set(key, indicators, settings.AMU_INDICATOR_CACHE_TTL)
+    return indicators
@@ -0,0 +1,64 @@
+import time
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand
+
+from analytics.indicators import STANDARD_WEIGHTS_KG, compute_indicators
+
+
+class Command(BaseCommand):
+    help = 'Time the mg/PCU indicator engine on a synthetic dataset (in memory, no database)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--treatments', type=int, default=1_000_000, help='Synthetic treatments (default: 1M)')
+        parser.add_argument('--farms', type=int, default=50_000, help='Synthetic farms (default: 50k)')
+        parser.add_argument('--districts', type=int, default=400, help='Distinct districts (default: 400)')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs to time; the best is reported (default: 3)')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def synthesize(self, n_treatments, n_farms, n_districts, seed):
+        rng = np.random.default_rng(seed)
+        species = np.array(list(STANDARD_WEIGHTS_KG))
+        district = rng.integers(0, n_districts, n_farms)
+        farms = pd.DataFrame({
+            'farm_id': np.arange(1, n_farms + 1),
+            'state': np.char.add('State ', (district % 30).astype(str)),
+            'district': np.char.add('District ', district.astype(str)),
+            'species_type': species[rng.integers(0, len(species), n_farms)],
+            'total_animals': rng.integers(1, 5000, n_farms),
+            # Some farms have no weight recorded and fall back to the standard one
+            'avg_weight': np.where(rng.random(n_farms) < 0.1, 0.0, rng.uniform(0.5, 600, n_farms)),
+        })
+        quantity = rng.uniform(10, 50_000, n_treatments)
+        # Not every treatment records a quantity
+        quantity[rng.random(n_treatments) < 0.2] = np.nan
+        treatments = pd.DataFrame({
+            'farm_id': rng.integers(1, n_farms + 1, n_treatments),
+            'quantity_mg': quantity,
+        })
+        return treatments, farms
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        treatments, farms = self.synthesize(options['treatments'], options['farms'], options['districts'], options['seed'])
+        self.stdout.write(
+            f"Synthesized {len(treatments):,} treatments over {len(farms):,} farms "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+
+        timings = []
+        for _ in range(max(options['repeat'], 1)):
+            started = time.perf_counter()
+            results = compute_indicators(treatments, farms)
+            timings.append(time.perf_counter() - started)
+
+        best = min(timings)
+        self.stdout.write(
+            f"compute_indicators: best {best:.3f}s, median {sorted(timings)[len(timings) // 2]:.3f}s "
+            f"({len(treatments) / best:,.0f} treatments/sec)"
+        )
+        for level, frame in results.items():
+            self.stdout.write(f"  {level:<9} {len(frame):>8,} rows")
+        if options['verbosity'] >= 2:
+            self.stdout.write(results['district'].sort_values('mg_per_pcu', ascending=False).head(10).to_string(index=False))
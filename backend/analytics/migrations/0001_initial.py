@@ -0,0 +1,85 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:33
+
+from django.db import migrations, models
+from django.db.models import Count, F
+from django.db.models.functions import TruncMonth
+
+
+def backfill_usage_rollups(apps, schema_editor):
+    Treatment = apps.get_model('treatments', 'Treatment')
+    for model_name, period in (('DailyUsage', F('date')), ('MonthlyUsage', TruncMonth('date'))):
+        model = apps.get_model('analytics', model_name)
+        rows = (
+            Treatment.objects.annotate(period=period)
+            .values('period', 'farm__state', 'farm__district', 'farm__species_type', 'antibiotic_name', 'reason', 'status')
+            .annotate(n=Count('id'))
+            .order_by()
+        )
+        model.objects.bulk_create(
+            [
+                model(
+                    period=row['period'], state=row['farm__state'], district=row['farm__district'] or '',
+                    species_type=row['farm__species_type'], antibiotic_name=row['antibiotic_name'],
+                    reason=row['reason'], status=row['status'], treatment_count=row['n'],
+                )
+                for row in rows
+            ],
+            batch_size=1000
+        )
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('farms', '0006_farm_farm_district_idx'),
+        ('treatments', '0004_treatment_treatment_vet_status_date_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField()),
+                ('state', models.CharField(max_length=100)),
+                ('district', models.CharField(blank=True, default='', max_length=100)),
+                ('species_type', models.CharField(max_length=20)),
+                ('antibiotic_name', models.CharField(max_length=100)),
+                ('reason', models.CharField(max_length=20)),
+                ('status', models.CharField(max_length=20)),
+                ('treatment_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MonthlyUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField()),
+                ('state', models.CharField(max_length=100)),
+                ('district', models.CharField(blank=True, default='', max_length=100)),
+                ('species_type', models.CharField(max_length=20)),
+                ('antibiotic_name', models.CharField(max_length=100)),
+                ('reason', models.CharField(max_length=20)),
+                ('status', models.CharField(max_length=20)),
+                ('treatment_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['district', 'period'], name='monthly_usage_district_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='monthlyusage',
+            constraint=models.UniqueConstraint(fields=('period', 'state', 'district', 'species_type', 'antibiotic_name', 'reason', 'status'), name='monthly_usage_key'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyusage',
+            index=models.Index(fields=['district', 'period'], name='daily_usage_district_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyusage',
+            constraint=models.UniqueConstraint(fields=('period', 'state', 'district', 'species_type', 'antibiotic_name', 'reason', 'status'), name='daily_usage_key'),
+        ),
+        migrations.RunPython(backfill_usage_rollups, migrations.RunPython.noop),
+    ]
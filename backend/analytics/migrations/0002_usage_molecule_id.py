@@ -0,0 +1,87 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:24
+
+from django.db import migrations, models
+from django.db.models import Case, Count, F, Value, When
+from django.db.models.functions import Coalesce, TruncMonth
+
+
+def rekey_usage_rollups(apps, schema_editor):
+    # Existing rows are keyed by antibiotic name; recount linked treatments
+    # under their molecule
+    Treatment = apps.get_model('treatments', 'Treatment')
+    for model_name, period in (('DailyUsage', F('date')), ('MonthlyUsage', TruncMonth('date'))):
+        model = apps.get_model('analytics', model_name)
+        rows = (
+            Treatment.objects.annotate(
+                period=period,
+                rollup_molecule_id=Coalesce('molecule_id', 0),
+                rollup_name=Case(When(molecule__isnull=True, then='antibiotic_name'), default=Value('')),
+            )
+            .values(
+                'period', 'farm__state', 'farm__district', 'farm__species_type',
+                'rollup_molecule_id', 'rollup_name', 'reason', 'status',
+            )
+            .annotate(n=Count('id'))
+            .order_by()
+        )
+        model.objects.all().delete()
+        model.objects.bulk_create(
+            [
+                model(
+                    period=row['period'], state=row['farm__state'], district=row['farm__district'] or '',
+                    species_type=row['farm__species_type'], molecule_id=row['rollup_molecule_id'],
+                    antibiotic_name=row['rollup_name'], reason=row['reason'], status=row['status'],
+                    treatment_count=row['n'],
+                )
+                for row in rows
+            ],
+            batch_size=1000
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+        ('treatments', '0006_treatment_molecule'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='dailyusage',
+            name='daily_usage_key',
+        ),
+        migrations.RemoveConstraint(
+            model_name='monthlyusage',
+            name='monthly_usage_key',
+        ),
+        migrations.AddField(
+            model_name='dailyusage',
+            name='molecule_id',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='monthlyusage',
+            name='molecule_id',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='dailyusage',
+            name='antibiotic_name',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='monthlyusage',
+            name='antibiotic_name',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyusage',
+            constraint=models.UniqueConstraint(fields=('period', 'state', 'district', 'species_type', 'molecule_id', 'antibiotic_name', 'reason', 'status'), name='daily_usage_key'),
+        ),
+        migrations.AddConstraint(
+            model_name='monthlyusage',
+            constraint=models.UniqueConstraint(fields=('period', 'state', 'district', 'species_type', 'molecule_id', 'antibiotic_name', 'reason', 'status'), name='monthly_usage_key'),
+        ),
+        migrations.RunPython(rekey_usage_rollups, migrations.RunPython.noop),
+    ]
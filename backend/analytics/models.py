@@ -0,0 +1,82 @@
+from django.db import models
+from django.db.models import F
+
+# Columns every rollup row is keyed by, besides its period
+ROLLUP_DIMENSIONS = ('state', 'district', 'species_type', 'molecule_id', 'antibiotic_name', 'reason', 'status')
+
+
+class UsageRollup(models.Model):
+    """
+    Treatment counts pre-aggregated per period and (state, district,
+    species_type, molecule_id, antibiotic_name, reason, status).
+
+    Treatments linked to a reference molecule are counted under its id, with
+    antibiotic_name left blank, so every spelling of a drug lands in one row.
+    Only unlinked treatments (molecule_id 0) are told apart by the name typed.
+
+    Kept in step with Treatment by the signal handlers in analytics.signals;
+    code that writes treatments with bulk_create() or QuerySet.update() must
+    call analytics.rollups.record() itself, and code that changes a farm's
+    state, district or species_type analytics.rollups.move_farm() (as
+    farms.serializers.update_farm does). Run the rebuild_usage_rollups
+    command to recompute both tables from treatments_treatment, e.g. after
+    deleting a molecule (its treatments are unlinked with an UPDATE).
+    """
+    period = models.DateField()
+    state = models.CharField(max_length=100)
+    # '' rather than NULL so the unique constraint covers farms with no district
+    district = models.CharField(max_length=100, blank=True, default='')
+    species_type = models.CharField(max_length=20)
+    # 0 rather than NULL, as for district; not a foreign key so deleting a
+    # molecule doesn't reach into the rollups
+    molecule_id = models.PositiveIntegerField(default=0)
+    antibiotic_name = models.CharField(max_length=100, blank=True, default='')
+    reason = models.CharField(max_length=20)
+    status = models.CharField(max_length=20)
+    treatment_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def adjust(cls, period, key, delta):
+        if not delta:
+            return
+        rows = cls.objects.filter(period=period, **key)
+        if delta < 0:
+            rows = rows.filter(treatment_count__gte=-delta)
+        if rows.update(treatment_count=F('treatment_count') + delta) or delta < 0:
+            # A decrement with no row to apply it to means the table has
+            # drifted; leave it for rebuild_usage_rollups.
+            return
+        _, created = cls.objects.get_or_create(period=period, **key, defaults={'treatment_count': delta})
+        if not created:
+            rows.update(treatment_count=F('treatment_count') + delta)
+
+
+class DailyUsage(UsageRollup):
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['period', *ROLLUP_DIMENSIONS], name='daily_usage_key'),
+        ]
+        indexes = [
+            models.Index(fields=['district', 'period'], name='daily_usage_district_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.period} {self.district} {self.antibiotic_name}: {self.treatment_count}"
+
+
+class MonthlyUsage(UsageRollup):
+    """As DailyUsage, with `period` the first day of the month."""
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['period', *ROLLUP_DIMENSIONS], name='monthly_usage_key'),
+        ]
+        indexes = [
+            models.Index(fields=['district', 'period'], name='monthly_usage_district_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.period:%Y-%m} {self.district} {self.antibiotic_name}: {self.treatment_count}"
@@ -0,0 +1,160 @@
+"""
+Incremental maintenance of the usage rollup tables.
+
+Each treatment contributes one to a DailyUsage and a MonthlyUsage row. A
+change to any rolled-up column (status, date, molecule, antibiotic, reason
+or farm) moves it from its old rows to its new ones, and a farm whose state,
+district or species changes takes its treatments' counts along with it
+(move_farm). Treatments linked to a molecule are keyed by its id alone; the
+antibiotic name only keys the unlinked ones.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Value, When
+from django.db.models.functions import Coalesce, TruncMonth
+
+from farms.models import Farm
+from .models import DailyUsage, MonthlyUsage, ROLLUP_DIMENSIONS
+
+FARM_DIMENSIONS = ('state', 'district', 'species_type')
+TREATMENT_DIMENSIONS = ('molecule_id', 'antibiotic_name', 'reason', 'status')
+
+
+def entry(date, farm, values):
+    """
+    The rollup row a treatment counts towards, as a hashable
+    (date, dimension values) pair. `farm` and `values` are mappings.
+    """
+    # Freshly created instances may still hold the date as posted ('2024-05-01')
+    date = DailyUsage._meta.get_field('period').to_python(date)
+    molecule_id = values['molecule_id']
+    return (
+        date,
+        (
+            farm['state'], farm['district'] or '', farm['species_type'],
+            molecule_id or 0, '' if molecule_id else values['antibiotic_name'],
+            values['reason'], values['status'],
+        ),
+    )
+
+
+def record(entries, delta=1):
+    """Add `delta` to the daily and monthly rows of every entry."""
+    _apply(Counter(entries), delta)
+
+
+def _apply(daily, delta):
+    """Add `delta` times each entry's count in the Counter `daily` to its daily and monthly rows."""
+    monthly = Counter()
+    for (date, key), n in daily.items():
+        monthly[date.replace(day=1), key] += n
+    with transaction.atomic():
+        for model, counts in ((DailyUsage, daily), (MonthlyUsage, monthly)):
+            for (period, key), n in counts.items():
+                model.adjust(period, dict(zip(ROLLUP_DIMENSIONS, key)), n * delta)
+
+
+def record_transition(old, new):
+    """Move one treatment from entry `old` to entry `new` (either may be None)."""
+    if old == new:
+        return
+    if old is not None:
+        record([old], -1)
+    if new is not None:
+        record([new], 1)
+
+
+def treatment_entry(treatment, loaded=None):
+    """
+    The entry for `treatment` as it is now or, given `loaded` (the field values
+    it was read from the database with), as it was before this save.
+    """
+    values = {field: getattr(treatment, field) for field in ('farm_id', 'date') + TREATMENT_DIMENSIONS}
+    if loaded is not None:
+        values = {field: loaded.get(field, value) for field, value in values.items()}
+
+    if values['farm_id'] == treatment.farm_id:
+        farm = treatment.farm
+        farm = {field: getattr(farm, field) for field in FARM_DIMENSIONS}
+    else:
+        farm = Farm.objects.values(*FARM_DIMENSIONS).get(id=values['farm_id'])
+    return entry(values['date'], farm, values)
+
+
+def count_entries(treatments, farm=None):
+    """
+    A Counter of the entries of a Treatment queryset, in one GROUP BY. `farm`
+    (a mapping) stands in for every treatment's own farm when given.
+    """
+    farm_columns = () if farm is not None else tuple(f'farm__{field}' for field in FARM_DIMENSIONS)
+    rows = treatments.values('date', *farm_columns, *TREATMENT_DIMENSIONS).annotate(n=Count('id')).order_by()
+    counts = Counter()
+    for row in rows:
+        row_farm = farm if farm is not None else {field: row[f'farm__{field}'] for field in FARM_DIMENSIONS}
+        counts[entry(row['date'], row_farm, row)] += row['n']
+    return counts
+
+
+def move(before, after):
+    """Swap the Counter of entries `before` for `after`, touching only the rows whose counts differ."""
+    with transaction.atomic():
+        _apply(before - after, -1)
+        _apply(after - before, 1)
+
+
+def move_farm(farm_id, old, new):
+    """
+    Move the counts of every treatment on the farm from its old (state,
+    district, species_type) to its new ones. `old` and `new` are mappings;
+    callers changing those columns with QuerySet.update() must call this
+    in the same transaction.
+    """
+    from treatments.models import Treatment
+
+    if all(old[field] == new[field] for field in FARM_DIMENSIONS):
+        return
+    treatments = Treatment.objects.filter(farm_id=farm_id)
+    move(count_entries(treatments, old), count_entries(treatments, new))
+
+
+def rebuild(batch_size=1000):
+    """Recompute both tables from treatments_treatment. Returns (daily, monthly) row counts."""
+    from treatments.models import Treatment
+
+    totals = []
+    with transaction.atomic():
+        for model, period in ((DailyUsage, F('date')), (MonthlyUsage, TruncMonth('date'))):
+            rows = (
+                Treatment.objects.annotate(
+                    period=period,
+                    rollup_molecule_id=Coalesce('molecule_id', 0),
+                    rollup_name=Case(When(molecule__isnull=True, then='antibiotic_name'), default=Value('')),
+                )
+                .values(
+                    'period', 'farm__state', 'farm__district', 'farm__species_type',
+                    'rollup_molecule_id', 'rollup_name', 'reason', 'status',
+                )
+                .annotate(n=Count('id'))
+                .order_by()
+            )
+            model.objects.all().delete()
+            model.objects.bulk_create(
+                (
+                    model(
+                        period=row['period'],
+                        state=row['farm__state'],
+                        district=row['farm__district'] or '',
+                        species_type=row['farm__species_type'],
+                        molecule_id=row['rollup_molecule_id'],
+                        antibiotic_name=row['rollup_name'],
+                        reason=row['reason'],
+                        status=row['status'],
+                        treatment_count=row['n'],
+                    )
+                    for row in rows.iterator()
+                ),
+                batch_size=batch_size,
+            )
+            totals.append(model.objects.count())
+    return tuple(totals)
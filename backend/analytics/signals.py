@@ -0,0 +1,23 @@
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+from treatments.models import Treatment
+from . import rollups
+
+
+@receiver(post_save, sender=Treatment)
+def update_usage_rollups(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    loaded = getattr(instance, '_loaded_values', None)
+    if created:
+        rollups.record([rollups.treatment_entry(instance)])
+    elif loaded:
+        # Runs inside Treatment.save(), before _loaded_values is refreshed
+        rollups.record_transition(rollups.treatment_entry(instance, loaded), rollups.treatment_entry(instance))
+
+
+@receiver(pre_delete, sender=Treatment)
+def remove_from_usage_rollups(sender, instance, **kwargs):
+    # Before the row goes, so fields the instance was loaded without can be read
+    loaded = getattr(instance, '_loaded_values', None)
+    rollups.record([rollups.treatment_entry(instance, loaded)], -1)
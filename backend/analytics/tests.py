@@ -0,0 +1,225 @@
+import datetime
+import json
+from io import StringIO
+
+import pandas as pd
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from amu_monitoring.users.tokens import issue_access_token
+from reference_data.models import AntimicrobialFamily, Molecule
+from treatments.models import Treatment
+from treatments.tests import make_farm, make_treatment, make_user
+from . import rollups
+from .indicators import INDICATOR_LEVELS, STANDARD_WEIGHTS_KG, compute_indicators, farm_pcu, load_frames
+from .models import DailyUsage, MonthlyUsage, ROLLUP_DIMENSIONS
+
+
+class RollupAssertions:
+    def rollup_rows(self, model=DailyUsage):
+        return sorted(
+            model.objects.filter(treatment_count__gt=0)
+            .values_list('period', *ROLLUP_DIMENSIONS, 'treatment_count')
+        )
+
+    def assertRollupsMatchRebuild(self):
+        """The incrementally maintained rows are exactly what rebuild_usage_rollups would write."""
+        incremental = self.rollup_rows(DailyUsage), self.rollup_rows(MonthlyUsage)
+        rollups.rebuild()
+        self.assertEqual(incremental, (self.rollup_rows(DailyUsage), self.rollup_rows(MonthlyUsage)))
+
+
+class AnalyticsAccessTests(TestCase):
+    URLS = ('/api/analytics/usage/', '/api/analytics/usage/totals/', '/api/analytics/indicators/')
+
+    def setUp(self):
+        self.regulator = make_user('regulator@example.com', 'regulator')
+        self.farmer = make_user('farmer@example.com')
+        make_treatment(make_farm(self.farmer))
+
+    def get(self, url, user=None, **params):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {issue_access_token(user)}'} if user else {}
+        return self.client.get(url, params, **headers)
+
+    def test_requires_a_token(self):
+        for url in self.URLS:
+            with self.subTest(url=url):
+                self.assertEqual(self.get(url).status_code, 401)
+                # The legacy ?email= identification is not accepted
+                self.assertEqual(self.get(url, email=self.regulator.email_address).status_code, 401)
+
+    def test_requires_the_regulator_role(self):
+        for url in self.URLS:
+            with self.subTest(url=url):
+                self.assertEqual(self.get(url, self.farmer).status_code, 403)
+
+    def test_regulator_gets_the_statistics(self):
+        for url in self.URLS:
+            with self.subTest(url=url):
+                self.assertEqual(self.get(url, self.regulator).status_code, 200)
+        totals = self.get('/api/analytics/usage/totals/', self.regulator).json()
+        self.assertEqual(totals['results'], [{'treatment_count': 1}])
+
+
+class FarmEditRollupTests(RollupAssertions, TestCase):
+    def setUp(self):
+        self.farm = make_farm(make_user('farmer@example.com'))
+        make_treatment(self.farm)
+        make_treatment(self.farm, status='approved')
+        make_treatment(self.farm, date='2024-06-03')
+        make_treatment(make_farm(make_user('neighbour@example.com')))
+
+    def put(self, data):
+        return self.client.put(f'/api/farms/{self.farm.id}/', json.dumps(data), content_type='application/json')
+
+    def test_district_change_moves_the_farms_rows(self):
+        self.assertEqual(self.put({'district': 'South'}).status_code, 200)
+        districts = DailyUsage.objects.filter(treatment_count__gt=0).values_list('district', 'treatment_count')
+        self.assertEqual(sorted(districts), [('North', 1), ('South', 1), ('South', 1), ('South', 1)])
+        self.assertRollupsMatchRebuild()
+
+    def test_state_and_species_change(self):
+        self.assertEqual(self.put({'state': 'Other', 'species_type': 'SUI', 'district': ''}).status_code, 200)
+        self.assertRollupsMatchRebuild()
+
+    def test_other_edits_leave_the_rows(self):
+        before = self.rollup_rows(), self.rollup_rows(MonthlyUsage)
+        self.assertEqual(self.put({'name': 'Renamed', 'district': 'North'}).status_code, 200)
+        self.assertEqual((self.rollup_rows(), self.rollup_rows(MonthlyUsage)), before)
+
+
+class MoleculeRollupTests(RollupAssertions, TestCase):
+    def setUp(self):
+        family = AntimicrobialFamily.objects.create(name='Penicillins')
+        self.amoxicillin = Molecule.objects.create(name='Amoxicillin', family=family)
+        self.farm = make_farm(make_user('farmer@example.com'))
+        self.regulator = make_user('regulator@example.com', 'regulator')
+
+    def totals(self, **params):
+        return self.client.get(
+            '/api/analytics/usage/totals/', params,
+            HTTP_AUTHORIZATION=f'Bearer {issue_access_token(self.regulator)}',
+        )
+
+    def test_spellings_of_a_molecule_share_a_row(self):
+        make_treatment(self.farm, antibiotic_name='Amoxicillin', molecule=self.amoxicillin)
+        make_treatment(self.farm, antibiotic_name='amoxicilin ', molecule=self.amoxicillin)
+        make_treatment(self.farm, antibiotic_name='Mystery drug')
+
+        results = self.totals(group_by='molecule_id,antibiotic_name').json()['results']
+        self.assertEqual(results, [
+            {'molecule_id': 0, 'antibiotic_name': 'Mystery drug', 'treatment_count': 1},
+            {'molecule_id': self.amoxicillin.id, 'antibiotic_name': '', 'treatment_count': 2},
+        ])
+        filtered = self.totals(molecule_id=self.amoxicillin.id).json()['results']
+        self.assertEqual(filtered, [{'treatment_count': 2}])
+        self.assertRollupsMatchRebuild()
+
+    def test_bad_molecule_filter(self):
+        self.assertEqual(self.totals(molecule_id='amoxicillin').status_code, 400)
+
+    def test_linking_a_treatment_moves_its_count(self):
+        treatment = make_treatment(self.farm, antibiotic_name='Amoxycillin')
+        treatment.molecule = self.amoxicillin
+        treatment.save()
+        row = DailyUsage.objects.get(treatment_count__gt=0)
+        self.assertEqual((row.molecule_id, row.antibiotic_name), (self.amoxicillin.id, ''))
+        self.assertRollupsMatchRebuild()
+
+    def test_backfill_moves_the_counts(self):
+        make_treatment(self.farm, antibiotic_name='AMOXICILLIN')
+        make_treatment(self.farm, antibiotic_name='Amoxicillin', status='approved')
+        make_treatment(self.farm, antibiotic_name='Mystery drug')
+        call_command('backfill_treatment_molecules', '--batch-size', '2', stdout=StringIO())
+
+        self.assertEqual(Treatment.objects.filter(molecule=self.amoxicillin).count(), 2)
+        self.assertEqual(
+            sorted(DailyUsage.objects.filter(treatment_count__gt=0).values_list('molecule_id', 'antibiotic_name', 'status')),
+            [(0, 'Mystery drug', 'pending'), (self.amoxicillin.id, '', 'approved'), (self.amoxicillin.id, '', 'pending')],
+        )
+        self.assertRollupsMatchRebuild()
+
+
+class IndicatorTests(TestCase):
+    MAY = (datetime.date(2024, 5, 1), datetime.date(2024, 5, 31))
+
+    def setUp(self):
+        # North: a 40 x 500 kg herd (20000 PCU) and a pig farm with no
+        # weight recorded (40 x 65 kg = 2600 PCU). South: 40 x 500 kg.
+        self.herd = make_farm(make_user('herd@example.com'))
+        self.pigs = make_farm(make_user('pigs@example.com'), species_type='SUI')
+        self.pigs.avg_weight = 0
+        self.pigs.save()
+        self.south = make_farm(make_user('south@example.com'), district='South')
+
+        make_treatment(self.herd, quantity_mg=1000, date=self.MAY[0])
+        make_treatment(self.herd, quantity_mg=500, status='approved', date=self.MAY[1])
+        make_treatment(self.herd, date=datetime.date(2024, 5, 10))  # no quantity recorded
+        make_treatment(self.herd, quantity_mg=9999, status='rejected', date=datetime.date(2024, 5, 10))
+        make_treatment(self.herd, quantity_mg=700, date=self.MAY[0] - datetime.timedelta(days=1))
+        make_treatment(self.herd, quantity_mg=800, date=self.MAY[1] + datetime.timedelta(days=1))
+        make_treatment(self.south, quantity_mg=340, date=datetime.date(2024, 5, 15))
+
+    def indicators(self, *window):
+        return {
+            level: frame.set_index(INDICATOR_LEVELS[level]).to_dict('index')
+            for level, frame in compute_indicators(*load_frames(*(window or self.MAY))).items()
+        }
+
+    def test_farm_level_arithmetic(self):
+        herd = self.indicators()['farm'][(self.herd.id, 'State', 'North', 'BOV')]
+        # Rejected and out-of-window treatments are left out; the undosed
+        # one counts as a treatment but adds no milligrams
+        self.assertEqual(
+            {key: herd[key] for key in ('treatment_count', 'quantity_recorded', 'quantity_mg', 'pcu')},
+            {'treatment_count': 3, 'quantity_recorded': 2, 'quantity_mg': 1500.0, 'pcu': 20000.0},
+        )
+        self.assertAlmostEqual(herd['mg_per_pcu'], 0.075)
+        self.assertAlmostEqual(herd['treatments_per_1000_pcu'], 0.15)
+
+    def test_every_level(self):
+        indicators = self.indicators()
+        self.assertEqual(set(indicators), set(INDICATOR_LEVELS))
+        self.assertEqual(len(indicators['farm']), 3)
+
+        north, south = indicators['district'][('State', 'North')], indicators['district'][('State', 'South')]
+        # PCU counts the untreated pig farm too
+        self.assertEqual((north['treatment_count'], north['quantity_mg'], north['pcu']), (3, 1500.0, 22600.0))
+        self.assertAlmostEqual(north['mg_per_pcu'], 1500 / 22600)
+        self.assertAlmostEqual(south['mg_per_pcu'], 340 / 20000)
+
+        cattle, pigs = indicators['species']['BOV'], indicators['species']['SUI']
+        self.assertEqual((cattle['treatment_count'], cattle['quantity_mg'], cattle['pcu']), (4, 1840.0, 40000.0))
+        self.assertAlmostEqual(cattle['mg_per_pcu'], 1840 / 40000)
+        self.assertEqual((pigs['treatment_count'], pigs['quantity_mg'], pigs['mg_per_pcu']), (0, 0.0, 0.0))
+
+    def test_window_bounds_are_inclusive(self):
+        def herd_mg(*window):
+            return self.indicators(*window)['farm'][(self.herd.id, 'State', 'North', 'BOV')]['quantity_mg']
+
+        self.assertEqual(herd_mg(self.MAY[0], self.MAY[0]), 1000.0)
+        self.assertEqual(herd_mg(self.MAY[1], self.MAY[1]), 500.0)
+        self.assertEqual(herd_mg(self.MAY[0], None), 2300.0)
+        self.assertEqual(herd_mg(None, self.MAY[1]), 2200.0)
+        self.assertEqual(herd_mg(None, None), 3000.0)
+
+    def test_standard_weight_fallback(self):
+        farms = pd.DataFrame({
+            'species_type': ['SUI', 'SUI', 'SUI', 'BOV', 'XXX'],
+            'avg_weight': [None, 0.0, -5.0, 300.0, None],
+            'total_animals': [10, 10, 10, 10, 10],
+        })
+        self.assertEqual(
+            list(farm_pcu(farms)),
+            [10 * STANDARD_WEIGHTS_KG['SUI']] * 3 + [3000.0, 0.0],
+        )
+        pigs = self.indicators()['farm'][(self.pigs.id, 'State', 'North', 'SUI')]
+        self.assertEqual(pigs['pcu'], 40 * STANDARD_WEIGHTS_KG['SUI'])
+
+    def test_no_population_has_no_rate(self):
+        self.south.total_animals = 0
+        self.south.save()
+        south = self.indicators()['district'][('State', 'South')]
+        self.assertEqual(south['pcu'], 0.0)
+        self.assertTrue(pd.isna(south['mg_per_pcu']))
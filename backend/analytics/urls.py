@@ -0,0 +1,8 @@
+from django.urls import path
+from .views import IndicatorView, UsageTimeSeriesView, UsageTotalsView
+
+urlpatterns = [
+    path('usage/', UsageTimeSeriesView.as_view(), name='usage-time-series'),
+    path('usage/totals/', UsageTotalsView.as_view(), name='usage-totals'),
+    path('indicators/', IndicatorView.as_view(), name='amu-indicators'),
+]
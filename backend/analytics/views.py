@@ -0,0 +1,122 @@
+import datetime
+
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+from amu_monitoring.responses import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+
+from amu_monitoring.users.middleware import role_required
+from .indicators import INDICATOR_LEVELS, get_indicators
+from .models import DailyUsage, MonthlyUsage, ROLLUP_DIMENSIONS
+
+ROLLUP_MODELS = {'day': DailyUsage, 'month': MonthlyUsage}
+
+
+def _month_aligned(date_from, date_to):
+    """True if the window starts on a month boundary and ends on the last day of a month."""
+    return (
+        (date_from is None or date_from.day == 1)
+        and (date_to is None or (date_to + datetime.timedelta(days=1)).day == 1)
+    )
+
+
+def parse_window(request):
+    """(date_from, date_to) from the query string; either may be None. Raises ValueError."""
+    date_from = datetime.date.fromisoformat(request.GET['date_from']) if request.GET.get('date_from') else None
+    date_to = datetime.date.fromisoformat(request.GET['date_to']) if request.GET.get('date_to') else None
+    return date_from, date_to
+
+
+@method_decorator(role_required('regulator'), name='dispatch')
+class UsageStatisticsBaseView(View):
+    """
+    Regulator-only queries over the usage rollup tables. Every dimension in
+    ROLLUP_DIMENSIONS can be used as an exact-match filter or in `group_by`.
+    Antibiotics are grouped by molecule_id; antibiotic_name is only set on
+    rows for treatments not linked to a molecule (molecule_id 0).
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        group_by = [dim for dim in request.GET.get('group_by', '').split(',') if dim]
+        unknown = set(group_by) - set(ROLLUP_DIMENSIONS)
+        if unknown:
+            return JsonResponse({'error': f"Cannot group by {', '.join(sorted(unknown))}; choose from {', '.join(ROLLUP_DIMENSIONS)}"}, status=400)
+        try:
+            date_from, date_to = parse_window(request)
+        except ValueError:
+            return JsonResponse({'error': 'Invalid date_from or date_to'}, status=400)
+
+        filters = {dim: request.GET[dim] for dim in ROLLUP_DIMENSIONS if request.GET.get(dim)}
+        if 'molecule_id' in filters and not filters['molecule_id'].isdigit():
+            return JsonResponse({'error': 'Invalid molecule_id'}, status=400)
+        return super().dispatch(request, group_by, filters, date_from, date_to, *args, **kwargs)
+
+    def aggregate(self, model, group_by, filters, date_from, date_to, *columns):
+        rows = model.objects.filter(**filters)
+        if date_from: rows = rows.filter(period__gte=date_from)
+        if date_to: rows = rows.filter(period__lte=date_to)
+        fields = [*columns, *group_by]
+        if not fields:
+            return [rows.aggregate(treatment_count=Coalesce(Sum('treatment_count'), 0))]
+        return list(
+            rows.values(*fields).annotate(treatment_count=Sum('treatment_count'))
+            .filter(treatment_count__gt=0).order_by(*fields)
+        )
+
+
+class UsageTimeSeriesView(UsageStatisticsBaseView):
+    """Treatment counts per day or month: ?period=month&group_by=district,antibiotic_name"""
+
+    def get(self, request, group_by, filters, date_from, date_to):
+        period = request.GET.get('period', 'month')
+        if period not in ROLLUP_MODELS:
+            return JsonResponse({'error': f"period must be one of {', '.join(ROLLUP_MODELS)}"}, status=400)
+        if period == 'month' and date_from:
+            # Monthly rows are dated the 1st; include the month date_from falls in
+            date_from = date_from.replace(day=1)
+
+        try:
+            results = self.aggregate(ROLLUP_MODELS[period], group_by, filters, date_from, date_to, 'period')
+            return JsonResponse({'period': period, 'group_by': group_by, 'results': results}, status=200)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+
+
+class UsageTotalsView(UsageStatisticsBaseView):
+    """Treatment counts over the whole window: ?group_by=antibiotic_name&date_from=2024-01-01"""
+
+    def get(self, request, group_by, filters, date_from, date_to):
+        # The monthly table is ~30x smaller; it gives exact totals whenever the
+        # window covers whole months
+        model = MonthlyUsage if _month_aligned(date_from, date_to) else DailyUsage
+        try:
+            results = self.aggregate(model, group_by, filters, date_from, date_to)
+            return JsonResponse({'group_by': group_by, 'results': results}, status=200)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+
+
+@method_decorator(role_required('regulator'), name='dispatch')
+class IndicatorView(View):
+    """mg/PCU and treatments per 1000 PCU: ?level=district&date_from=2024-01-01&species_type=BOV"""
+
+    FILTERS = ('state', 'district', 'species_type')
+
+    def get(self, request):
+        level = request.GET.get('level', 'district')
+        if level not in INDICATOR_LEVELS:
+            return JsonResponse({'error': f"level must be one of {', '.join(INDICATOR_LEVELS)}"}, status=400)
+        try:
+            date_from, date_to = parse_window(request)
+        except ValueError:
+            return JsonResponse({'error': 'Invalid date_from or date_to'}, status=400)
+
+        try:
+            rows = get_indicators(date_from, date_to)[level]
+            filters = {key: request.GET[key] for key in self.FILTERS if request.GET.get(key) and key in INDICATOR_LEVELS[level]}
+            if filters:
+                rows = [row for row in rows if all(row[key] == value for key, value in filters.items())]
+            return JsonResponse({'level': level, 'results': rows}, status=200)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
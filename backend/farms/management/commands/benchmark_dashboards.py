@@ -0,0 +1,46 @@
+from urllib.parse import urlencode
+from django.core.management.base import BaseCommand, CommandError
+from amu_monitoring.loadtest import run_asgi, run_wsgi, summarize
+from amu_monitoring.users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare p50/p99 latency and requests/sec of the sync dashboards under WSGI '
+        'with the async dashboards under ASGI, at a given concurrency'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000, help='Requests per run (default: 1000)')
+        parser.add_argument('--concurrency', type=int, default=32, help='Requests in flight (default: 32)')
+        parser.add_argument('--farmer', help='Farmer email (default: the farmer with the most farms)')
+        parser.add_argument('--vet', help='Vet email (default: the first vet)')
+        parser.add_argument('--host', default='localhost', help='Host header; must be in ALLOWED_HOSTS')
+
+    def handle(self, *args, **options):
+        farmer = options['farmer'] or (
+            User.objects.filter(role='farmer').order_by('-farms__id').values_list('email_address', flat=True).first()
+        )
+        vet = options['vet'] or User.objects.filter(role='vet').order_by('id').values_list('email_address', flat=True).first()
+        if not farmer or not vet:
+            raise CommandError('Needs at least one farmer and one vet; pass --farmer/--vet or seed some data')
+
+        host = options['host']
+        runs = [
+            ('farmer dashboard', 'WSGI sync ', '/api/dashboard/', {'email': farmer}, run_wsgi),
+            ('farmer dashboard', 'ASGI async', '/api/dashboard/async/', {'email': farmer}, run_asgi),
+            ('vet dashboard', 'WSGI sync ', '/api/treatments/', {'vet_email': vet}, run_wsgi),
+            ('vet dashboard', 'ASGI async', '/api/treatments/vet-dashboard/async/', {'vet_email': vet}, run_asgi),
+        ]
+        self.stdout.write(f"{options['requests']} requests per run, {options['concurrency']} in flight")
+        for name, mode, path, params, run in runs:
+            query = urlencode(params)
+            # Warm up: connections, caches, imports
+            run(path, query, min(options['concurrency'], 20), options['concurrency'], host)
+            latencies, elapsed, failures = run(path, query, options['requests'], options['concurrency'], host)
+            stats = summarize(latencies, elapsed)
+            self.stdout.write(
+                f"{name:<17} {mode}  p50 {stats['p50_ms']:7.2f} ms  p99 {stats['p99_ms']:7.2f} ms  "
+                f"mean {stats['mean_ms']:7.2f} ms  {stats['rps']:8.1f} req/s"
+                + (self.style.ERROR(f"  {failures} failed") if failures else '')
+            )
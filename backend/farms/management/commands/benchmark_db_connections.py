@@ -0,0 +1,74 @@
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+from django.core.management.base import BaseCommand
+from django.db import connections
+from amu_monitoring.db import pool_stats
+from amu_monitoring.loadtest import close_worker_connections, run_wsgi, summarize
+from amu_monitoring.users.models import User
+
+# (label, CONN_MAX_AGE, CONN_HEALTH_CHECKS)
+CONNECTION_MODES = [
+    ('connection per request', 0, False),
+    ('persistent', 600, False),
+    ('persistent + health checks', 600, True),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare per-request latency with a new database connection per request '
+        'against persistent connections, with and without health checks'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per run (default: 2000)')
+        parser.add_argument('--concurrency', type=int, default=8, help='Requests in flight (default: 8)')
+        parser.add_argument('--farmer', help='Farmer email for the dashboard run (default: the farmer with the most farms)')
+        parser.add_argument('--host', default='localhost', help='Host header; must be in ALLOWED_HOSTS')
+
+    def handle(self, *args, **options):
+        farmer = options['farmer'] or (
+            User.objects.filter(role='farmer').order_by('-farms__id').values_list('email_address', flat=True).first()
+        )
+        endpoints = [('SELECT 1', '/api/health/db/', {})]
+        if farmer:
+            endpoints.append(('farmer dashboard', '/api/dashboard/', {'email': farmer}))
+
+        settings_dict = connections['default'].settings_dict
+        original = settings_dict['CONN_MAX_AGE'], settings_dict['CONN_HEALTH_CHECKS']
+        concurrency = options['concurrency']
+        self.stdout.write(
+            f"{connections['default'].vendor}, {options['requests']} requests per run, {concurrency} in flight"
+        )
+        try:
+            for name, path, params in endpoints:
+                query = urlencode(params)
+                for label, max_age, health_checks in CONNECTION_MODES:
+                    # Wrappers share this dict, so connections opened from
+                    # now on pick the new settings up
+                    settings_dict['CONN_MAX_AGE'], settings_dict['CONN_HEALTH_CHECKS'] = max_age, health_checks
+                    connections.close_all()
+                    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                        # Warm up on the same threads so persistent modes start with open connections
+                        run_wsgi(path, query, concurrency * 4, concurrency, options['host'], executor=executor)
+                        pool_stats.reset()
+                        latencies, elapsed, failures = run_wsgi(
+                            path, query, options['requests'], concurrency, options['host'], executor=executor,
+                        )
+                        pool = pool_stats.snapshot()
+                        close_worker_connections(executor, concurrency)
+                    self.report(name, label, summarize(latencies, elapsed), pool, failures)
+        finally:
+            settings_dict['CONN_MAX_AGE'], settings_dict['CONN_HEALTH_CHECKS'] = original
+            connections.close_all()
+
+    def report(self, name, label, stats, pool, failures):
+        connects = (
+            f"{pool['connects']:>5} connects ({pool['connect_ms_avg']:.2f} ms avg)" if pool['connects']
+            else f"{pool['connects']:>5} connects" + ' ' * 14
+        )
+        self.stdout.write(
+            f"{name:<16} {label:<27} p50 {stats['p50_ms']:7.2f} ms  p99 {stats['p99_ms']:7.2f} ms  "
+            f"mean {stats['mean_ms']:7.2f} ms  {stats['rps']:7.1f} req/s  {connects}"
+            + (self.style.ERROR(f"  {failures} failed") if failures else '')
+        )
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farms', '0005_alter_farm_village'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='farm',
+            index=models.Index(fields=['district'], name='farm_district_idx'),
+        ),
+    ]
@@ -36,5 +36,10 @@ class Farm(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['district'], name='farm_district_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} - {self.user.email_address}"
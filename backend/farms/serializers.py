@@ -0,0 +1,153 @@
+"""
+Lean farm serialization.
+
+Farms are read with `.values()` over an explicit column list instead of
+loading a model instance and running it through `model_to_dict`. The row's
+`updated_at` doubles as its version: it is sent back as the ETag and checked,
+with the row locked, before updates so concurrent edits can't overwrite each
+other. Edits to a farm's state, district or species move its treatments'
+usage rollup rows in the same transaction.
+"""
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from amu_monitoring.pagination import encode_cursor
+from analytics import rollups
+from .models import Farm
+
+FARM_EDITABLE_FIELDS = (
+    'name', 'state', 'district', 'village', 'farm_number', 'farm_type',
+    'species_type', 'total_animals', 'avg_weight', 'avg_feed_consumption',
+    'avg_water_consumption',
+)
+FARM_DETAIL_FIELDS = ('id', 'user') + FARM_EDITABLE_FIELDS + ('updated_at',)
+
+
+class StaleFarm(Exception):
+    """The farm changed after the client last read it."""
+
+
+def farm_etag(version):
+    return f'"{version}"'
+
+
+def parse_version(value):
+    """Accepts an ETag (quoted, optionally weak) or a bare `updated_at` string."""
+    value = value.strip()
+    if value.startswith('W/'):
+        value = value[2:]
+    parsed = parse_datetime(value.strip('"'))
+    if parsed is None:
+        raise ValueError(f'Invalid version: {value}')
+    return parsed
+
+
+def get_farm(farm_id):
+    row = Farm.objects.filter(id=farm_id).values(*FARM_DETAIL_FIELDS).get()
+    # Full microsecond precision; DjangoJSONEncoder would truncate to
+    # milliseconds and the value would never match on the way back in.
+    row['updated_at'] = row['updated_at'].isoformat()
+    return row
+
+
+def update_farm(farm_id, data, expected_version=None):
+    """
+    Writes the editable fields in `data` whose values differ from the stored
+    ones with a single UPDATE and returns the farm's version, which only
+    moves when something changed: a no-op edit keeps the client's ETag valid.
+    If `expected_version` is given the row must still carry that version.
+    """
+    with transaction.atomic():
+        current = (
+            Farm.objects.select_for_update().filter(id=farm_id)
+            .values(*FARM_EDITABLE_FIELDS, 'updated_at').first()
+        )
+        if current is None:
+            raise Farm.DoesNotExist()
+        if expected_version is not None and current['updated_at'] != expected_version:
+            raise StaleFarm()
+
+        changes = {}
+        for field in FARM_EDITABLE_FIELDS:
+            if field in data:
+                # Compare as stored, so "40" and 40 are the same head count
+                value = Farm._meta.get_field(field).to_python(data[field])
+                if value != current[field]:
+                    changes[field] = value
+        if not changes:
+            return current['updated_at'].isoformat()
+
+        # QuerySet.update() skips auto_now, so bump the version explicitly.
+        changes['updated_at'] = timezone.now()
+        Farm.objects.filter(id=farm_id).update(**changes)
+        if any(field in changes for field in rollups.FARM_DIMENSIONS):
+            rollups.move_farm(farm_id, current, {**current, **changes})
+        return changes['updated_at'].isoformat()
+
+
+DASHBOARD_TREATMENT_FIELDS = (
+    'id', 'farm_id', 'antibiotic_name', 'reason', 'treated_for', 'date',
+    'farm__name', 'farm__farm_number', 'status',
+)
+
+
+def dashboard_farms(user_id, farm_id=None):
+    """The user's farms with per-status treatment counts, as one annotated GROUP BY."""
+    farms = Farm.objects.filter(user_id=user_id)
+    if farm_id is not None:
+        farms = farms.filter(id=farm_id)
+    farms = list(
+        farms.annotate(
+            treatment_count=Count('treatments'),
+            pending_count=Count('treatments', filter=Q(treatments__status='pending')),
+            approved_count=Count('treatments', filter=Q(treatments__status='approved')),
+            rejected_count=Count('treatments', filter=Q(treatments__status='rejected')),
+        )
+        .order_by('id')
+        .values(*FARM_DETAIL_FIELDS, 'treatment_count', 'pending_count', 'approved_count', 'rejected_count')
+    )
+    for farm in farms:
+        farm['updated_at'] = farm['updated_at'].isoformat()
+    return farms
+
+
+def dashboard_treatments(user_id, farm_id=None, recent=20):
+    """
+    The most recent treatments across the user's farms, and a cursor for the
+    treatment list endpoint (/api/treatments/?cursor=) picking up after them,
+    or None when there are no more.
+    """
+    from treatments.models import Treatment
+
+    treatments = Treatment.objects.filter(farm__user_id=user_id)
+    if farm_id is not None:
+        treatments = treatments.filter(farm_id=farm_id)
+    # One extra row says whether there is more history to page through
+    rows = list(treatments.order_by('-date', '-id').values(*DASHBOARD_TREATMENT_FIELDS)[:recent + 1])
+    next_cursor = None
+    if recent and len(rows) > recent:
+        last = rows[recent - 1]
+        next_cursor = encode_cursor([last['date'], last['id']])
+    return rows[:recent], next_cursor
+
+
+def dashboard_payload(farms, treatments):
+    """`treatments` is what dashboard_treatments() returns."""
+    treatments, next_cursor = treatments
+    totals = dict.fromkeys(('treatment_count', 'pending_count', 'approved_count', 'rejected_count'), 0)
+    for farm in farms:
+        for key in totals:
+            totals[key] += farm[key]
+    return {'farms': farms, 'treatments': treatments, 'treatments_next_cursor': next_cursor, 'totals': totals}
+
+
+def farmer_dashboard(user_id, farm_id=None, recent=20):
+    """
+    Everything the farmer dashboard renders, in two queries: the farms with
+    their per-status treatment counts, and the most recent treatments across
+    those farms. The queries are independent; see AsyncFarmerDashboardView
+    for running them concurrently.
+    """
+    return dashboard_payload(dashboard_farms(user_id, farm_id), dashboard_treatments(user_id, farm_id, recent))
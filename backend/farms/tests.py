@@ -1,3 +1,166 @@
-from django.test import TestCase
+import base64
+import json
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from amu_monitoring.pagination import encode_cursor
+from amu_monitoring.users.tokens import issue_access_token
+from treatments.models import Treatment
+from treatments.tests import make_farm, make_treatment, make_user
+from .models import Farm
+
+
+def raw_cursor(value):
+    """A cursor holding arbitrary JSON, as a client could forge one."""
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip('=')
+
+
+class FarmListPaginationTests(TestCase):
+    def setUp(self):
+        self.farmer = make_user('farmer@example.com')
+        self.farm_ids = [make_farm(self.farmer).id for _ in range(5)]
+        make_farm(make_user('someone-else@example.com'))
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {issue_access_token(self.farmer)}'}
+
+    def get(self, **params):
+        return self.client.get('/api/farms/', params, **self.auth)
+
+    def test_pages_cover_every_farm_once(self):
+        seen, cursor, pages = [], None, 0
+        while True:
+            params = {'page_size': 2}
+            if cursor:
+                params['cursor'] = cursor
+            response = self.get(**params)
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            seen += [farm['id'] for farm in page['results']]
+            pages += 1
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(seen, self.farm_ids)
+        self.assertEqual(pages, 3)
+
+    def test_last_full_page_has_no_cursor(self):
+        response = self.get(page_size=5)
+        self.assertEqual(len(response.json()['results']), 5)
+        self.assertIsNone(response.json()['next_cursor'])
+
+    def test_cursor_after_last_row_is_empty(self):
+        response = self.get(cursor=encode_cursor([self.farm_ids[-1]]))
+        self.assertEqual(response.json(), {'results': [], 'next_cursor': None})
+
+    def test_unpaginated_shape(self):
+        response = self.get(paginate='false')
+        self.assertEqual([farm['id'] for farm in response.json()], self.farm_ids)
+
+    def test_bad_cursors_are_rejected(self):
+        for cursor in (
+            'not base64!', raw_cursor({}), raw_cursor([]), raw_cursor([1, 2]), raw_cursor([{}]),
+            raw_cursor([[]]), raw_cursor([None]), raw_cursor([True]), raw_cursor(['abc']), raw_cursor([10 ** 30]),
+        ):
+            with self.subTest(cursor=cursor):
+                response = self.get(cursor=cursor)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'error': 'Invalid cursor'})
+
+    def test_bad_page_size_is_rejected(self):
+        self.assertEqual(self.get(page_size='ten').status_code, 400)
+
+
+class FarmUpdateTests(TestCase):
+    def setUp(self):
+        self.farm = make_farm(make_user('farmer@example.com'))
+        self.url = f'/api/farms/{self.farm.id}/'
+        self.etag = self.client.get(self.url)['ETag']
+
+    def put(self, data, etag=None):
+        headers = {'HTTP_IF_MATCH': etag} if etag else {}
+        return self.client.put(self.url, json.dumps(data), content_type='application/json', **headers)
+
+    def test_change_bumps_the_version(self):
+        response = self.put({'total_animals': 41}, self.etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], self.etag)
+        self.assertEqual(Farm.objects.get(pk=self.farm.pk).total_animals, 41)
+        # The old version is now stale
+        self.assertEqual(self.put({'total_animals': 42}, self.etag).status_code, 412)
+
+    def test_no_op_keeps_the_version(self):
+        updated_at = Farm.objects.get(pk=self.farm.pk).updated_at
+        for data in ({'total_animals': 40, 'name': self.farm.name}, {'total_animals': '40', 'avg_weight': 500}, {}):
+            with self.subTest(data=data):
+                response = self.put(data, self.etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response['ETag'], self.etag)
+        self.assertEqual(Farm.objects.get(pk=self.farm.pk).updated_at, updated_at)
+        # A concurrent editor holding the same ETag isn't turned away
+        self.assertEqual(self.put({'village': 'Elsewhere'}, self.etag).status_code, 200)
+
+    def test_unconditional_update(self):
+        self.assertEqual(self.put({'village': 'Elsewhere'}).status_code, 200)
+        self.assertEqual(Farm.objects.get(pk=self.farm.pk).village, 'Elsewhere')
+
+    def test_missing_farm(self):
+        self.url = '/api/farms/999999/'
+        self.assertEqual(self.put({'village': 'Elsewhere'}).status_code, 404)
+
+
+class DashboardFixture:
+    def setUp(self):
+        self.farmer = make_user('farmer@example.com')
+        self.farm = make_farm(self.farmer)
+        other_farm = make_farm(self.farmer)
+        for day in range(1, 8):
+            make_treatment(self.farm, date=f'2024-05-0{day}')
+            make_treatment(other_farm, date=f'2024-05-0{day}')
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {issue_access_token(self.farmer)}'}
+
+    def history(self, params, url='/api/dashboard/'):
+        """Treatment ids from the dashboard, then every page of the treatment list after it."""
+        dashboard = self.client.get(url, params, **self.auth).json()
+        ids = [treatment['id'] for treatment in dashboard['treatments']]
+        cursor = dashboard['treatments_next_cursor']
+        list_params = {'farm_id': params['farm_id']} if 'farm_id' in params else {}
+        while cursor:
+            page = self.client.get('/api/treatments/', {**list_params, 'cursor': cursor, 'page_size': 4}, **self.auth).json()
+            ids += [treatment['id'] for treatment in page['results']]
+            cursor = page['next_cursor']
+        return dashboard, ids
+
+
+class FarmerDashboardTests(DashboardFixture, TestCase):
+    def test_load_more_continues_after_the_dashboard(self):
+        dashboard, ids = self.history({'recent': 5})
+        self.assertEqual(len(dashboard['treatments']), 5)
+        self.assertEqual(ids, list(Treatment.objects.order_by('-date', '-id').values_list('id', flat=True)))
+        self.assertEqual(dashboard['totals']['treatment_count'], 14)
+
+    def test_load_more_for_one_farm(self):
+        _, ids = self.history({'recent': 3, 'farm_id': self.farm.id})
+        expected = Treatment.objects.filter(farm=self.farm).order_by('-date', '-id').values_list('id', flat=True)
+        self.assertEqual(ids, list(expected))
+
+    def test_no_cursor_when_everything_fits(self):
+        dashboard = self.client.get('/api/dashboard/', {'recent': 14}, **self.auth).json()
+        self.assertEqual(len(dashboard['treatments']), 14)
+        self.assertIsNone(dashboard['treatments_next_cursor'])
+
+
+class AsyncFarmerDashboardTests(DashboardFixture, TransactionTestCase):
+    # The async view queries on worker threads with their own connections,
+    # which can't see data inside a test transaction
+
+    def setUp(self):
+        super().setUp()
+        # Have the workers close their connections after each call, or they
+        # stay open and the test database can't be dropped
+        conn_max_age = connection.settings_dict['CONN_MAX_AGE']
+        connection.settings_dict['CONN_MAX_AGE'] = 0
+        self.addCleanup(connection.settings_dict.__setitem__, 'CONN_MAX_AGE', conn_max_age)
+
+    def test_matches_the_sync_dashboard(self):
+        params = {'recent': 5, 'farm_id': self.farm.id}
+        self.assertEqual(self.history(params, '/api/dashboard/async/'), self.history(params))
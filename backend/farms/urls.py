@@ -1,7 +1,10 @@
 from django.urls import path
-from .views import FarmListCreateView, FarmDetailView
+from .views import FarmListCreateView, FarmDetailView, FarmExportView, FarmerDashboardView, AsyncFarmerDashboardView
 
 urlpatterns = [
     path('farms/', FarmListCreateView.as_view(), name='farm-list-create'),
+    path('farms/export/', FarmExportView.as_view(), name='farm-export'),
+    path('dashboard/', FarmerDashboardView.as_view(), name='farmer-dashboard'),
+    path('dashboard/async/', AsyncFarmerDashboardView.as_view(), name='farmer-dashboard-async'),
     path('farms/<int:farm_id>/', FarmDetailView.as_view(), name='farm-detail'),
 ]
@@ -1,25 +1,38 @@
+from django.conf import settings
 from django.views import View
-from django.http import JsonResponse
+from amu_monitoring.responses import JsonResponse
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from .models import Farm
 import json
 from amu_monitoring.users.models import User
-from django.forms.models import model_to_dict
+from amu_monitoring.users.middleware import aresolve_user_id, resolve_user_id, role_required
+from .serializers import (
+    StaleFarm, dashboard_farms, dashboard_payload, dashboard_treatments, farm_etag, farmer_dashboard,
+    get_farm, parse_version, update_farm,
+)
+from functools import partial
+from amu_monitoring.concurrency import run_concurrently
+from amu_monitoring.pagination import InvalidCursor, paginate, wants_pagination
+from amu_monitoring.streaming import EXPORT_FORMATS, export_response
 
 @method_decorator(csrf_exempt, name='dispatch')
 class FarmListCreateView(View):
     def get(self, request):
         email = request.GET.get('email')
-        if not email:
+        if not email and request.principal is None:
              return JsonResponse({'error': 'User email required'}, status=400)
         
         try:
-            user = User.objects.get(email_address=email)
-            farms = Farm.objects.filter(user=user).values()
+            user_id = resolve_user_id(request, email)
+            farms = Farm.objects.filter(user_id=user_id).values()
+            if wants_pagination(request):
+                return JsonResponse(paginate(farms, request, [('id', False)]), status=200)
             return JsonResponse(list(farms), safe=False, status=200)
         except User.DoesNotExist:
             return JsonResponse({'error': 'User not found'}, status=404)
+        except InvalidCursor as e:
+            return JsonResponse({'error': str(e)}, status=400)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
 
@@ -27,13 +40,13 @@ class FarmListCreateView(View):
         try:
             data = json.loads(request.body)
             email = data.get('email')
-            if not email:
+            if not email and request.principal is None:
                 return JsonResponse({'error': 'User email required'}, status=400)
             
-            user = User.objects.get(email_address=email)
+            user_id = resolve_user_id(request, email)
             
             farm = Farm.objects.create(
-                user=user,
+                user_id=user_id,
                 name=data.get('name'),
                 state=data.get('state'),
                 district=data.get('district'),
@@ -56,8 +69,10 @@ class FarmListCreateView(View):
 class FarmDetailView(View):
     def get(self, request, farm_id):
         try:
-            farm = Farm.objects.get(id=farm_id)
-            return JsonResponse(model_to_dict(farm), status=200)
+            farm = get_farm(farm_id)
+            response = JsonResponse(farm, status=200)
+            response['ETag'] = farm_etag(farm['updated_at'])
+            return response
         except Farm.DoesNotExist:
             return JsonResponse({'error': 'Farm not found'}, status=404)
         except Exception as e:
@@ -65,24 +80,93 @@ class FarmDetailView(View):
 
     def put(self, request, farm_id):
         try:
-            farm = Farm.objects.get(id=farm_id)
             data = json.loads(request.body)
-            
-            farm.name = data.get('name', farm.name)
-            farm.state = data.get('state', farm.state)
-            farm.district = data.get('district', farm.district)
-            farm.village = data.get('village', farm.village)
-            farm.farm_number = data.get('farm_number', farm.farm_number)
-            farm.farm_type = data.get('farm_type', farm.farm_type)
-            farm.species_type = data.get('species_type', farm.species_type)
-            farm.total_animals = data.get('total_animals', farm.total_animals)
-            farm.avg_weight = data.get('avg_weight', farm.avg_weight)
-            farm.avg_feed_consumption = data.get('avg_feed_consumption', farm.avg_feed_consumption)
-            farm.avg_water_consumption = data.get('avg_water_consumption', farm.avg_water_consumption)
-            
-            farm.save()
-            return JsonResponse({'message': 'Farm updated successfully'}, status=200)
+            expected = request.headers.get('If-Match') or data.get('updated_at')
+            if expected == '*':
+                expected = None
+            version = update_farm(farm_id, data, parse_version(expected) if expected else None)
+            response = JsonResponse({'message': 'Farm updated successfully', 'updated_at': version}, status=200)
+            response['ETag'] = farm_etag(version)
+            return response
         except Farm.DoesNotExist:
             return JsonResponse({'error': 'Farm not found'}, status=404)
+        except StaleFarm:
+            return JsonResponse({'error': 'Farm was modified by someone else, reload and try again'}, status=412)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=400)
+
+class FarmerDashboardView(View):
+    @staticmethod
+    def parse(request):
+        """(farm_id, recent) from the query string. Raises ValueError."""
+        farm_id = request.GET.get('farm_id')
+        farm_id = int(farm_id) if farm_id else None
+        recent = int(request.GET.get('recent', settings.DASHBOARD_RECENT_TREATMENTS))
+        return farm_id, max(0, min(recent, settings.API_MAX_PAGE_SIZE))
+
+    def get(self, request):
+        email = request.GET.get('email')
+        if not email and request.principal is None:
+            return JsonResponse({'error': 'User email required'}, status=400)
+
+        try:
+            farm_id, recent = self.parse(request)
+        except ValueError:
+            return JsonResponse({'error': 'farm_id and recent must be integers'}, status=400)
+
+        try:
+            user_id = resolve_user_id(request, email)
+            dashboard = farmer_dashboard(user_id, farm_id=farm_id, recent=recent)
+            if farm_id is not None and not dashboard['farms']:
+                return JsonResponse({'error': 'Farm not found'}, status=404)
+            return JsonResponse(dashboard, status=200)
+        except User.DoesNotExist:
+            return JsonResponse({'error': 'User not found'}, status=404)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+
+class AsyncFarmerDashboardView(View):
+    """
+    Async version of FarmerDashboardView (same parameters and response). Run it
+    under an ASGI server: the farms and treatments queries go out at the same time.
+    """
+
+    async def get(self, request):
+        email = request.GET.get('email')
+        if not email and request.principal is None:
+            return JsonResponse({'error': 'User email required'}, status=400)
+
+        try:
+            farm_id, recent = FarmerDashboardView.parse(request)
+        except ValueError:
+            return JsonResponse({'error': 'farm_id and recent must be integers'}, status=400)
+
+        try:
+            user_id = await aresolve_user_id(request, email)
+            farms, treatments = await run_concurrently(
+                partial(dashboard_farms, user_id, farm_id),
+                partial(dashboard_treatments, user_id, farm_id, recent),
+            )
+            dashboard = dashboard_payload(farms, treatments)
+            if farm_id is not None and not dashboard['farms']:
+                return JsonResponse({'error': 'Farm not found'}, status=404)
+            return JsonResponse(dashboard, status=200)
+        except User.DoesNotExist:
+            return JsonResponse({'error': 'User not found'}, status=404)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+
+@method_decorator(role_required('regulator'), name='dispatch')
+class FarmExportView(View):
+    def get(self, request):
+        fmt = request.GET.get('format', 'ndjson')
+        if fmt not in EXPORT_FORMATS:
+            return JsonResponse({'error': f"format must be one of {', '.join(EXPORT_FORMATS)}"}, status=400)
+
+        filters = {}
+        if request.GET.get('state'): filters['state'] = request.GET['state']
+        if request.GET.get('district'): filters['district'] = request.GET['district']
+        if request.GET.get('species_type'): filters['species_type'] = request.GET['species_type']
+
+        farms = Farm.objects.filter(**filters).order_by('id').values()
+        return export_response(farms, fmt, 'farms')
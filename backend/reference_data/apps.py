@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class ReferenceDataConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'reference_data'
+
+    def ready(self):
+        from . import signals  # noqa: F401
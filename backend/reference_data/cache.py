@@ -0,0 +1,60 @@
+"""
+Versioned cache for serialized reference data.
+
+Reference data only changes when `import_reference_data` runs (or an admin
+edits a row), so responses built from it are cached as encoded bytes under a
+key that includes the current catalogue version. Any change bumps the version,
+which both orphans the old entries and changes the ETag handed to clients.
+
+The version is a CatalogueVersion row, so a bump made by any process (the
+import command included) is seen by every web worker on its next request, at
+the cost of one primary-key lookup. The cached bytes live in whatever
+`REFERENCE_DATA_CACHE` names in `CACHES`: local memory by default, a shared
+Redis cache in production.
+"""
+import uuid
+from django.conf import settings
+from django.core.cache import caches
+from amu_monitoring.responses import dumps
+from .models import CatalogueVersion
+
+VERSION_ID = 1
+
+
+def get_cache():
+    return caches[settings.REFERENCE_DATA_CACHE]
+
+
+def catalogue_version():
+    version = CatalogueVersion.objects.filter(pk=VERSION_ID).values_list('version', flat=True).first()
+    if version is None:
+        # First use: start a version. get_or_create keeps the first writer's
+        # value if several workers race here.
+        version = CatalogueVersion.objects.get_or_create(pk=VERSION_ID, defaults={'version': uuid.uuid4().hex})[0].version
+    return version
+
+
+def bump_version():
+    """
+    Start a new catalogue version. Called inside the transaction that changes
+    the reference data, so the new version is committed (or rolled back) with
+    it. Versions are random, never reused, so entries cached under a rolled
+    back version can't be served again.
+    """
+    version = uuid.uuid4().hex
+    if not CatalogueVersion.objects.filter(pk=VERSION_ID).update(version=version):
+        CatalogueVersion.objects.update_or_create(pk=VERSION_ID, defaults={'version': version})
+
+
+def cached_json(name, build, version=None):
+    """
+    Return the JSON-encoded bytes of `build()` for the current catalogue
+    version, building and caching them on a miss.
+    """
+    cache = get_cache()
+    key = f"reference_data:{name}:{version or catalogue_version()}"
+    payload = cache.get(key)
+    if payload is None:
+        payload = dumps(build())
+        cache.set(key, payload, None)
+    return payload
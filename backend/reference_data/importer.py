@@ -0,0 +1,320 @@
+"""
+Bulk reference data import.
+
+The source sheets are normalised into one DataFrame per table with pandas,
+diffed against what is already in the database on natural keys (names and
+codes), and only new or changed rows are written with
+`bulk_create(update_conflicts=True)`. Foreign keys are resolved from in-memory
+name -> id maps, so the whole import is a handful of queries and re-running it
+on unchanged input writes nothing.
+"""
+import os
+from dataclasses import dataclass, field
+import pandas as pd
+from django.db import transaction
+from .cache import bump_version
+from .models import AntimicrobialFamily, MRLLimit, Molecule, MoleculeSpecies, SpeciesGroup, Tissue
+
+# Default file names (without extension) looked up in the source directory
+FAMILIES_FILE = 'Antimicrobial_Family_comments'
+MOLECULES_FILE = 'Antimicrobial_Family'
+MRL_FILE = 'mrl_limit'
+
+# Columns read from each sheet; everything else is dropped while reading
+FAMILY_COLUMNS = ['Antimicrobial_Family', 'Category', 'Comments']
+MOLECULE_COLUMNS = ['Molecule', 'Antimicrobial_Family', 'Species']
+MRL_COLUMNS = ['molecule_name', 'species_group', 'tissue', 'mrl_mgkg']
+
+# Supported input formats, in the order they are looked for in a directory
+EXTENSIONS = ('.parquet', '.csv', '.xlsx')
+
+# Family names used in the molecules sheet that differ from the comments sheet
+FAMILY_ALIASES = {
+    'Polypeptides Cyclic': 'Polypeptides',
+}
+
+BATCH_SIZE = 1000
+READ_CHUNK_ROWS = 50_000
+
+
+def find_source(directory, name):
+    """Return the first `<directory>/<name><ext>` that exists, or None."""
+    for extension in EXTENSIONS:
+        path = os.path.join(directory, name + extension)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def iter_table(path, columns, chunk_rows=READ_CHUNK_ROWS):
+    """
+    Yield a sheet as DataFrame chunks holding only `columns`. The format is
+    picked from the extension: CSV and Parquet are streamed `chunk_rows` at a
+    time, Excel workbooks can only be read whole.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunk_rows)
+    elif extension == '.parquet':
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError('Reading Parquet files requires pyarrow (pip install pyarrow)')
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas()
+    elif extension in ('.xlsx', '.xls'):
+        yield pd.read_excel(path, usecols=columns, engine='openpyxl' if extension == '.xlsx' else None)
+    else:
+        raise ValueError(f"Unsupported file type '{extension}' for {path}; use one of {', '.join(EXTENSIONS)}")
+
+
+def _clean(series):
+    """Names as stripped strings; blank or missing cells become NaN, not 'nan'."""
+    cleaned = series.dropna().astype(str).str.strip()
+    return cleaned[cleaned != ''].reindex(series.index)
+
+
+def _nullable(df):
+    """Turn pandas NaN into None so values compare and save like the DB's."""
+    return df.astype(object).where(pd.notna(df), None)
+
+
+# Each sheet is normalised chunk by chunk as it is read: renamed to the
+# importer's columns, rows with a blank name (or, for MRLs, any blank cell)
+# dropped, and de-duplicated. Only the reduced chunks are kept.
+
+def _dedupe_families(df):
+    return df.drop_duplicates('name', keep='last')
+
+
+def normalise_families(df):
+    return _dedupe_families(_nullable(pd.DataFrame({
+        'name': _clean(df['Antimicrobial_Family']),
+        'category': df['Category'],
+        'comments': df['Comments'],
+    })).dropna(subset=['name']))
+
+
+def _dedupe_molecules(df):
+    # Whole rows: the same molecule may be listed again with other species
+    return df.drop_duplicates()
+
+
+def normalise_molecules(df):
+    return _dedupe_molecules(pd.DataFrame({
+        'name': _clean(df['Molecule']),
+        'family': _clean(df['Antimicrobial_Family']).replace(FAMILY_ALIASES),
+        'species': df['Species'],
+    }).dropna(subset=['name', 'family']))
+
+
+def _dedupe_mrl(df):
+    return df.drop_duplicates(['molecule', 'species', 'tissue'], keep='last')
+
+
+def normalise_mrl(df):
+    return _dedupe_mrl(pd.DataFrame({
+        'molecule': _clean(df['molecule_name']),
+        'species': _clean(df['species_group']),
+        'tissue': _clean(df['tissue']),
+        'mrl_mgkg': pd.to_numeric(df['mrl_mgkg']),
+    }).dropna())
+
+
+# Sheet -> (source columns, per-chunk normaliser, de-duplication across chunks)
+SHEETS = {
+    'families': (FAMILY_COLUMNS, normalise_families, _dedupe_families),
+    'molecules': (MOLECULE_COLUMNS, normalise_molecules, _dedupe_molecules),
+    'mrl': (MRL_COLUMNS, normalise_mrl, _dedupe_mrl),
+}
+
+
+def read_sheet(path, sheet, chunk_rows=READ_CHUNK_ROWS):
+    """
+    Read and normalise one of the SHEETS. Each chunk is reduced before the
+    next is read, so memory holds one raw chunk plus the distinct rows seen
+    so far rather than the whole file. Keeping the last (or first) row per
+    key within each chunk and then across chunks matches doing it once over
+    the whole file.
+    """
+    columns, normalise, dedupe = SHEETS[sheet]
+    chunks = [normalise(chunk) for chunk in iter_table(path, columns, chunk_rows)]
+    if not chunks:
+        return normalise(pd.DataFrame(columns=columns))
+    return dedupe(pd.concat(chunks, ignore_index=True))
+
+
+def prepare_frames(families, molecules, mrl):
+    """
+    Build one DataFrame per table from the normalised sheets (see
+    read_sheet), keyed by name.
+    """
+    # Families only mentioned in the molecules sheet are created bare
+    extra = sorted(set(molecules['family']) - set(families['name']))
+    families = pd.concat(
+        [families, pd.DataFrame({'name': extra, 'category': None, 'comments': None})],
+        ignore_index=True,
+    )
+
+    # "AVI, BOV" -> one row per (molecule, species)
+    molecule_species = (
+        molecules[['name', 'species']].dropna(subset=['species'])
+        .assign(species=lambda df: df['species'].astype(str).str.split(','))
+        .explode('species')
+        .assign(species=lambda df: df['species'].str.strip())
+        .rename(columns={'name': 'molecule'})
+    )
+    molecule_species = molecule_species[molecule_species['species'] != ''].drop_duplicates()
+    molecules = molecules[['name', 'family']].drop_duplicates('name', keep='first')
+
+    return {
+        'families': families,
+        'molecules': molecules,
+        'molecule_species': molecule_species,
+        'mrl': mrl,
+    }
+
+
+def _diff(incoming, existing, keys, values=()):
+    """Split `incoming` into (new, changed) rows relative to `existing` on `keys`."""
+    values = list(values)
+    merged = incoming.merge(existing, on=keys, how='left', suffixes=('', '_db'), indicator=True)
+    new = merged.loc[merged['_merge'] == 'left_only', keys + values]
+
+    both = merged[merged['_merge'] == 'both']
+    differs = pd.Series(False, index=both.index)
+    for column in values:
+        a, b = both[column], both[f'{column}_db']
+        differs |= ~((a == b) | (a.isna() & b.isna()))
+    changed = both.loc[differs, keys + values]
+    return new.reset_index(drop=True), changed.reset_index(drop=True)
+
+
+def _existing(queryset, columns):
+    return _nullable(pd.DataFrame(list(queryset), columns=columns))
+
+
+@dataclass
+class ImportPlan:
+    """Rows to write per table, split into new and changed."""
+    new: dict = field(default_factory=dict)
+    changed: dict = field(default_factory=dict)
+    skipped_mrl: int = 0
+
+    @property
+    def is_empty(self):
+        return not any(len(df) for df in [*self.new.values(), *self.changed.values()])
+
+
+def plan_import(frames):
+    plan = ImportPlan()
+
+    plan.new['families'], plan.changed['families'] = _diff(
+        frames['families'],
+        _existing(AntimicrobialFamily.objects.values_list('name', 'category', 'comments'), ['name', 'category', 'comments']),
+        ['name'], ['category', 'comments'],
+    )
+    # Bare families from the molecules sheet never overwrite existing details
+    bare = frames['families']['category'].isna() & frames['families']['comments'].isna()
+    bare_names = set(frames['families'].loc[bare, 'name'])
+    plan.changed['families'] = plan.changed['families'][~plan.changed['families']['name'].isin(bare_names)]
+
+    plan.new['molecules'], plan.changed['molecules'] = _diff(
+        frames['molecules'],
+        _existing(Molecule.objects.values_list('name', 'family__name'), ['name', 'family']),
+        ['name'], ['family'],
+    )
+
+    species = pd.DataFrame({'code': pd.concat([frames['molecule_species']['species'], frames['mrl']['species']]).unique()})
+    plan.new['species'], _ = _diff(
+        species, _existing(SpeciesGroup.objects.values_list('code'), ['code']), ['code'],
+    )
+    tissues = pd.DataFrame({'name': frames['mrl']['tissue'].unique()})
+    plan.new['tissues'], _ = _diff(
+        tissues, _existing(Tissue.objects.values_list('name'), ['name']), ['name'],
+    )
+
+    plan.new['molecule_species'], _ = _diff(
+        frames['molecule_species'],
+        _existing(MoleculeSpecies.objects.values_list('molecule__name', 'species_group__code'), ['molecule', 'species']),
+        ['molecule', 'species'],
+    )
+
+    # MRLs are only kept for molecules we know about
+    known = set(frames['molecules']['name']) | set(Molecule.objects.values_list('name', flat=True))
+    mrl = frames['mrl'][frames['mrl']['molecule'].isin(known)]
+    plan.skipped_mrl = len(frames['mrl']) - len(mrl)
+    plan.new['mrl'], plan.changed['mrl'] = _diff(
+        mrl,
+        _existing(
+            MRLLimit.objects.values_list('molecule__name', 'species_group__code', 'tissue__name', 'mrl_mgkg'),
+            ['molecule', 'species', 'tissue', 'mrl_mgkg'],
+        ),
+        ['molecule', 'species', 'tissue'], ['mrl_mgkg'],
+    )
+    return plan
+
+
+def _rows(plan, table):
+    return pd.concat([plan.new[table], plan.changed.get(table, plan.new[table].iloc[0:0])], ignore_index=True)
+
+
+def _id_map(model, key):
+    return dict(model.objects.values_list(key, 'id'))
+
+
+@transaction.atomic
+def apply_import(plan):
+    """Write an ImportPlan in one transaction."""
+    if plan.is_empty:
+        return
+
+    families = _rows(plan, 'families')
+    AntimicrobialFamily.objects.bulk_create(
+        [AntimicrobialFamily(name=r.name, category=r.category, comments=r.comments) for r in families.itertuples()],
+        update_conflicts=True, unique_fields=['name'], update_fields=['category', 'comments'], batch_size=BATCH_SIZE,
+    )
+    SpeciesGroup.objects.bulk_create(
+        [SpeciesGroup(code=code) for code in plan.new['species']['code']],
+        ignore_conflicts=True, batch_size=BATCH_SIZE,
+    )
+    Tissue.objects.bulk_create(
+        [Tissue(name=name) for name in plan.new['tissues']['name']],
+        ignore_conflicts=True, batch_size=BATCH_SIZE,
+    )
+
+    family_ids = _id_map(AntimicrobialFamily, 'name')
+    molecules = _rows(plan, 'molecules')
+    Molecule.objects.bulk_create(
+        [Molecule(name=r.name, family_id=family_ids[r.family]) for r in molecules.itertuples()],
+        update_conflicts=True, unique_fields=['name'], update_fields=['family'], batch_size=BATCH_SIZE,
+    )
+
+    molecule_ids = _id_map(Molecule, 'name')
+    species_ids = _id_map(SpeciesGroup, 'code')
+    tissue_ids = _id_map(Tissue, 'name')
+
+    MoleculeSpecies.objects.bulk_create(
+        [
+            MoleculeSpecies(molecule_id=molecule_ids[r.molecule], species_group_id=species_ids[r.species])
+            for r in plan.new['molecule_species'].itertuples()
+        ],
+        ignore_conflicts=True, batch_size=BATCH_SIZE,
+    )
+    MRLLimit.objects.bulk_create(
+        [
+            MRLLimit(
+                molecule_id=molecule_ids[r.molecule],
+                species_group_id=species_ids[r.species],
+                tissue_id=tissue_ids[r.tissue],
+                mrl_mgkg=r.mrl_mgkg,
+            )
+            for r in _rows(plan, 'mrl').itertuples()
+        ],
+        update_conflicts=True, unique_fields=['molecule', 'species_group', 'tissue'], update_fields=['mrl_mgkg'],
+        batch_size=BATCH_SIZE,
+    )
+
+    # Bulk writes skip model signals, so invalidate cached catalogues here.
+    # The version commits with the data it describes.
+    bump_version()
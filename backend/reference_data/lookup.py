@@ -0,0 +1,107 @@
+"""
+In-process reference data indexes: species code -> molecules for
+molecules_by_species, and (molecule, species) -> MRL limits for the
+compliance check run when a treatment is logged.
+
+Built lazily with two queries the first time it is needed, then shared
+read-only by every request in the process. It is tagged with the reference
+catalogue version (see cache.py) and rebuilt when that version moves, i.e.
+after import_reference_data or an edit to any reference model, in any process.
+Checking the version is a primary-key lookup, so every get_*_index() call
+costs one query; code making many lookups should get the index once and
+reuse it.
+"""
+import threading
+from types import MappingProxyType
+from amu_monitoring.responses import dumps
+from .cache import catalogue_version
+from .matching import normalise_name
+from .models import Molecule, MoleculeSpecies, MRLLimit, SpeciesGroup
+
+
+class SpeciesMoleculeIndex:
+    def __init__(self, version, molecules):
+        self.version = version
+        # species code -> tuple of {'id', 'name'} sorted by name
+        self.molecules = MappingProxyType(molecules)
+        # species code -> pre-encoded JSON list, served as-is
+        self.encoded = MappingProxyType({
+            code: dumps(list(rows))
+            for code, rows in molecules.items()
+        })
+
+    @classmethod
+    def build(cls, version):
+        molecules = {code: [] for code in SpeciesGroup.objects.values_list('code', flat=True)}
+        rows = (
+            MoleculeSpecies.objects
+            .values_list('species_group__code', 'molecule_id', 'molecule__name')
+            .order_by('species_group__code', 'molecule__name')
+        )
+        for code, molecule_id, name in rows:
+            molecules[code].append({'id': molecule_id, 'name': name})
+        return cls(version, {code: tuple(rows) for code, rows in molecules.items()})
+
+
+class ComplianceIndex:
+    """
+    Everything the treatment compliance check needs, as hash maps:
+
+    - molecule_ids: normalised molecule name (see matching.py) -> molecule id
+    - approved: set of (molecule id, species code) pairs from MoleculeSpecies
+    - limits: (molecule id, species code) -> ((tissue, mrl_mgkg), ...)
+    - species: species codes with at least one approved molecule
+    """
+
+    def __init__(self, version, molecule_ids, approved, limits):
+        self.version = version
+        self.molecule_ids = MappingProxyType(molecule_ids)
+        self.approved = frozenset(approved)
+        self.limits = MappingProxyType(limits)
+        self.species = frozenset(code for _, code in self.approved)
+
+    @classmethod
+    def build(cls, version):
+        molecule_ids = {normalise_name(name): molecule_id for molecule_id, name in Molecule.objects.values_list('id', 'name')}
+        approved = MoleculeSpecies.objects.values_list('molecule_id', 'species_group__code')
+        limits = {}
+        rows = (
+            MRLLimit.objects
+            .values_list('molecule_id', 'species_group__code', 'tissue__name', 'mrl_mgkg')
+            .order_by('molecule_id', 'species_group__code', 'tissue__name')
+        )
+        for molecule_id, code, tissue, mrl in rows:
+            limits.setdefault((molecule_id, code), []).append((tissue, mrl))
+        return cls(version, molecule_ids, approved, {key: tuple(rows) for key, rows in limits.items()})
+
+    def molecule_id(self, name):
+        return self.molecule_ids.get(normalise_name(name))
+
+
+_index = None
+_compliance_index = None
+_lock = threading.Lock()
+
+
+def get_species_index():
+    global _index
+    version = catalogue_version()
+    index = _index
+    if index is None or index.version != version:
+        with _lock:
+            if _index is None or _index.version != version:
+                _index = SpeciesMoleculeIndex.build(version)
+            index = _index
+    return index
+
+
+def get_compliance_index():
+    global _compliance_index
+    version = catalogue_version()
+    index = _compliance_index
+    if index is None or index.version != version:
+        with _lock:
+            if _compliance_index is None or _compliance_index.version != version:
+                _compliance_index = ComplianceIndex.build(version)
+            index = _compliance_index
+    return index
@@ -1,82 +1,106 @@
-import pandas as pd
-from django.core.management.base import BaseCommand
-from reference_data.models import AntimicrobialFamily, Molecule, SpeciesGroup, Tissue, MoleculeSpecies, MRLLimit
 import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from reference_data.importer import (
+    EXTENSIONS, FAMILIES_FILE, MOLECULES_FILE, MRL_FILE,
+    apply_import, find_source, plan_import, prepare_frames, read_sheet,
+)
 
-class Command(BaseCommand):
-    help = 'Import reference data from Excel files'
-
-    def handle(self, *args, **kwargs):
-        base_path = r"D:\PSG TECH 2022-2027\Sem 8\Capstone_AMU_Project\Documentation and data"
-        
-        file_comments = os.path.join(base_path, "Antimicrobial_Family_comments.xlsx")
-        file_molecules = os.path.join(base_path, "Antimicrobial_Family.xlsx")
-        file_mrl = os.path.join(base_path, "mrl_limit.xlsx")
+TABLE_LABELS = {
+    'families': 'Antimicrobial families',
+    'molecules': 'Molecules',
+    'species': 'Species groups',
+    'tissues': 'Tissues',
+    'molecule_species': 'Molecule/species pairs',
+    'mrl': 'MRL limits',
+}
 
-        self.stdout.write("Importing Antimicrobial Families...")
-        df_comments = pd.read_excel(file_comments, engine='openpyxl')
-        for _, row in df_comments.iterrows():
-            AntimicrobialFamily.objects.get_or_create(
-                name=row['Antimicrobial_Family'],
-                defaults={
-                    'category': row['Category'],
-                    'comments': row['Comments']
-                }
-            )
 
-        self.stdout.write("Importing Molecules and Species Groups...")
-        df_molecules = pd.read_excel(file_molecules, engine='openpyxl')
-        for _, row in df_molecules.iterrows():
-            family_name = row['Antimicrobial_Family']
-            
-            # Handle specific mappings or create missing families
-            if family_name == 'Polypeptides Cyclic':
-                 family_name = 'Polypeptides'
+class Command(BaseCommand):
+    help = 'Import reference data (families, molecules, species, MRL limits) in bulk'
 
-            family, _ = AntimicrobialFamily.objects.get_or_create(name=family_name)
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'directory',
+            nargs='?',
+            default=os.getenv('REFERENCE_DATA_DIR'),
+            help=f'Directory holding {FAMILIES_FILE}, {MOLECULES_FILE} and {MRL_FILE} as '
+                 f"{', '.join(EXTENSIONS)} files (default: $REFERENCE_DATA_DIR)",
+        )
+        parser.add_argument('--families', help='Path to the antimicrobial family comments sheet (.csv, .parquet or .xlsx)')
+        parser.add_argument('--molecules', help='Path to the molecules sheet (.csv, .parquet or .xlsx)')
+        parser.add_argument('--mrl', help='Path to the MRL limits sheet (.csv, .parquet or .xlsx)')
+        parser.add_argument(
+            '--chunk-rows',
+            type=int,
+            default=50_000,
+            help='Rows read (and reduced to distinct rows) at a time from CSV and Parquet files (default: 50000)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would be inserted or updated without writing anything',
+        )
 
-            molecule, created = Molecule.objects.get_or_create(
-                name=row['Molecule'],
-                defaults={'family': family}
-            )
+    def resolve_path(self, explicit, directory, name):
+        if explicit:
+            path = explicit
+        elif directory:
+            path = find_source(directory, name)
+            if not path:
+                raise CommandError(f"No {name}{{{','.join(EXTENSIONS)}}} found in {directory}")
+        else:
+            raise CommandError(f'No path for {name}: pass a directory or the matching --option')
+        if not os.path.exists(path):
+            raise CommandError(f'File not found: {path}')
+        return path
 
-            # Process Species
-            species_str = str(row['Species']) if pd.notna(row['Species']) else ""
-            if species_str:
-                species_codes = [s.strip() for s in species_str.split(',')]
-                for code in species_codes:
-                    if not code: continue
-                    species_group, _ = SpeciesGroup.objects.get_or_create(code=code)
-                    MoleculeSpecies.objects.get_or_create(
-                        molecule=molecule,
-                        species_group=species_group
-                    )
+    def handle(self, *args, **options):
+        directory = options['directory']
+        paths = {
+            'families': self.resolve_path(options['families'], directory, FAMILIES_FILE),
+            'molecules': self.resolve_path(options['molecules'], directory, MOLECULES_FILE),
+            'mrl': self.resolve_path(options['mrl'], directory, MRL_FILE),
+        }
 
-        self.stdout.write("Importing MRL Limits...")
-        df_mrl = pd.read_excel(file_mrl, engine='openpyxl')
-        for _, row in df_mrl.iterrows():
-            mol_name = row['molecule_name']
-            species_code = row['species_group']
-            tissue_name = row['tissue']
-            mrl_val = row['mrl_mgkg']
+        started = time.perf_counter()
+        self.stdout.write("Reading source files...")
+        try:
+            frames = prepare_frames(*(
+                read_sheet(paths[name], name, options['chunk_rows'])
+                for name in ('families', 'molecules', 'mrl')
+            ))
+        except (ImportError, ValueError) as e:
+            raise CommandError(str(e))
 
-            try:
-                molecule = Molecule.objects.get(name=mol_name)
-            except Molecule.DoesNotExist:
-                # self.stdout.write(self.style.WARNING(f"Molecule {mol_name} not found in MRL sheet, skipping."))
-                # Optionally create it or skip. Let's skip to keep data integrity strictly based on Molecule file.
-                # Actually, MRL sheet might contain molecules not in the other sheet? 
-                # Let's assume we only import MRLs for known molecules.
-                continue
+        self.stdout.write("Comparing with the database...")
+        plan = plan_import(frames)
+        self.report(plan, options['verbosity'])
 
-            species_group, _ = SpeciesGroup.objects.get_or_create(code=species_code)
-            tissue, _ = Tissue.objects.get_or_create(name=tissue_name.strip())
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Dry run: nothing written'))
+            return
+        if plan.is_empty:
+            self.stdout.write(self.style.SUCCESS('Reference data already up to date'))
+            return
 
-            MRLLimit.objects.get_or_create(
-                molecule=molecule,
-                species_group=species_group,
-                tissue=tissue,
-                defaults={'mrl_mgkg': mrl_val}
-            )
+        apply_import(plan)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Successfully imported reference data in {elapsed:.2f}s'))
 
-        self.stdout.write(self.style.SUCCESS('Successfully imported reference data'))
+    def report(self, plan, verbosity):
+        for table, label in TABLE_LABELS.items():
+            new = plan.new[table]
+            changed = plan.changed.get(table)
+            line = f"  {label}: {len(new)} new"
+            if changed is not None:
+                line += f", {len(changed)} changed"
+            self.stdout.write(line)
+            if verbosity > 1:
+                for kind, rows in (('+', new), ('~', changed)):
+                    if rows is None:
+                        continue
+                    for row in rows.to_dict('records'):
+                        self.stdout.write(f"      {kind} {row}")
+        if plan.skipped_mrl:
+            self.stdout.write(f"  Skipped {plan.skipped_mrl} MRL rows for unknown molecules")
@@ -0,0 +1,45 @@
+"""
+Matching free-text antibiotic names to reference molecules.
+
+Names are normalised (casefolded, with everything but letters and digits
+removed), so 'Amoxicillin', ' amoxicillin ' and 'AMOXI-CILLIN' are the same
+key. Names with no exact normalised match fall back to the closest molecule
+name by difflib similarity, above a cutoff.
+"""
+import difflib
+import re
+
+_NON_ALNUM = re.compile(r'[\W_]+')
+
+
+def normalise_name(name):
+    return _NON_ALNUM.sub('', (name or '').casefold())
+
+
+class MoleculeMatcher:
+    """In-memory name -> molecule id index. Results are memoised per distinct input."""
+
+    def __init__(self, molecules, cutoff=0.9):
+        # molecules: iterable of (id, name)
+        self.ids = {normalise_name(name): molecule_id for molecule_id, name in molecules}
+        self.keys = list(self.ids)
+        self.cutoff = cutoff
+        self._memo = {}
+
+    @classmethod
+    def from_db(cls, cutoff=0.9):
+        from .models import Molecule
+        return cls(Molecule.objects.values_list('id', 'name'), cutoff=cutoff)
+
+    def match(self, name):
+        """Returns the molecule id for `name`, or None."""
+        if name in self._memo:
+            return self._memo[name]
+        key = normalise_name(name)
+        molecule_id = self.ids.get(key)
+        if molecule_id is None and key:
+            close = difflib.get_close_matches(key, self.keys, n=1, cutoff=self.cutoff)
+            if close:
+                molecule_id = self.ids[close[0]]
+        self._memo[name] = molecule_id
+        return molecule_id
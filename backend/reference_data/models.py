@@ -49,3 +49,15 @@ class MRLLimit(models.Model):
 
     def __str__(self):
         return f"{self.molecule.name} - {self.species_group.code} - {self.tissue.name}: {self.mrl_mgkg}"
+
+class CatalogueVersion(models.Model):
+    """
+    The reference catalogue version (see cache.py), a single row. It lives in
+    the database rather than a cache so that a change made in any process,
+    e.g. import_reference_data run from the command line, reaches every worker.
+    """
+    version = models.CharField(max_length=32)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.version
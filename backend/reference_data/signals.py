@@ -0,0 +1,14 @@
+from django.db.models.signals import post_delete, post_save
+from .cache import bump_version
+from .models import AntimicrobialFamily, MRLLimit, Molecule, MoleculeSpecies, SpeciesGroup, Tissue
+
+REFERENCE_MODELS = (AntimicrobialFamily, SpeciesGroup, Molecule, Tissue, MoleculeSpecies, MRLLimit)
+
+
+def invalidate_reference_cache(sender, **kwargs):
+    bump_version()
+
+
+for model in REFERENCE_MODELS:
+    post_save.connect(invalidate_reference_cache, sender=model, dispatch_uid=f'reference_cache_save_{model.__name__}')
+    post_delete.connect(invalidate_reference_cache, sender=model, dispatch_uid=f'reference_cache_delete_{model.__name__}')
@@ -0,0 +1,212 @@
+import os
+import shutil
+import tempfile
+import uuid
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from .cache import bump_version, catalogue_version
+from .importer import read_sheet
+from .lookup import get_species_index
+from .models import AntimicrobialFamily, CatalogueVersion, MRLLimit, Molecule, MoleculeSpecies, SpeciesGroup, Tissue
+
+SAMPLE_DATA = os.path.join(os.path.dirname(__file__), 'sample_data')
+
+
+class CatalogueVersionTests(TestCase):
+    def setUp(self):
+        family = AntimicrobialFamily.objects.create(name='Penicillins')
+        self.molecule = Molecule.objects.create(name='Amoxicillin', family=family)
+        MoleculeSpecies.objects.create(molecule=self.molecule, species_group=SpeciesGroup.objects.create(code='BOV'))
+
+    def test_edits_bump_the_version(self):
+        before = catalogue_version()
+        self.molecule.name = 'Ampicillin'
+        self.molecule.save()
+        self.assertNotEqual(catalogue_version(), before)
+
+    def test_drug_list_revalidates_with_etag(self):
+        response = self.client.get('/api/reference/drugs/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/reference/drugs/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_drug_list_reads_the_version_once(self):
+        self.client.get('/api/reference/drugs/')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get('/api/reference/drugs/').status_code, 200)
+        self.assertEqual(len([q for q in queries if 'catalogueversion' in q['sql']]), 1)
+
+    def test_bump_from_another_process_is_seen(self):
+        # What import_reference_data run elsewhere leaves behind: new data and
+        # a new version row, with nothing cleared in this process's caches
+        self.assertEqual(self.client.get('/api/reference/molecules/', {'species': 'BOV'}).json()[0]['name'], 'Amoxicillin')
+        etag = self.client.get('/api/reference/drugs/')['ETag']
+
+        Molecule.objects.filter(pk=self.molecule.pk).update(name='Ampicillin')
+        CatalogueVersion.objects.update(version=uuid.uuid4().hex)
+
+        response = self.client.get('/api/reference/drugs/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['name'], 'Ampicillin')
+        self.assertEqual(self.client.get('/api/reference/molecules/', {'species': 'BOV'}).json()[0]['name'], 'Ampicillin')
+
+
+class ImportReferenceDataTests(TestCase):
+    def run_import(self, directory=SAMPLE_DATA):
+        out = StringIO()
+        call_command('import_reference_data', directory, stdout=out)
+        return out.getvalue()
+
+    def counts(self):
+        return [model.objects.count() for model in (
+            AntimicrobialFamily, Molecule, SpeciesGroup, Tissue, MoleculeSpecies, MRLLimit,
+        )]
+
+    def test_sample_import(self):
+        self.run_import()
+        # 7 families with comments; Polypeptides Cyclic is an alias
+        self.assertEqual(AntimicrobialFamily.objects.count(), 7)
+        self.assertEqual(Molecule.objects.get(name='Colistin').family.name, 'Polypeptides')
+        self.assertEqual(Molecule.objects.count(), 12)
+        # Tilmicosin isn't in the molecules sheet, so its MRL is skipped
+        self.assertEqual(MRLLimit.objects.count(), 22)
+        self.assertEqual(MRLLimit.objects.get(molecule__name='Amoxicillin', species_group__code='BOV', tissue__name='Milk').mrl_mgkg, 0.004)
+
+    def test_second_import_writes_nothing(self):
+        self.run_import()
+        counts, version = self.counts(), catalogue_version()
+
+        with CaptureQueriesContext(connection) as queries:
+            output = self.run_import()
+        writes = [q['sql'] for q in queries if q['sql'].split(None, 1)[0].upper() in ('INSERT', 'UPDATE', 'DELETE')]
+        self.assertEqual(writes, [])
+        self.assertIn('Reference data already up to date', output)
+        self.assertEqual(self.counts(), counts)
+        self.assertEqual(catalogue_version(), version)
+
+    def test_changed_row_is_updated(self):
+        self.run_import()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        for name in os.listdir(SAMPLE_DATA):
+            shutil.copy(os.path.join(SAMPLE_DATA, name), directory)
+        with open(os.path.join(directory, 'mrl_limit.csv'), 'a') as f:
+            f.write('Tylosin,SUI,Muscle,0.1\n')
+
+        self.run_import(directory)
+        self.assertEqual(MRLLimit.objects.count(), 23)
+
+    def test_chunked_read_matches_whole_read(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'mrl_limit.csv')
+        with open(os.path.join(SAMPLE_DATA, 'mrl_limit.csv')) as f:
+            text = f.read()
+        with open(path, 'w') as f:
+            # A later duplicate, in another chunk, wins
+            f.write(text + 'Amoxicillin,BOV,Milk,0.01\n')
+
+        whole = read_sheet(path, 'mrl', chunk_rows=1000)
+        for chunk_rows in (1, 2, 7):
+            with self.subTest(chunk_rows=chunk_rows):
+                chunked = read_sheet(path, 'mrl', chunk_rows=chunk_rows)
+                self.assertEqual(chunked.to_dict('records'), whole.to_dict('records'))
+        milk = whole[(whole['molecule'] == 'Amoxicillin') & (whole['species'] == 'BOV') & (whole['tissue'] == 'Milk')]
+        self.assertEqual(list(milk['mrl_mgkg']), [0.01])
+
+    def test_blank_cells_are_skipped(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        sheets = {
+            'Antimicrobial_Family_comments.csv': (
+                'Antimicrobial_Family,Category,Comments\n'
+                'Penicillins,Highly Important,\n'
+                ',Critically Important,Row without a family\n'
+            ),
+            'Antimicrobial_Family.csv': (
+                'Molecule,Antimicrobial_Family,Species\n'
+                'Amoxicillin,Penicillins,"BOV, "\n'
+                'Ampicillin,,BOV\n'
+                ',Penicillins,BOV\n'
+            ),
+            'mrl_limit.csv': (
+                'molecule_name,species_group,tissue,mrl_mgkg\n'
+                'Amoxicillin,BOV,Milk,0.004\n'
+                'Amoxicillin,BOV,,0.05\n'
+                'Amoxicillin,,Muscle,0.05\n'
+                'Amoxicillin,BOV,Muscle,\n'
+            ),
+        }
+        for name, text in sheets.items():
+            with open(os.path.join(directory, name), 'w') as f:
+                f.write(text)
+
+        self.run_import(directory)
+        self.assertEqual(list(AntimicrobialFamily.objects.values_list('name', flat=True)), ['Penicillins'])
+        self.assertIsNone(AntimicrobialFamily.objects.get().comments)
+        self.assertEqual(list(Molecule.objects.values_list('name', flat=True)), ['Amoxicillin'])
+        self.assertEqual(list(SpeciesGroup.objects.values_list('code', flat=True)), ['BOV'])
+        self.assertEqual(list(Tissue.objects.values_list('name', flat=True)), ['Milk'])
+        self.assertEqual(MRLLimit.objects.count(), 1)
+
+
+class SpeciesIndexTests(TestCase):
+    def setUp(self):
+        call_command('import_reference_data', SAMPLE_DATA, stdout=StringIO())
+        self.codes = list(SpeciesGroup.objects.values_list('code', flat=True))
+
+    def queryset_result(self, code):
+        """What molecules_by_species returned before the index."""
+        molecule_ids = MoleculeSpecies.objects.filter(species_group__code=code).values_list('molecule_id', flat=True)
+        return list(Molecule.objects.filter(id__in=molecule_ids).values('id', 'name').order_by('name'))
+
+    def test_matches_the_queryset_for_every_species(self):
+        self.assertTrue(self.codes)
+        for code in self.codes:
+            with self.subTest(code=code):
+                response = self.client.get('/api/reference/molecules/', {'species': code})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json(), self.queryset_result(code))
+
+    def test_one_query_per_request(self):
+        get_species_index()
+        with self.assertNumQueries(1):
+            self.client.get('/api/reference/molecules/', {'species': self.codes[0]})
+
+    def test_batch_matches_the_single_species_endpoint(self):
+        response = self.client.get('/api/reference/molecules/batch/', {'species': ' , '.join(self.codes)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {code: self.queryset_result(code) for code in self.codes})
+
+    def test_batch_rejects_unknown_species(self):
+        response = self.client.get('/api/reference/molecules/batch/', {'species': f'{self.codes[0]},XYZ,nope'})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {'error': 'Invalid species code(s): XYZ, nope'})
+        self.assertEqual(self.client.get('/api/reference/molecules/batch/', {'species': ''}).status_code, 400)
+        self.assertEqual(self.client.get('/api/reference/molecules/', {'species': 'XYZ'}).status_code, 404)
+
+    def test_import_rebuilds_the_index(self):
+        before = get_species_index()
+        self.assertIs(get_species_index(), before)
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        for name in os.listdir(SAMPLE_DATA):
+            shutil.copy(os.path.join(SAMPLE_DATA, name), directory)
+        with open(os.path.join(directory, 'Antimicrobial_Family.csv'), 'a') as f:
+            f.write('Zzzmycin,Penicillins,BOV\n')
+        call_command('import_reference_data', directory, stdout=StringIO())
+
+        after = get_species_index()
+        self.assertIsNot(after, before)
+        self.assertEqual(after.molecules['BOV'][-1]['name'], 'Zzzmycin')
+        self.assertEqual(self.client.get('/api/reference/molecules/', {'species': 'BOV'}).json(), self.queryset_result('BOV'))
+
+    def test_bump_version_rebuilds_the_index(self):
+        before = get_species_index()
+        bump_version()
+        self.assertIsNot(get_species_index(), before)
@@ -3,5 +3,6 @@ from . import views
 
 urlpatterns = [
     path('molecules/', views.molecules_by_species, name='molecules_by_species'),
+    path('molecules/batch/', views.molecules_by_species_batch, name='molecules_by_species_batch'),
     path('drugs/', views.drug_list, name='drug_list'),
 ]
@@ -1,22 +1,36 @@
-from django.http import JsonResponse
-from .models import Molecule, SpeciesGroup, MoleculeSpecies, MRLLimit
+from django.http import HttpResponse
+from amu_monitoring.responses import JsonResponse
+from django.views.decorators.http import condition
+from .cache import cached_json, catalogue_version
+from .lookup import get_species_index
+from .models import Molecule
 
 def molecules_by_species(request):
     species_code = request.GET.get('species')
     if not species_code:
         return JsonResponse({'error': 'Species parameter is required'}, status=400)
     
-    try:
-        species_group = SpeciesGroup.objects.get(code=species_code)
-        # Get molecules associated with this species
-        molecule_ids = MoleculeSpecies.objects.filter(species_group=species_group).values_list('molecule_id', flat=True)
-        molecules = Molecule.objects.filter(id__in=molecule_ids).values('id', 'name').order_by('name')
-        
-        return JsonResponse(list(molecules), safe=False)
-    except SpeciesGroup.DoesNotExist:
+    # Served from the in-process species index, pre-encoded per species; the
+    # only query is the catalogue version check
+    payload = get_species_index().encoded.get(species_code)
+    if payload is None:
         return JsonResponse({'error': 'Invalid species code'}, status=404)
+    return HttpResponse(payload, content_type='application/json')
 
-def drug_list(request):
+def molecules_by_species_batch(request):
+    species_param = request.GET.get('species')
+    if not species_param:
+        return JsonResponse({'error': 'Species parameter is required'}, status=400)
+
+    codes = [code.strip() for code in species_param.split(',') if code.strip()]
+    index = get_species_index()
+    unknown = [code for code in codes if code not in index.molecules]
+    if unknown:
+        return JsonResponse({'error': f"Invalid species code(s): {', '.join(unknown)}"}, status=404)
+
+    return JsonResponse({code: list(index.molecules[code]) for code in codes})
+
+def build_drug_catalogue():
     molecules = Molecule.objects.select_related('family').prefetch_related('mrllimit_set__species_group', 'mrllimit_set__tissue').all().order_by('name')
     
     data = []
@@ -38,4 +52,16 @@ def drug_list(request):
             'mrls': mrls
         })
         
-    return JsonResponse(data, safe=False)
+    return data
+
+def drug_list_etag(request):
+    # Kept on the request so the view builds its cache key from the same version
+    request.catalogue_version = catalogue_version()
+    return request.catalogue_version
+
+@condition(etag_func=drug_list_etag)
+def drug_list(request):
+    # Clients revalidate with If-None-Match; @condition answers 304 when the
+    # catalogue version is unchanged
+    payload = cached_json('drug_list', build_drug_catalogue, request.catalogue_version)
+    return HttpResponse(payload, content_type='application/json')
@@ -0,0 +1,212 @@
+import heapq
+import math
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import F
+from analytics import rollups
+from reference_data.lookup import get_compliance_index
+from .models import Treatment, VetWorkload
+
+# A vet never holds more than this many pending treatments at once
+MAX_PENDING_PER_VET = 7
+
+
+def find_available_vet(district):
+    """
+    Return the least-loaded vet in `district` that is below the pending cap,
+    or None if every vet is full.
+
+    Must run inside a transaction: the candidates' VetWorkload rows are locked
+    so concurrent submissions queue up behind each other and always see the
+    counts committed by the previous one.
+    """
+    if not district:
+        return None
+
+    # Lock in a stable order to avoid deadlocks between concurrent assigners.
+    # Locked rows come back at their latest committed version, so the choice
+    # below is made on up-to-date counts.
+    workloads = list(
+        VetWorkload.objects.select_for_update(of=('self',))
+        .select_related('vet')
+        .filter(vet__role='vet', vet__district=district, pending_count__lt=MAX_PENDING_PER_VET)
+        .order_by('vet_id')
+    )
+    if not workloads:
+        return None
+
+    # Least pending first, lowest id as a stable tie-break, so new work is
+    # spread across the district instead of filling the first vet returned.
+    return min(workloads, key=lambda w: (w.pending_count, w.vet_id)).vet
+
+
+def parse_quantity_mg(value):
+    """
+    The submitted quantity as a float, or None when it was left out. Raises
+    ValueError for anything that isn't a finite, non-negative number.
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool):
+        raise ValueError('quantity_mg must be a number')
+    try:
+        quantity = float(value)
+    except (TypeError, ValueError):
+        raise ValueError('quantity_mg must be a number')
+    if not math.isfinite(quantity):
+        raise ValueError('quantity_mg must be a number')
+    if quantity < 0:
+        raise ValueError('quantity_mg must not be negative')
+    return quantity
+
+
+def create_treatment(farm, data, compliance_index=None):
+    """
+    Create a pending treatment for `farm`, auto-assigning a vet atomically.
+    Raises ValueError for an invalid quantity_mg. Pass `compliance_index`
+    when the caller already holds one, to skip the catalogue version query.
+    """
+    compliance_index = compliance_index or get_compliance_index()
+    quantity_mg = parse_quantity_mg(data.get('quantity_mg'))
+    with transaction.atomic():
+        assigned_vet = find_available_vet(farm.district)
+        return Treatment.objects.create(
+            farm=farm,
+            vet=assigned_vet,
+            status='pending',
+            antibiotic_name=data.get('antibiotic_name'),
+            molecule_id=compliance_index.molecule_id(data.get('antibiotic_name')),
+            reason=data.get('reason'),
+            treated_for=data.get('treated_for'),
+            date=data.get('date'),
+            quantity_mg=quantity_mg,
+        )
+
+
+
+def create_treatments(rows, compliance_index=None):
+    """
+    Bulk counterpart of create_treatment: `rows` are (farm, data) pairs, all
+    inserted with bulk_create in one transaction. Vets are dealt out per
+    district in a single pass, least loaded first; rows beyond the district's
+    capacity are left queued. Returns the treatments in the order given.
+    Rows must already have passed treatments.bulk.validate_rows.
+
+    bulk_create skips Treatment.save() and its signals, so the VetWorkload
+    counters and usage rollups are updated here.
+    """
+    compliance_index = compliance_index or get_compliance_index()
+    districts = {farm.district for farm, _ in rows if farm.district}
+
+    with transaction.atomic():
+        workloads = list(
+            VetWorkload.objects.select_for_update(of=('self',))
+            .filter(vet__role='vet', vet__district__in=districts, pending_count__lt=MAX_PENDING_PER_VET)
+            .annotate(district=F('vet__district'))
+            .order_by('vet_id')
+        )
+        heaps = defaultdict(list)
+        for w in workloads:
+            heaps[w.district].append((w.pending_count, w.vet_id, w))
+        for heap in heaps.values():
+            heapq.heapify(heap)
+
+        treatments = []
+        assigned = set()
+        for farm, data in rows:
+            heap = heaps.get(farm.district)
+            vet_id = None
+            if heap:
+                count, vet_id, workload = heapq.heappop(heap)
+                workload.pending_count = count + 1
+                assigned.add(vet_id)
+                if workload.pending_count < MAX_PENDING_PER_VET:
+                    heapq.heappush(heap, (workload.pending_count, vet_id, workload))
+            treatments.append(Treatment(
+                farm=farm,
+                vet_id=vet_id,
+                status='pending',
+                antibiotic_name=data.get('antibiotic_name'),
+                molecule_id=compliance_index.molecule_id(data.get('antibiotic_name')),
+                reason=data.get('reason'),
+                treated_for=data.get('treated_for'),
+                date=data.get('date'),
+                quantity_mg=parse_quantity_mg(data.get('quantity_mg')),
+            ))
+
+        Treatment.objects.bulk_create(treatments, batch_size=500)
+        # Counters are locked above, so absolute values are safe to write
+        VetWorkload.objects.bulk_update([w for w in workloads if w.vet_id in assigned], ['pending_count'])
+        rollups.record([rollups.treatment_entry(t) for t in treatments])
+    return treatments
+
+
+def _queued_treatment_ids(district, limit):
+    """Lock up to `limit` unassigned pending treatments in `district`, oldest first."""
+    return list(
+        Treatment.objects.select_for_update(skip_locked=True, of=('self',))
+        .filter(farm__district=district, vet__isnull=True, status='pending')
+        .order_by('created_at', 'id')
+        .values_list('id', flat=True)[:limit]
+    )
+
+
+def fill_vet(vet):
+    """
+    Assign queued treatments from the vet's district until they reach the
+    pending cap, in a single UPDATE. Returns the number assigned.
+    """
+    if not vet.district:
+        return 0
+
+    with transaction.atomic():
+        workload, _ = VetWorkload.objects.select_for_update().get_or_create(vet=vet)
+        capacity = MAX_PENDING_PER_VET - workload.pending_count
+        if capacity <= 0:
+            return 0
+
+        treatment_ids = _queued_treatment_ids(vet.district, capacity)
+        if treatment_ids:
+            Treatment.objects.filter(id__in=treatment_ids).update(vet=vet)
+            VetWorkload.adjust(vet.id, len(treatment_ids))
+        return len(treatment_ids)
+
+
+def drain_district(district, batch_size=500):
+    """
+    Spread one batch of a district's unassigned backlog over its vets, least
+    loaded first. Rows locked by another drainer are skipped, so several
+    workers can run side by side. Returns the number assigned.
+    """
+    with transaction.atomic():
+        workloads = list(
+            VetWorkload.objects.select_for_update(of=('self',))
+            .filter(vet__role='vet', vet__district=district, pending_count__lt=MAX_PENDING_PER_VET)
+            .order_by('vet_id')
+        )
+        capacity = sum(MAX_PENDING_PER_VET - w.pending_count for w in workloads)
+        if not capacity:
+            return 0
+
+        treatment_ids = _queued_treatment_ids(district, min(capacity, batch_size))
+        if not treatment_ids:
+            return 0
+
+        # Deal treatments out one at a time to whichever vet is least loaded
+        heap = [(w.pending_count, w.vet_id, w) for w in workloads]
+        heapq.heapify(heap)
+        assigned = defaultdict(list)
+        for treatment_id in treatment_ids:
+            count, vet_id, workload = heapq.heappop(heap)
+            assigned[vet_id].append(treatment_id)
+            workload.pending_count = count + 1
+            if workload.pending_count < MAX_PENDING_PER_VET:
+                heapq.heappush(heap, (workload.pending_count, vet_id, workload))
+
+        for vet_id, ids in assigned.items():
+            Treatment.objects.filter(id__in=ids).update(vet_id=vet_id)
+        # Counters are locked above, so absolute values are safe to write
+        VetWorkload.objects.bulk_update(
+            [w for w in workloads if w.vet_id in assigned], ['pending_count']
+        )
+        return len(treatment_ids)
@@ -0,0 +1,113 @@
+"""
+Parsing and validation for bulk treatment submissions.
+
+A submission is a JSON array of treatments (or {"treatments": [...]}), or a
+CSV file with the same column names, uploaded as `file` or sent as the body
+with Content-Type: text/csv. Every row is validated against farms fetched in
+one query and a single fetch of the in-process compliance index before
+anything is written.
+"""
+import csv
+import datetime
+import io
+import json
+from farms.models import Farm
+from reference_data.lookup import get_compliance_index
+from .assignment import parse_quantity_mg
+from .compliance import ComplianceError, check_treatment, dose_per_kg
+from .models import Treatment
+
+BULK_FIELDS = ('farm', 'antibiotic_name', 'reason', 'treated_for', 'date', 'quantity_mg')
+REASONS = {value for value, _ in Treatment.REASON_CHOICES}
+TREATED_FOR = {value for value, _ in Treatment.TREATED_FOR_CHOICES}
+
+
+def parse_rows(request):
+    """Returns the submitted rows as a list. Raises ValueError on a malformed body."""
+    upload = request.FILES.get('file')
+    if upload is not None or request.content_type == 'text/csv':
+        raw = upload.read() if upload is not None else request.body
+        try:
+            text = raw.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise ValueError('CSV must be UTF-8 encoded')
+        return list(csv.DictReader(io.StringIO(text)))
+
+    data = json.loads(request.body)
+    if isinstance(data, dict):
+        data = data.get('treatments')
+    if not isinstance(data, list):
+        raise ValueError('Expected a JSON array of treatments')
+    return data
+
+
+def _farm_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _row_errors(row, farm, owner_id):
+    errors = {}
+    if farm is None or (owner_id is not None and farm.user_id != owner_id):
+        errors['farm'] = 'Farm not found'
+
+    name = (row.get('antibiotic_name') or '').strip()
+    if not name:
+        errors['antibiotic_name'] = 'Required'
+    elif len(name) > 100:
+        errors['antibiotic_name'] = 'At most 100 characters'
+    if row.get('reason') not in REASONS:
+        errors['reason'] = f"Must be one of {', '.join(sorted(REASONS))}"
+    if row.get('treated_for') not in TREATED_FOR:
+        errors['treated_for'] = f"Must be one of {', '.join(sorted(TREATED_FOR))}"
+    try:
+        datetime.date.fromisoformat(str(row.get('date')))
+    except ValueError:
+        errors['date'] = 'Must be a date as YYYY-MM-DD'
+
+    try:
+        parse_quantity_mg(row.get('quantity_mg'))
+    except ValueError as e:
+        errors['quantity_mg'] = str(e)
+    return errors
+
+
+def validate_rows(rows, owner_id=None, compliance_index=None):
+    """
+    Returns (valid, invalid). `valid` is a list of (index, farm, data,
+    compliance) for rows that can be inserted; `invalid` maps row index to a
+    {field: message} dict. With `owner_id`, farms belonging to anyone else
+    are treated as missing. Every row is checked against the one
+    `compliance_index`, fetched here when not given.
+    """
+    compliance_index = compliance_index or get_compliance_index()
+    farm_ids = {_farm_id(row.get('farm')) for row in rows if isinstance(row, dict)}
+    farms = Farm.objects.only(
+        'id', 'user_id', 'state', 'district', 'species_type', 'total_animals', 'avg_weight',
+    ).in_bulk(farm_ids - {None})
+
+    valid, invalid = [], {}
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            invalid[index] = {'row': 'Must be an object'}
+            continue
+        farm = farms.get(_farm_id(row.get('farm')))
+        errors = _row_errors(row, farm, owner_id)
+        compliance = None
+        if not errors:
+            try:
+                compliance = check_treatment(
+                    farm.species_type, row['antibiotic_name'], index=compliance_index,
+                    dose_mgkg=dose_per_kg(farm, parse_quantity_mg(row.get('quantity_mg'))),
+                )
+            except ComplianceError as e:
+                errors['antibiotic_name'] = str(e)
+        if errors:
+            invalid[index] = errors
+        else:
+            data = {field: row.get(field) for field in BULK_FIELDS}
+            data['antibiotic_name'] = data['antibiotic_name'].strip()
+            valid.append((index, farm, data, compliance))
+    return valid, invalid
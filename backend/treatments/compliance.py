@@ -0,0 +1,99 @@
+"""
+Compliance check run when a treatment is logged.
+
+The antibiotic is matched by normalised name to a reference Molecule,
+checked against the molecules approved for the farm's species, and the MRL
+limits for that pair are attached to the result. The checks themselves are
+dictionary lookups against the in-process ComplianceIndex; fetching the
+index costs one catalogue version query, so a request fetches it once and
+passes it to every check and to create_treatment.
+
+TREATMENT_COMPLIANCE_CHECK sets what happens to a treatment that fails:
+'enforce' rejects it, 'warn' accepts it and reports the failure in the
+response, 'off' skips the check. A dose per kg of live weight above a
+tissue's MRL doesn't fail the check, since residues fall below the limit
+over the withdrawal period; the tissues are listed so it can be observed.
+"""
+from dataclasses import dataclass
+from typing import Optional
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from reference_data.lookup import get_compliance_index
+
+COMPLIANCE_MODES = ('enforce', 'warn', 'off')
+
+
+@dataclass(frozen=True)
+class ComplianceResult:
+    molecule_id: Optional[int]
+    # None when the reference catalogue has nothing for the species
+    approved: Optional[bool]
+    mrl_limits: tuple = ()
+    message: str = ''
+    # Tissues whose MRL the dose per kg of live weight is above
+    mrl_exceeded: tuple = ()
+
+    def as_dict(self):
+        return {
+            'molecule_id': self.molecule_id,
+            'approved': self.approved,
+            'mrl_limits': [
+                {'tissue': tissue, 'mrl_mgkg': mrl, 'exceeded': tissue in self.mrl_exceeded}
+                for tissue, mrl in self.mrl_limits
+            ],
+            'message': self.message,
+        }
+
+
+class ComplianceError(ValueError):
+    def __init__(self, result):
+        super().__init__(result.message)
+        self.result = result
+
+
+def dose_per_kg(farm, quantity_mg):
+    """mg administered per kg of the farm's live weight, or None when either is unknown."""
+    live_weight = (farm.total_animals or 0) * (farm.avg_weight or 0)
+    if quantity_mg is None or live_weight <= 0:
+        return None
+    return quantity_mg / live_weight
+
+
+def check_treatment(species_type, antibiotic_name, mode=None, index=None, dose_mgkg=None):
+    """
+    Returns a ComplianceResult, or None when checking is off. Raises
+    ComplianceError for an unapproved antibiotic in 'enforce' mode, and
+    ImproperlyConfigured for an unknown mode. `index` defaults to the
+    current ComplianceIndex; `dose_mgkg` is compared with the MRL limits.
+    """
+    mode = mode or settings.TREATMENT_COMPLIANCE_CHECK
+    if mode not in COMPLIANCE_MODES:
+        raise ImproperlyConfigured(
+            f"TREATMENT_COMPLIANCE_CHECK must be one of {', '.join(COMPLIANCE_MODES)}, not {mode!r}"
+        )
+    if mode == 'off':
+        return None
+
+    index = index or get_compliance_index()
+    molecule_id = index.molecule_id(antibiotic_name)
+    limits = index.limits.get((molecule_id, species_type), ())
+    exceeded = () if dose_mgkg is None else tuple(tissue for tissue, mrl in limits if dose_mgkg > mrl)
+
+    if species_type not in index.species:
+        result = ComplianceResult(molecule_id, None, limits, f'No reference data for species {species_type}')
+    elif molecule_id is None:
+        result = ComplianceResult(None, False, (), f'Unknown antibiotic: {antibiotic_name}')
+    elif (molecule_id, species_type) not in index.approved:
+        result = ComplianceResult(molecule_id, False, limits, f'{antibiotic_name} is not approved for species {species_type}')
+    elif exceeded:
+        result = ComplianceResult(
+            molecule_id, True, limits,
+            f"Dose of {dose_mgkg:g} mg/kg is above the MRL for {', '.join(exceeded)}; observe the withdrawal period",
+            exceeded,
+        )
+    else:
+        result = ComplianceResult(molecule_id, True, limits)
+
+    if mode == 'enforce' and result.approved is False:
+        raise ComplianceError(result)
+    return result
@@ -0,0 +1,24 @@
+"""
+Queries behind the vet dashboard. They are independent of each other, so the
+async view runs them concurrently.
+"""
+from .models import Treatment
+
+VET_DASHBOARD_FIELDS = (
+    'id', 'antibiotic_name', 'reason', 'treated_for', 'date',
+    'farm__name', 'farm__farm_number', 'farm__village', 'farm__district', 'status'
+)
+
+
+def vet_pending(vet_id):
+    """Treatments waiting on the vet's decision, oldest first."""
+    return list(
+        Treatment.objects.filter(vet_id=vet_id, status='pending').order_by('date').values(*VET_DASHBOARD_FIELDS)
+    )
+
+
+def vet_history(vet_id, limit=10):
+    """The vet's most recent approvals."""
+    return list(
+        Treatment.objects.filter(vet_id=vet_id, status='approved').order_by('-date')[:limit].values(*VET_DASHBOARD_FIELDS)
+    )
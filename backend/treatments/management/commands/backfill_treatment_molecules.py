@@ -0,0 +1,82 @@
+import time
+from collections import Counter, defaultdict
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from analytics import rollups
+from reference_data.matching import MoleculeMatcher
+from treatments.models import Treatment
+
+
+class Command(BaseCommand):
+    help = 'Link treatments to reference molecules by (fuzzy) antibiotic name, in resumable batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Treatments per transaction (default: 1000)')
+        parser.add_argument('--cutoff', type=float, default=0.9,
+                            help='Minimum similarity (0-1) for a fuzzy match (default: 0.9)')
+        parser.add_argument('--start-id', type=int, default=0, help='Skip treatments with a lower id')
+        parser.add_argument('--dry-run', action='store_true', help='Report matches without writing them')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        matcher = MoleculeMatcher.from_db(cutoff=options['cutoff'])
+        if not matcher.ids:
+            self.stdout.write(self.style.WARNING('No molecules in the reference catalogue; run import_reference_data first'))
+            return
+
+        # Only unlinked rows are visited, so an interrupted run picks up where
+        # it left off when started again
+        pending = Treatment.objects.filter(molecule__isnull=True, id__gte=options['start_id'])
+        total = pending.count()
+        self.stdout.write(f"{total} treatments without a molecule")
+
+        processed = matched = 0
+        unmatched = Counter()
+        last_id = options['start_id'] - 1
+        started = time.perf_counter()
+        while True:
+            batch = list(
+                pending.filter(id__gt=last_id).order_by('id').values_list('id', 'antibiotic_name')[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1][0]
+
+            by_molecule = defaultdict(list)
+            for treatment_id, name in batch:
+                molecule_id = matcher.match(name)
+                if molecule_id is None:
+                    unmatched[name] += 1
+                else:
+                    by_molecule[molecule_id].append(treatment_id)
+
+            if not dry_run and by_molecule:
+                with transaction.atomic():
+                    # QuerySet.update() skips the rollup signal handlers, so
+                    # move the batch's usage counts to their molecules here
+                    linked = Treatment.objects.filter(id__in=[i for ids in by_molecule.values() for i in ids])
+                    # Locked, so nothing else moves these rows between the two counts
+                    list(linked.select_for_update().values_list('id'))
+                    before = rollups.count_entries(linked)
+                    for molecule_id, ids in by_molecule.items():
+                        # molecule__isnull guards against rows linked since the batch was read
+                        Treatment.objects.filter(id__in=ids, molecule__isnull=True).update(molecule_id=molecule_id)
+                    rollups.move(before, rollups.count_entries(linked))
+
+            processed += len(batch)
+            matched += sum(len(ids) for ids in by_molecule.values())
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"  {processed}/{total} processed, {matched} matched, last id {last_id} "
+                f"({processed / elapsed:.0f} rows/sec)"
+            )
+
+        verb = 'Would link' if dry_run else 'Linked'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {matched} of {processed} treatments; {processed - matched} left unmatched"
+        ))
+        if unmatched and options['verbosity'] >= 2:
+            self.stdout.write('Most common unmatched names:')
+            for name, count in unmatched.most_common(20):
+                self.stdout.write(f"  {count:>7}  {name!r}")
@@ -0,0 +1,84 @@
+import datetime
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from amu_monitoring.responses import BACKEND, dumps, stdlib_dumps
+from reference_data.views import build_drug_catalogue
+from treatments.models import Treatment
+from treatments.synthetic import FALLBACK_ANTIBIOTICS, REASON_WEIGHTS, TREATED_FOR_WEIGHTS
+
+
+def django_dumps(data):
+    """What django.http.JsonResponse did before: DjangoJSONEncoder, default separators."""
+    return json.dumps(data, cls=DjangoJSONEncoder).encode()
+
+
+class Command(BaseCommand):
+    help = 'Time JSON encoding of treatment rows (per 10k) and the drug catalogue with each encoder'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000, help='Treatment rows to encode (default: 10,000)')
+        parser.add_argument('--from-db', action='store_true', help='Encode real Treatment.objects.values() rows')
+        parser.add_argument('--repeat', type=int, default=10, help='Runs to time; the best is reported (default: 10)')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def synthesize(self, n, seed):
+        """Rows shaped like Treatment.objects.values()."""
+        rng = random.Random(seed)
+        now = timezone.now()
+        return [
+            {
+                'id': i + 1,
+                'farm_id': rng.randint(1, 10_000),
+                'vet_id': rng.choice((None, rng.randint(1, 200))),
+                'status': rng.choice(('pending', 'approved', 'rejected')),
+                'antibiotic_name': rng.choice(FALLBACK_ANTIBIOTICS),
+                'molecule_id': rng.randint(1, 300),
+                'reason': rng.choice(list(REASON_WEIGHTS)),
+                'treated_for': rng.choice(list(TREATED_FOR_WEIGHTS)),
+                'date': now.date() - datetime.timedelta(days=rng.randint(0, 730)),
+                'quantity_mg': rng.choice((None, round(rng.uniform(10, 50_000), 1))),
+                'created_at': now - datetime.timedelta(seconds=rng.randint(0, 10 ** 8)),
+            }
+            for i in range(n)
+        ]
+
+    def handle(self, *args, **options):
+        if options['from_db']:
+            rows = list(Treatment.objects.order_by('id').values()[:options['rows']])
+            source = 'Treatment.objects.values()'
+        else:
+            rows = self.synthesize(options['rows'], options['seed'])
+            source = 'synthetic rows'
+        payloads = [(f"{len(rows):,} treatments ({source})", rows)]
+        catalogue = build_drug_catalogue()
+        if catalogue:
+            payloads.append((f"drug catalogue ({len(catalogue):,} molecules)", catalogue))
+
+        encoders = [('DjangoJSONEncoder', django_dumps), ('stdlib fallback', stdlib_dumps)]
+        if BACKEND == 'orjson':
+            encoders.append(('orjson', dumps))
+        else:
+            self.stdout.write(self.style.WARNING('orjson is not installed; API responses use the stdlib fallback'))
+
+        for label, data in payloads:
+            self.stdout.write(label)
+            baseline = None
+            for name, encode in encoders:
+                timings = []
+                for _ in range(max(options['repeat'], 1)):
+                    started = time.perf_counter()
+                    encoded = encode(data)
+                    timings.append(time.perf_counter() - started)
+                best = min(timings)
+                baseline = baseline or best
+                per_10k = f"  {best * 1000 * 10_000 / len(data):8.2f} ms per 10k rows" if data is rows else ''
+                self.stdout.write(
+                    f"  {name:<18} {best * 1000:8.2f} ms{per_10k}  {len(encoded) / 1024:8.0f} KiB  "
+                    f"{baseline / best:5.1f}x"
+                )
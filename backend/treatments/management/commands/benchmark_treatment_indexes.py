@@ -0,0 +1,152 @@
+import re
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from amu_monitoring.users.models import User
+from farms.models import Farm
+from treatments.models import Treatment
+
+
+# Indexes added for the hot query paths, as (table, index name)
+BENCHMARK_INDEXES = [
+    (Treatment._meta.db_table, 'treatment_vet_status_date_idx'),
+    (Treatment._meta.db_table, 'treatment_farm_date_idx'),
+    (Treatment._meta.db_table, 'treatment_unassigned_idx'),
+    (Farm._meta.db_table, 'farm_district_idx'),
+    (User._meta.db_table, 'user_role_district_idx'),
+]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed synthetic treatments and compare query plans for the hot '
+        'treatment/farm/user lookups with and without the composite indexes. '
+        'Everything is rolled back unless --keep is given. PostgreSQL only.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--treatments', type=int, default=1_000_000, help='Treatments to seed (default: 1,000,000)')
+        parser.add_argument('--farms', type=int, default=20_000, help='Farms to seed (default: 20,000)')
+        parser.add_argument('--districts', type=int, default=50, help='Districts to spread data over (default: 50)')
+        parser.add_argument('--vets-per-district', type=int, default=5)
+        parser.add_argument('--keep', action='store_true', help='Commit the seeded rows instead of rolling back')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('This benchmark needs PostgreSQL (it relies on EXPLAIN ANALYZE and generate_series).')
+
+        try:
+            with transaction.atomic():
+                self.seed(options)
+                self.run_benchmark(options['verbosity'])
+                if not options['keep']:
+                    raise Rollback
+        except Rollback:
+            self.stdout.write('Seeded data rolled back.')
+
+    def seed(self, options):
+        self.stdout.write(f"Seeding {options['treatments']:,} treatments over {options['farms']:,} farms...")
+        districts = options['districts']
+        vets = districts * options['vets_per_district']
+        user_table = User._meta.db_table
+        farm_table = Farm._meta.db_table
+        treatment_table = Treatment._meta.db_table
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {user_table} (first_name, last_name, email_address, password, role, district, state)
+                SELECT 'Bench', 'Vet ' || g, 'bench-vet-' || g || '@example.com', '!', 'vet',
+                       'Bench District ' || (g %% %s), 'Bench State'
+                FROM generate_series(1, %s) AS g
+                """,
+                [districts, vets],
+            )
+            cursor.execute(
+                f"""
+                INSERT INTO {user_table} (first_name, last_name, email_address, password, role, district, state)
+                SELECT 'Bench', 'Farmer ' || g, 'bench-farmer-' || g || '@example.com', '!', 'farmer',
+                       'Bench District ' || (g %% %s), 'Bench State'
+                FROM generate_series(1, %s) AS g
+                """,
+                [districts, max(options['farms'] // 4, 1)],
+            )
+            cursor.execute(
+                f"""
+                INSERT INTO {farm_table} (user_id, name, state, district, village, farm_number, farm_type,
+                                          species_type, total_animals, avg_weight, avg_feed_consumption,
+                                          avg_water_consumption, created_at, updated_at)
+                SELECT u.id, 'Bench Farm ' || g, 'Bench State', 'Bench District ' || (g %% %s), NULL,
+                       'BF-' || g, 'commercial', (ARRAY['AVI','BOV','SUI','CAP','OVI'])[1 + g %% 5],
+                       100 + g %% 900, 1.5, 10, 20, now(), now()
+                FROM generate_series(1, %s) AS g
+                JOIN (SELECT id, row_number() OVER (ORDER BY id) AS n FROM {user_table}
+                      WHERE email_address LIKE 'bench-farmer-%%') AS u
+                  ON u.n = 1 + g %% (SELECT count(*) FROM {user_table} WHERE email_address LIKE 'bench-farmer-%%')
+                """,
+                [districts, options['farms']],
+            )
+            cursor.execute(
+                f"""
+                WITH farm_ids AS (SELECT array_agg(id) AS ids FROM {farm_table} WHERE name LIKE 'Bench Farm %%'),
+                     vet_ids AS (SELECT array_agg(id) AS ids FROM {user_table} WHERE email_address LIKE 'bench-vet-%%')
+                INSERT INTO {treatment_table} (farm_id, vet_id, status, antibiotic_name, reason, treated_for, date, created_at)
+                SELECT f.ids[1 + (g::bigint * 7919) %% array_length(f.ids, 1)],
+                       CASE WHEN g %% 50 = 0 THEN NULL ELSE v.ids[1 + g %% array_length(v.ids, 1)] END,
+                       CASE WHEN g %% 50 = 0 OR g %% 10 = 1 THEN 'pending'
+                            WHEN g %% 10 = 2 THEN 'rejected' ELSE 'approved' END,
+                       'Amoxicillin', 'treat_disease', 'respiratory',
+                       DATE '2020-01-01' + (g %% 2000), now()
+                FROM generate_series(1, %s) AS g, farm_ids f, vet_ids v
+                """,
+                [options['treatments']],
+            )
+            for table in (user_table, farm_table, treatment_table):
+                cursor.execute(f'ANALYZE {table}')
+
+    def hot_queries(self):
+        vet = User.objects.filter(email_address='bench-vet-1@example.com').values_list('id', 'district').get()
+        farm_id = Farm.objects.filter(name='Bench Farm 1').values_list('id', flat=True).get()
+        return [
+            ('Vet pending queue', Treatment.objects.filter(vet_id=vet[0], status='pending').order_by('date')),
+            ('Farm treatment history', Treatment.objects.filter(farm_id=farm_id).order_by('-date')),
+            ('District unassigned queue', Treatment.objects.filter(
+                farm__district=vet[1], vet__isnull=True, status='pending').order_by('created_at', 'id')[:50]),
+            ('Farms in district', Farm.objects.filter(district=vet[1])),
+            ('Vets in district', User.objects.filter(role='vet', district=vet[1])),
+        ]
+
+    def explain_all(self):
+        results = {}
+        for label, queryset in self.hot_queries():
+            plan = queryset.explain(analyze=True)
+            scans = sorted(set(re.findall(r'((?:Parallel )?(?:Seq|Index Only|Index|Bitmap Heap|Bitmap Index) Scan)', plan)))
+            timing = re.search(r'Execution Time: ([\d.]+) ms', plan)
+            results[label] = (', '.join(scans), float(timing.group(1)) if timing else None, plan)
+        return results
+
+    def run_benchmark(self, verbosity):
+        with_indexes = self.explain_all()
+
+        # Drop the indexes inside a savepoint to measure the pre-migration plans
+        sid = transaction.savepoint()
+        with connection.cursor() as cursor:
+            for _, name in BENCHMARK_INDEXES:
+                cursor.execute(f'DROP INDEX IF EXISTS {connection.ops.quote_name(name)}')
+        without_indexes = self.explain_all()
+        transaction.savepoint_rollback(sid)
+
+        for label in with_indexes:
+            before_scans, before_ms, before_plan = without_indexes[label]
+            after_scans, after_ms, after_plan = with_indexes[label]
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write(f"  without indexes: {before_scans:<40} {before_ms:>10.3f} ms")
+            self.stdout.write(f"  with indexes:    {after_scans:<40} {after_ms:>10.3f} ms")
+            if verbosity > 1:
+                self.stdout.write('  --- plan without indexes ---')
+                self.stdout.write(before_plan)
+                self.stdout.write('  --- plan with indexes ---')
+                self.stdout.write(after_plan)
@@ -0,0 +1,56 @@
+import time
+from django.core.management.base import BaseCommand
+from treatments.assignment import drain_district
+from treatments.models import Treatment
+
+
+class Command(BaseCommand):
+    help = 'Assign queued (unassigned, pending) treatments to vets with spare capacity, district by district'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--district', help='Only drain this district')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Treatments locked and assigned per transaction (default: 500)',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            help='Keep running, draining every INTERVAL seconds',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            assigned = self.drain(options['district'], options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f"Assigned {assigned} queued treatments"))
+
+            if options['interval'] is None:
+                break
+            time.sleep(options['interval'])
+
+    def drain(self, district, batch_size):
+        if district:
+            districts = [district]
+        else:
+            districts = (
+                Treatment.objects.filter(vet__isnull=True, status='pending', farm__district__isnull=False)
+                .order_by()
+                .values_list('farm__district', flat=True)
+                .distinct()
+            )
+
+        total = 0
+        for name in districts:
+            district_total = 0
+            # Each batch is its own transaction so locks are held briefly
+            while True:
+                assigned = drain_district(name, batch_size)
+                if not assigned:
+                    break
+                district_total += assigned
+            if district_total:
+                self.stdout.write(f"{name}: {district_total}")
+            total += district_total
+        return total
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from amu_monitoring.users.models import User
+from treatments.models import Treatment, VetWorkload
+
+
+class Command(BaseCommand):
+    help = 'Rebuild VetWorkload pending counters from treatments and report drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report drift without writing corrected counters',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+
+        with transaction.atomic():
+            # Lock every counter so assignments wait until the rebuild is done
+            stored = dict(
+                VetWorkload.objects.select_for_update().values_list('vet_id', 'pending_count')
+            )
+            actual = dict(
+                Treatment.objects.filter(status='pending', vet__isnull=False)
+                .order_by()
+                .values('vet_id')
+                .annotate(c=Count('id'))
+                .values_list('vet_id', 'c')
+            )
+            vet_ids = set(User.objects.filter(role='vet').values_list('id', flat=True))
+            vet_ids |= set(actual)
+
+            missing, drifted = [], []
+            for vet_id in sorted(vet_ids):
+                expected = actual.get(vet_id, 0)
+                if vet_id not in stored:
+                    missing.append(VetWorkload(vet_id=vet_id, pending_count=expected))
+                elif stored[vet_id] != expected:
+                    drifted.append(VetWorkload(vet_id=vet_id, pending_count=expected))
+                    self.stdout.write(
+                        f"Vet {vet_id}: stored {stored[vet_id]}, actual {expected} "
+                        f"(drift {stored[vet_id] - expected:+d})"
+                    )
+
+            if not dry_run:
+                VetWorkload.objects.bulk_create(missing, batch_size=1000)
+                VetWorkload.objects.bulk_update(drifted, ['pending_count'], batch_size=1000)
+
+        summary = f"{len(vet_ids)} vets checked, {len(drifted)} drifted, {len(missing)} missing counters"
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f"{summary} (dry run, nothing written)"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{summary}, all rebuilt"))
@@ -0,0 +1,278 @@
+import json
+import random
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlencode
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.utils import timezone
+
+from amu_monitoring.loadtest import HTTPTransport, WSGITransport, summarize
+from amu_monitoring.users.models import User
+from amu_monitoring.users.tokens import issue_access_token
+from farms.models import Farm
+from treatments.models import Treatment
+from treatments.synthetic import REASON_WEIGHTS, TREATED_FOR_WEIGHTS, antibiotics_by_species
+
+# Operation -> share of requests, roughly the frontend's traffic: mostly
+# dashboard loads, some treatments logged and decided, the odd login
+DEFAULT_MIX = {'login': 5, 'farmer_dashboard': 40, 'vet_dashboard': 30, 'log_treatment': 15, 'approve': 10}
+EXPECTED_STATUS = {'login': 200, 'farmer_dashboard': 200, 'vet_dashboard': 200, 'log_treatment': 201, 'approve': 200}
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise CommandError(f"Unknown operation {name!r} in --mix; choose from {', '.join(DEFAULT_MIX)}")
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise CommandError(f"--mix weights must be numbers: {part!r}")
+    return mix
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay the frontend traffic mix (login, farmer dashboard, vet dashboard, log '
+        'treatment, approve) for a fixed time and write a latency/throughput report. '
+        'Logs and decides real treatments, so run it against a seeded database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duration', type=float, default=60, help='Seconds to measure (default: 60)')
+        parser.add_argument('--warmup', type=float, default=5, help='Seconds to run before measuring (default: 5)')
+        parser.add_argument('--concurrency', type=int, default=16, help='Simulated users in flight (default: 16)')
+        parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                            help='Traffic mix as name=weight pairs (default: ' +
+                                 ','.join(f'{k}={v}' for k, v in DEFAULT_MIX.items()) + ')')
+        parser.add_argument('--base-url', help='Send HTTP requests to a running server (default: call the WSGI handler in-process)')
+        parser.add_argument('--host', default='localhost', help='Host header for in-process requests')
+        parser.add_argument('--prefix', default='synthetic',
+                            help="Only act as users whose email starts with this (default: synthetic, from seed_synthetic; '' for anyone)")
+        parser.add_argument('--password', default='synthetic', help='Password the login operation uses (default: synthetic)')
+        parser.add_argument('--users', type=int, default=200, help='Farmers and vets to act as, each (default: 200)')
+        parser.add_argument('--output', default='loadtest-reports', help='Directory for the JSON report (default: loadtest-reports)')
+        parser.add_argument('--compare', help="Earlier report to compare with, or 'latest' for the newest one in --output")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.password = options['password']
+        self.transport = HTTPTransport(options['base_url']) if options['base_url'] else WSGITransport(options['host'])
+        self.load_users(options['prefix'], options['users'], options['seed'])
+
+        output = Path(options['output'])
+        baseline = self.load_baseline(options['compare'], output)
+        mix = {name: weight for name, weight in options['mix'].items() if weight > 0}
+        self.stdout.write(
+            f"{len(self.farmers)} farmers, {len(self.vets)} vets, {len(self.pending)} pending treatments queued; "
+            f"{options['concurrency']} in flight for {options['warmup']:g}s warm-up + {options['duration']:g}s"
+        )
+
+        started_at = timezone.now()
+        records = self.run(mix, options['concurrency'], options['warmup'], options['duration'], options['seed'])
+        report = self.build_report(records, options, mix, started_at)
+
+        output.mkdir(parents=True, exist_ok=True)
+        path = output / f"loadtest-{started_at:%Y%m%d-%H%M%S}.json"
+        path.write_text(json.dumps(report, indent=2))
+        self.print_report(report, baseline)
+        self.stdout.write(self.style.SUCCESS(f"Report written to {path}"))
+
+    def load_users(self, prefix, limit, seed):
+        users = User.objects.filter(email_address__startswith=prefix)
+        farmers = list(users.filter(role='farmer', farms__isnull=False).distinct().order_by('id')[:limit])
+        self.vets = list(users.filter(role='vet').order_by('id')[:limit])
+        if not farmers or not self.vets:
+            raise CommandError('Needs farmers with farms and vets to act as; run seed_synthetic first or pass --prefix')
+
+        farms = {}
+        for user_id, farm_id, species in Farm.objects.filter(user__in=farmers).values_list('user_id', 'id', 'species_type'):
+            farms.setdefault(user_id, []).append((farm_id, species))
+        antibiotics = antibiotics_by_species({species for owned in farms.values() for _, species in owned})
+        self.farmers = [
+            (farmer, issue_access_token(farmer), [(farm_id, antibiotics[species]) for farm_id, species in farms[farmer.id]])
+            for farmer in farmers
+        ]
+        self.vets = [(vet, issue_access_token(vet)) for vet in self.vets]
+
+        # Treatments waiting for a decision, as (treatment id, index of the vet
+        # who sees it); topped up from vet dashboard responses during the run
+        vet_index = {vet.id: i for i, (vet, _) in enumerate(self.vets)}
+        pending = list(
+            Treatment.objects.filter(vet_id__in=list(vet_index), status='pending').values_list('id', 'vet_id')
+        )
+        random.Random(seed).shuffle(pending)
+        self.pending = deque(((treatment_id, vet_index[vet_id]) for treatment_id, vet_id in pending), maxlen=10_000)
+
+    def load_baseline(self, compare, output):
+        if not compare:
+            return None
+        if compare == 'latest':
+            reports = sorted(output.glob('loadtest-*.json'))
+            if not reports:
+                self.stdout.write(self.style.WARNING(f"No earlier report in {output} to compare with"))
+                return None
+            compare = reports[-1]
+        try:
+            return json.loads(Path(compare).read_text())
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Can't read report {compare}: {e}")
+
+    # Operations: each sends one request and returns its status code, or
+    # None when there is nothing to do
+
+    def json_request(self, method, path, token=None, query='', payload=None):
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        body = b''
+        if payload is not None:
+            body = json.dumps(payload).encode()
+            headers['Content-Type'] = 'application/json'
+        return self.transport.request(method, path, query, body, headers)
+
+    def op_login(self, rng):
+        user = rng.choice(self.farmers)[0] if rng.random() < 0.5 else rng.choice(self.vets)[0]
+        status, _ = self.json_request('POST', '/api/login/', payload={
+            'email_address': user.email_address, 'password': self.password,
+        })
+        return status
+
+    def op_farmer_dashboard(self, rng):
+        farmer, token, _ = rng.choice(self.farmers)
+        status, _ = self.json_request('GET', '/api/dashboard/', token, urlencode({'email': farmer.email_address}))
+        return status
+
+    def op_vet_dashboard(self, rng):
+        index = rng.randrange(len(self.vets))
+        vet, token = self.vets[index]
+        status, body = self.json_request('GET', '/api/treatments/', token, urlencode({'vet_email': vet.email_address}))
+        if status == 200:
+            self.pending.extend((treatment['id'], index) for treatment in json.loads(body)['pending'])
+        return status
+
+    def op_log_treatment(self, rng):
+        _, token, farms = rng.choice(self.farmers)
+        farm_id, antibiotics = rng.choice(farms)
+        status, _ = self.json_request('POST', '/api/treatments/', token, payload={
+            'farm': farm_id,
+            'antibiotic_name': rng.choice(antibiotics),
+            'reason': rng.choices(list(REASON_WEIGHTS), list(REASON_WEIGHTS.values()))[0],
+            'treated_for': rng.choices(list(TREATED_FOR_WEIGHTS), list(TREATED_FOR_WEIGHTS.values()))[0],
+            'date': timezone.localdate().isoformat(),
+            'quantity_mg': round(rng.uniform(100, 50_000), 1),
+        })
+        return status
+
+    def op_approve(self, rng):
+        try:
+            treatment_id, index = self.pending.popleft()
+        except IndexError:
+            return None
+        action = 'approve' if rng.random() < 0.9 else 'reject'
+        status, _ = self.json_request('POST', f'/api/treatments/{treatment_id}/action/', self.vets[index][1],
+                                      payload={'action': action})
+        return status
+
+    def run(self, mix, concurrency, warmup, duration, seed):
+        """Returns (operation, status, latency) for every request started after the warm-up."""
+        names, weights = list(mix), list(mix.values())
+        operations = {name: getattr(self, f'op_{name}') for name in names}
+        start = time.perf_counter()
+        measure_from, deadline = start + warmup, start + warmup + duration
+        barrier = threading.Barrier(concurrency)
+
+        def simulated_user(index):
+            rng = random.Random(seed * 1000 + index)
+            records = []
+            barrier.wait()
+            try:
+                while True:
+                    started = time.perf_counter()
+                    if started >= deadline:
+                        return records
+                    name = rng.choices(names, weights)[0]
+                    try:
+                        status = operations[name](rng)
+                    except Exception:
+                        status = 0
+                    if status is not None and started >= measure_from:
+                        records.append((name, status, time.perf_counter() - started))
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(simulated_user, range(concurrency)))
+        self.elapsed = time.perf_counter() - measure_from
+        return [record for records in results for record in records]
+
+    def build_report(self, records, options, mix, started_at):
+        if not records:
+            raise CommandError('No requests completed in the measured window')
+
+        def stats(rows):
+            errors = Counter(status for name, status, _ in rows if status != EXPECTED_STATUS[name])
+            return {
+                'requests': len(rows),
+                'errors': sum(errors.values()),
+                'error_statuses': {str(status): count for status, count in sorted(errors.items())},
+                **{key: round(value, 3) for key, value in summarize([r[2] for r in rows], self.elapsed).items()},
+            }
+
+        by_operation = {}
+        for record in records:
+            by_operation.setdefault(record[0], []).append(record)
+        return {
+            'started_at': started_at.isoformat(),
+            'target': options['base_url'] or 'in-process WSGI',
+            'database': connection.vendor,
+            'duration_s': round(self.elapsed, 3),
+            'warmup_s': options['warmup'],
+            'concurrency': options['concurrency'],
+            'mix': mix,
+            'users': {'farmers': len(self.farmers), 'vets': len(self.vets)},
+            'total': stats(records),
+            'operations': {name: stats(rows) for name, rows in sorted(by_operation.items())},
+        }
+
+    def print_report(self, report, baseline):
+        self.stdout.write(
+            f"\n{'operation':<17}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'mean ms':>9}"
+        )
+        rows = list(report['operations'].items()) + [('total', report['total'])]
+        for name, stats in rows:
+            line = (
+                f"{name:<17}{stats['requests']:>9}{stats['errors']:>8}{stats['rps']:>9.1f}"
+                f"{stats['p50_ms']:>9.2f}{stats['p95_ms']:>9.2f}{stats['p99_ms']:>9.2f}{stats['mean_ms']:>9.2f}"
+            )
+            self.stdout.write(self.style.ERROR(line) if stats['errors'] else line)
+
+        if baseline is None:
+            return
+        self.stdout.write(f"\nChange since {baseline['started_at']} ({baseline['target']}):")
+        before = dict(baseline['operations'], total=baseline['total'])
+        for name, stats in rows:
+            if name not in before:
+                continue
+            changes = '  '.join(
+                f"{label} {self.change(before[name][key], stats[key], higher_is_better)}"
+                for label, key, higher_is_better in (
+                    ('req/s', 'rps', True), ('p50', 'p50_ms', False), ('p99', 'p99_ms', False),
+                )
+            )
+            self.stdout.write(f"{name:<17}{changes}")
+
+    def change(self, before, after, higher_is_better):
+        if not before:
+            return '     n/a'
+        percent = (after - before) * 100 / before
+        text = f'{percent:+7.1f}%'
+        better = percent > 0 if higher_is_better else percent < 0
+        if abs(percent) < 5:
+            return text
+        return self.style.SUCCESS(text) if better else self.style.ERROR(text)
@@ -0,0 +1,230 @@
+import datetime
+import time
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from amu_monitoring.users.models import User
+from analytics import rollups
+from analytics.indicators import STANDARD_WEIGHTS_KG
+from farms.models import Farm
+from reference_data.lookup import get_compliance_index
+from treatments.assignment import MAX_PENDING_PER_VET
+from treatments.models import Treatment, VetWorkload
+from treatments.synthetic import REASON_WEIGHTS, SPECIES_PROFILES, TREATED_FOR_WEIGHTS, antibiotics_by_species
+
+# Rows per unit of --scale
+FARMERS_PER_SCALE = 5_000
+FARMS_PER_SCALE = 10_000
+TREATMENTS_PER_SCALE = 1_000_000
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed synthetic users, vets per district, farms across every species and '
+        'treatments with bulk inserts; --scale 1 is 1M treatments over 10k farms'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0, help='Size multiplier (default: 1)')
+        parser.add_argument('--farmers', type=int, help=f'Farmers (default: {FARMERS_PER_SCALE:,} x scale)')
+        parser.add_argument('--farms', type=int, help=f'Farms (default: {FARMS_PER_SCALE:,} x scale)')
+        parser.add_argument('--treatments', type=int, help=f'Treatments (default: {TREATMENTS_PER_SCALE:,} x scale)')
+        parser.add_argument('--districts', type=int, default=50, help='Districts (default: 50)')
+        parser.add_argument('--states', type=int, default=10, help='States the districts belong to (default: 10)')
+        parser.add_argument('--vets-per-district', type=int, default=4, help='Vets per district (default: 4)')
+        parser.add_argument('--days', type=int, default=730, help='Days of treatment history (default: 730)')
+        parser.add_argument('--pending-days', type=int, default=14,
+                            help='Treatments from the last N days are still pending (default: 14)')
+        parser.add_argument('--prefix', default='synthetic', help='Email prefix of the seeded users (default: synthetic)')
+        parser.add_argument('--password', default='synthetic', help='Password of every seeded user (default: synthetic)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per INSERT (default: 5000)')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        scale = options['scale']
+        self.prefix = options['prefix']
+        self.batch_size = options['batch_size']
+        self.rng = np.random.default_rng(options['seed'])
+        n_farmers = options['farmers'] or max(int(FARMERS_PER_SCALE * scale), 1)
+        n_farms = options['farms'] or max(int(FARMS_PER_SCALE * scale), 1)
+        n_treatments = options['treatments'] if options['treatments'] is not None else int(TREATMENTS_PER_SCALE * scale)
+
+        if User.objects.filter(email_address__startswith=f'{self.prefix}-').exists():
+            raise CommandError(f"Users with the prefix {self.prefix!r} already exist; pass another --prefix")
+
+        self.districts = [f'{self.prefix.title()} District {i + 1}' for i in range(options['districts'])]
+        self.states = [f'{self.prefix.title()} State {i % options["states"] + 1}' for i in range(options['districts'])]
+
+        # Hashed once and shared: hashing per user would dominate the run
+        password = make_password(options['password'])
+        vets_by_district = self.seed_users(n_farmers, options['vets_per_district'], password)
+        farms = self.seed_farms(n_farms)
+        pending = self.seed_treatments(n_treatments, farms, vets_by_district, options['days'], options['pending_days'])
+
+        VetWorkload.objects.bulk_create(
+            [VetWorkload(vet_id=vet_id, pending_count=pending.get(vet_id, 0))
+             for vets in vets_by_district for vet_id in vets],
+            batch_size=self.batch_size,
+        )
+        started = time.perf_counter()
+        daily, monthly = rollups.rebuild(batch_size=self.batch_size)
+        self.stdout.write(f"Rebuilt usage rollups ({daily:,} daily, {monthly:,} monthly rows) in {time.perf_counter() - started:.1f}s")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {n_farmers:,} farmers, {sum(map(len, vets_by_district)):,} vets, {n_farms:,} farms and "
+            f"{n_treatments:,} treatments. Log in as {self.prefix}-farmer-1@example.com, "
+            f"{self.prefix}-vet-1@example.com or {self.prefix}-regulator-1@example.com "
+            f"with password {options['password']!r}."
+        ))
+
+    def bulk_insert(self, label, model, objects):
+        started = time.perf_counter()
+        with transaction.atomic():
+            model.objects.bulk_create(objects, batch_size=self.batch_size)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"  {label}: {len(objects):,} rows in {elapsed:.1f}s ({len(objects) / elapsed:,.0f} rows/sec)")
+
+    def seed_users(self, n_farmers, vets_per_district, password):
+        """Returns the vet ids of each district, indexed like self.districts."""
+        profile = {'address': 'Synthetic address', 'phone_number': '0000000000'}
+        users = [
+            User(first_name='Vet', last_name=str(n + 1), email_address=f'{self.prefix}-vet-{n + 1}@example.com',
+                 password=password, role='vet', state=self.states[n % len(self.districts)],
+                 district=self.districts[n % len(self.districts)], **profile)
+            for n in range(len(self.districts) * vets_per_district)
+        ]
+        farmer_districts = self.rng.integers(0, len(self.districts), n_farmers)
+        users += [
+            User(first_name='Farmer', last_name=str(n + 1), email_address=f'{self.prefix}-farmer-{n + 1}@example.com',
+                 password=password, role='farmer', state=self.states[d], district=self.districts[d], **profile)
+            for n, d in enumerate(farmer_districts)
+        ]
+        users += [
+            User(first_name='Regulator', last_name=str(n + 1), email_address=f'{self.prefix}-regulator-{n + 1}@example.com',
+                 password=password, role='regulator', **profile)
+            for n in range(2)
+        ]
+        self.bulk_insert('users', User, users)
+
+        vets_by_district = [[] for _ in self.districts]
+        district_index = {name: i for i, name in enumerate(self.districts)}
+        self.farmers = []  # (user id, district index)
+        rows = User.objects.filter(email_address__startswith=f'{self.prefix}-').values_list('id', 'role', 'district')
+        for user_id, role, district in rows.order_by('id'):
+            if role == 'vet':
+                vets_by_district[district_index[district]].append(user_id)
+            elif role == 'farmer':
+                self.farmers.append((user_id, district_index[district]))
+        return vets_by_district
+
+    def seed_farms(self, n_farms):
+        """Returns the seeded farms as arrays: id, district index, species code, head count, weight."""
+        codes = list(SPECIES_PROFILES)
+        shares = np.array([share for share, _ in SPECIES_PROFILES.values()])
+        species = self.rng.choice(len(codes), n_farms, p=shares / shares.sum())
+        owners = self.rng.integers(0, len(self.farmers), n_farms)
+        low = np.array([SPECIES_PROFILES[c][1][0] for c in codes])[species]
+        high = np.array([SPECIES_PROFILES[c][1][1] for c in codes])[species]
+        animals = np.exp(self.rng.uniform(np.log(low), np.log(high + 1))).astype(int)
+        weight = np.array([STANDARD_WEIGHTS_KG[c] for c in codes])[species] * self.rng.uniform(0.6, 1.4, n_farms)
+
+        farms = []
+        for n in range(n_farms):
+            user_id, district = self.farmers[owners[n]]
+            farms.append(Farm(
+                user_id=user_id,
+                name=f'Farm {n + 1}',
+                state=self.states[district],
+                district=self.districts[district],
+                village=f'Village {self.rng.integers(1, 200)}',
+                farm_number=f'{self.prefix.upper()}-{n + 1:07d}',
+                farm_type='backyard' if animals[n] < 50 else 'commercial',
+                species_type=codes[species[n]],
+                total_animals=int(animals[n]),
+                avg_weight=round(float(weight[n]), 4),
+                avg_feed_consumption=round(float(weight[n]) * 0.03, 4),
+                avg_water_consumption=round(float(weight[n]) * 0.08, 4),
+            ))
+        self.bulk_insert('farms', Farm, farms)
+
+        rows = list(
+            Farm.objects.filter(farm_number__startswith=f'{self.prefix.upper()}-')
+            .order_by('id').values_list('id', 'district', 'species_type', 'total_animals', 'avg_weight')
+        )
+        district_index = {name: i for i, name in enumerate(self.districts)}
+        return {
+            'id': np.array([r[0] for r in rows]),
+            'district': np.array([district_index[r[1]] for r in rows]),
+            'species': np.array([r[2] for r in rows]),
+            'animals': np.array([r[3] for r in rows], dtype=float),
+            'weight': np.array([r[4] for r in rows], dtype=float),
+        }
+
+    def seed_treatments(self, n_treatments, farms, vets_by_district, days, pending_days):
+        """Inserts the treatments in batches; returns the pending count of each vet."""
+        antibiotics = antibiotics_by_species(SPECIES_PROFILES)
+        compliance_index = get_compliance_index()
+        molecule_ids = {name: compliance_index.molecule_id(name) for names in antibiotics.values() for name in names}
+        reasons, reason_p = list(REASON_WEIGHTS), list(REASON_WEIGHTS.values())
+        targets, target_p = list(TREATED_FOR_WEIGHTS), list(TREATED_FOR_WEIGHTS.values())
+        today = timezone.localdate()
+        dates = [today - datetime.timedelta(days=d) for d in range(days)]
+        # Bigger farms treat more often
+        farm_p = np.log1p(farms['animals'])
+        farm_p /= farm_p.sum()
+
+        pending = {}
+        inserted = 0
+        started = time.perf_counter()
+        while inserted < n_treatments:
+            n = min(self.batch_size * 10, n_treatments - inserted)
+            farm = self.rng.choice(len(farm_p), n, p=farm_p)
+            age = self.rng.integers(0, days, n)
+            decided = self.rng.random(n)
+            reason = self.rng.choice(len(reasons), n, p=reason_p)
+            target = self.rng.choice(len(targets), n, p=target_p)
+            pick = self.rng.random((n, 2))
+            # Animals treated x kg each x 5-25 mg/kg x 1-5 days; not always recorded
+            quantity = (
+                np.maximum(farms['animals'][farm] * self.rng.uniform(0.05, 1.0, n), 1)
+                * farms['weight'][farm] * self.rng.uniform(5, 25, n) * self.rng.integers(1, 6, n)
+            )
+            quantity[self.rng.random(n) < 0.15] = np.nan
+
+            treatments = []
+            for i in range(n):
+                f = farm[i]
+                vets = vets_by_district[farms['district'][f]]
+                vet_id = vets[int(pick[i, 0] * len(vets))] if vets else None
+                if age[i] < pending_days:
+                    status = 'pending'
+                    # Past the cap the treatment waits in the district queue
+                    if vet_id is not None and pending.get(vet_id, 0) < MAX_PENDING_PER_VET:
+                        pending[vet_id] = pending.get(vet_id, 0) + 1
+                    else:
+                        vet_id = None
+                else:
+                    status = 'approved' if decided[i] < 0.88 else 'rejected'
+                names = antibiotics[farms['species'][f]]
+                name = names[int(pick[i, 1] * len(names))]
+                treatments.append(Treatment(
+                    farm_id=int(farms['id'][f]),
+                    vet_id=vet_id,
+                    status=status,
+                    antibiotic_name=name,
+                    molecule_id=molecule_ids[name],
+                    reason=reasons[reason[i]],
+                    treated_for=targets[target[i]],
+                    date=dates[age[i]],
+                    quantity_mg=None if np.isnan(quantity[i]) else round(float(quantity[i]), 1),
+                ))
+            with transaction.atomic():
+                Treatment.objects.bulk_create(treatments, batch_size=self.batch_size)
+            inserted += n
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"  treatments: {inserted:,}/{n_treatments:,} ({inserted / elapsed:,.0f} rows/sec)")
+        return pending
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Q
+
+
+def backfill_vet_workload(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    VetWorkload = apps.get_model('treatments', 'VetWorkload')
+    vets = User.objects.filter(role='vet').annotate(
+        pending=Count('assigned_treatments', filter=Q(assigned_treatments__status='pending'))
+    )
+    VetWorkload.objects.bulk_create(
+        [VetWorkload(vet_id=vet.id, pending_count=vet.pending) for vet in vets],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_user_address_user_district_user_phone_number_and_more'),
+        ('treatments', '0002_treatment_status_treatment_vet'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VetWorkload',
+            fields=[
+                ('vet', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='workload', serialize=False, to='users.user')),
+                ('pending_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_vet_workload, migrations.RunPython.noop),
+    ]
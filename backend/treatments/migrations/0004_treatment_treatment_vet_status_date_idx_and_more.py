@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('treatments', '0003_vetworkload'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='treatment',
+            index=models.Index(fields=['vet', 'status', 'date'], name='treatment_vet_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='treatment',
+            index=models.Index(fields=['farm', '-date'], name='treatment_farm_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='treatment',
+            index=models.Index(condition=models.Q(('status', 'pending'), ('vet__isnull', True)), fields=['farm', 'created_at'], name='treatment_unassigned_idx'),
+        ),
+    ]
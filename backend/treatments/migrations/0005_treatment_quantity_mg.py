@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('treatments', '0004_treatment_treatment_vet_status_date_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='treatment',
+            name='quantity_mg',
+            field=models.FloatField(blank=True, help_text='Total active substance administered, in mg', null=True),
+        ),
+    ]
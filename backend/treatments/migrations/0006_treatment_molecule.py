@@ -0,0 +1,20 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reference_data', '0001_initial'),
+        ('treatments', '0005_treatment_quantity_mg'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='treatment',
+            name='molecule',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='treatments', to='reference_data.molecule'),
+        ),
+    ]
@@ -1,5 +1,7 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from farms.models import Farm
+from reference_data.models import Molecule
 from amu_monitoring.users.models import User
 
 class Treatment(models.Model):
@@ -26,10 +28,111 @@ class Treatment(models.Model):
     vet = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='assigned_treatments')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     antibiotic_name = models.CharField(max_length=100)
+    # Reference molecule antibiotic_name resolves to; NULL when it matches none
+    molecule = models.ForeignKey(Molecule, on_delete=models.SET_NULL, null=True, blank=True, related_name='treatments')
     reason = models.CharField(max_length=20, choices=REASON_CHOICES)
     treated_for = models.CharField(max_length=20, choices=TREATED_FOR_CHOICES)
     date = models.DateField()
+    quantity_mg = models.FloatField(blank=True, null=True, help_text="Total active substance administered, in mg")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Vet dashboard: pending queue and approved history, ordered by date
+            models.Index(fields=['vet', 'status', 'date'], name='treatment_vet_status_date_idx'),
+            # Farm details / farmer dashboard: a farm's treatments, newest first
+            models.Index(fields=['farm', '-date'], name='treatment_farm_date_idx'),
+            # Assignment queue: only pending, unassigned rows, oldest first
+            models.Index(
+                fields=['farm', 'created_at'],
+                name='treatment_unassigned_idx',
+                condition=models.Q(vet__isnull=True, status='pending'),
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the persisted values so save() can keep VetWorkload and the
+        # usage rollups in step
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def counted_vet_id(self, refresh=False):
+        """
+        The vet whose VetWorkload counts this treatment as stored: its vet if
+        it is persisted as pending, else None. Uses the values it was loaded
+        with when it has both; an instance loaded without them (.only(),
+        .defer()) or built by hand is read back from the database.
+        """
+        loaded = {} if refresh else getattr(self, '_loaded_values', {})
+        if 'status' in loaded and 'vet_id' in loaded:
+            vet_id, status = loaded['vet_id'], loaded['status']
+        else:
+            stored = None
+            if self.pk is not None:
+                stored = Treatment.objects.filter(pk=self.pk).values_list('vet_id', 'status').first()
+            if stored is None:
+                return None
+            vet_id, status = stored
+        return vet_id if status == 'pending' else None
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            old_vet_id = self.counted_vet_id()
+            super().save(*args, **kwargs)
+            if kwargs.get('update_fields') is None:
+                new_vet_id = self.vet_id if self.status == 'pending' else None
+            else:
+                # Fields left out of update_fields keep their stored values
+                new_vet_id = self.counted_vet_id(refresh=True)
+            VetWorkload.record_transition(old_vet_id, new_vet_id)
+
+        self._loaded_values = {
+            field.attname: self.__dict__[field.attname]
+            for field in self._meta.concrete_fields if field.attname in self.__dict__
+        }
+
     def __str__(self):
         return f"{self.antibiotic_name} - {self.farm.name} - {self.status}"
+
+
+class VetWorkload(models.Model):
+    """
+    Denormalised count of pending treatments assigned to each vet.
+
+    Treatment.save() and the pre_delete handler keep this in step; code that
+    moves treatments with QuerySet.update() must call adjust() itself. Run the
+    reconcile_vet_workload command to rebuild it from treatments_treatment.
+    """
+    vet = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='workload')
+    pending_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def adjust(cls, vet_id, delta):
+        if vet_id is None or not delta:
+            return
+        updated = cls.objects.filter(vet_id=vet_id).update(
+            pending_count=F('pending_count') + delta
+        )
+        if not updated:
+            # No counter yet: seed it from the source of truth, which already
+            # includes the change being recorded.
+            _, created = cls.objects.get_or_create(
+                vet_id=vet_id,
+                defaults={'pending_count': Treatment.objects.filter(vet_id=vet_id, status='pending').count()}
+            )
+            if not created:
+                cls.objects.filter(vet_id=vet_id).update(pending_count=F('pending_count') + delta)
+
+    @classmethod
+    def record_transition(cls, old_vet_id, new_vet_id):
+        """Move one pending treatment from old_vet_id's count to new_vet_id's."""
+        if old_vet_id == new_vet_id:
+            return
+        cls.adjust(old_vet_id, -1)
+        cls.adjust(new_vet_id, 1)
+
+    def __str__(self):
+        return f"{self.vet} - {self.pending_count} pending"
@@ -0,0 +1,26 @@
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+from amu_monitoring.users.models import User
+from .models import Treatment, VetWorkload
+
+
+@receiver(pre_delete, sender=Treatment)
+def release_vet_workload(sender, instance, **kwargs):
+    # pre_delete runs in the deletion's transaction while the row can still
+    # be read back, for instances loaded without status or vet
+    VetWorkload.adjust(instance.counted_vet_id(), -1)
+
+
+@receiver(post_save, sender=User)
+def create_vet_workload(sender, instance, created, raw=False, **kwargs):
+    # Assignment only considers vets with a counter row, so create it up front,
+    # including for users whose role is changed to vet later
+    if raw or instance.role != 'vet':
+        return
+    if created:
+        VetWorkload.objects.create(vet=instance)
+    else:
+        VetWorkload.objects.get_or_create(
+            vet=instance,
+            defaults={'pending_count': Treatment.objects.filter(vet=instance, status='pending').count()},
+        )
@@ -0,0 +1,44 @@
+"""
+Shapes of the synthetic data made by seed_synthetic and replayed by
+run_loadtest.
+
+Antibiotics are drawn from the molecules the reference catalogue approves
+for each species, so synthetic treatments pass the compliance check; species
+without reference data (which the check lets through) use a fixed list.
+"""
+from reference_data.lookup import get_compliance_index
+from reference_data.models import Molecule
+
+# Used for species the reference catalogue has nothing on
+FALLBACK_ANTIBIOTICS = (
+    'Amoxicillin', 'Oxytetracycline', 'Enrofloxacin', 'Tylosin', 'Sulfadimidine',
+    'Gentamicin', 'Ceftiofur', 'Florfenicol', 'Colistin', 'Benzylpenicillin',
+)
+
+# Species code -> (share of farms, (min, max) head count)
+SPECIES_PROFILES = {
+    'AVI': (0.30, (200, 20_000)),
+    'BOV': (0.25, (2, 150)),
+    'SUI': (0.10, (10, 1_000)),
+    'CAP': (0.10, (5, 200)),
+    'OVI': (0.08, (5, 300)),
+    'EQU': (0.02, (1, 30)),
+    'LEP': (0.03, (10, 500)),
+    'PIS': (0.07, (500, 50_000)),
+    'CAM': (0.02, (1, 40)),
+    'API': (0.03, (5, 200)),
+}
+
+REASON_WEIGHTS = {'treat_disease': 0.7, 'prophylactic': 0.2, 'other': 0.1}
+TREATED_FOR_WEIGHTS = {'enteric': 0.35, 'respiratory': 0.4, 'reproductive': 0.15, 'other': 0.1}
+
+
+def antibiotics_by_species(species_codes):
+    """Species code -> tuple of antibiotic names that pass the compliance check for it."""
+    index = get_compliance_index()
+    names = dict(Molecule.objects.filter(id__in={m for m, _ in index.approved}).values_list('id', 'name'))
+    by_species = {}
+    for molecule_id, code in index.approved:
+        if molecule_id in names:
+            by_species.setdefault(code, set()).add(names[molecule_id])
+    return {code: tuple(sorted(by_species.get(code, ()))) or FALLBACK_ANTIBIOTICS for code in species_codes}
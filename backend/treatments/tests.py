@@ -0,0 +1,562 @@
+import datetime
+import json
+from io import StringIO
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from amu_monitoring.pagination import encode_cursor
+from amu_monitoring.users.models import User
+from amu_monitoring.users.tokens import issue_access_token
+from farms.models import Farm
+from reference_data.lookup import get_compliance_index
+from reference_data.models import AntimicrobialFamily, MRLLimit, Molecule, MoleculeSpecies, SpeciesGroup, Tissue
+from .assignment import MAX_PENDING_PER_VET, create_treatment, drain_district, fill_vet
+from .bulk import validate_rows
+from .compliance import ComplianceError, check_treatment
+from .models import Treatment, VetWorkload
+
+
+def make_user(email, role='farmer', district='North'):
+    return User.objects.create(
+        first_name=role.title(), last_name=email.split('@')[0], email_address=email,
+        password='unused', role=role, state='State', district=district,
+    )
+
+
+def make_farm(owner, district='North', species_type='BOV'):
+    return Farm.objects.create(
+        user=owner, name=f'{owner.last_name} farm', state='State', district=district, farm_number='F-1',
+        farm_type='commercial', species_type=species_type, total_animals=40, avg_weight=500,
+        avg_feed_consumption=15, avg_water_consumption=40,
+    )
+
+
+def make_treatment(farm, vet=None, status='pending', **fields):
+    fields.setdefault('date', datetime.date(2024, 5, 1))
+    fields.setdefault('antibiotic_name', 'Amoxicillin')
+    return Treatment.objects.create(
+        farm=farm, vet=vet, status=status,
+        reason='treat_disease', treated_for='enteric', **fields,
+    )
+
+
+class CounterAssertions:
+    def pending_count(self, vet):
+        return VetWorkload.objects.get(vet=vet).pending_count
+
+    def assertCountersReconcile(self):
+        """reconcile_vet_workload finds nothing to fix."""
+        out = StringIO()
+        call_command('reconcile_vet_workload', '--dry-run', stdout=out)
+        self.assertIn('0 drifted, 0 missing counters', out.getvalue())
+
+
+class VetWorkloadCounterTests(CounterAssertions, TestCase):
+    def setUp(self):
+        self.vet = make_user('vet@example.com', 'vet')
+        self.other_vet = make_user('other-vet@example.com', 'vet')
+        self.farm = make_farm(make_user('farmer@example.com'))
+
+    def test_create_counts_pending_treatment(self):
+        make_treatment(self.farm, self.vet)
+        make_treatment(self.farm, self.vet, status='approved')
+        self.assertEqual(self.pending_count(self.vet), 1)
+        self.assertCountersReconcile()
+
+    def test_approve_and_reject_release_the_slot(self):
+        approved = make_treatment(self.farm, self.vet)
+        rejected = make_treatment(self.farm, self.vet)
+        for treatment, status in ((approved, 'approved'), (rejected, 'rejected')):
+            treatment = Treatment.objects.get(pk=treatment.pk)
+            treatment.status = status
+            treatment.save()
+        self.assertEqual(self.pending_count(self.vet), 0)
+        self.assertCountersReconcile()
+
+    def test_reassign_moves_the_count(self):
+        treatment = Treatment.objects.get(pk=make_treatment(self.farm, self.vet).pk)
+        treatment.vet = self.other_vet
+        treatment.save()
+        self.assertEqual(self.pending_count(self.vet), 0)
+        self.assertEqual(self.pending_count(self.other_vet), 1)
+        self.assertCountersReconcile()
+
+    def test_delete_releases_the_slot(self):
+        make_treatment(self.farm, self.vet)
+        Treatment.objects.get(farm=self.farm).delete()
+        self.assertEqual(self.pending_count(self.vet), 0)
+        self.assertCountersReconcile()
+
+    def test_instances_loaded_without_status_or_vet(self):
+        first = make_treatment(self.farm, self.vet)
+        second = make_treatment(self.farm, self.vet)
+
+        treatment = Treatment.objects.only('id', 'status').get(pk=first.pk)
+        treatment.status = 'approved'
+        treatment.save()
+        treatment = Treatment.objects.only('id', 'vet').get(pk=second.pk)
+        treatment.vet = self.other_vet
+        treatment.save()
+        self.assertEqual(self.pending_count(self.vet), 0)
+        self.assertEqual(self.pending_count(self.other_vet), 1)
+
+        Treatment.objects.only('id').get(pk=second.pk).delete()
+        self.assertEqual(self.pending_count(self.other_vet), 0)
+        self.assertCountersReconcile()
+
+    def test_hand_built_instance(self):
+        stored = make_treatment(self.farm, self.vet)
+        treatment = Treatment(
+            pk=stored.pk, farm=self.farm, vet=self.vet, status='approved', antibiotic_name='Amoxicillin',
+            reason='treat_disease', treated_for='enteric', date=stored.date, created_at=stored.created_at,
+        )
+        treatment.save()
+        self.assertEqual(self.pending_count(self.vet), 0)
+        self.assertCountersReconcile()
+
+    def test_save_with_update_fields(self):
+        treatment = Treatment.objects.get(pk=make_treatment(self.farm, self.vet).pk)
+        treatment.vet = self.other_vet
+        treatment.status = 'approved'
+        treatment.save(update_fields=['vet'])
+        self.assertEqual(self.pending_count(self.vet), 0)
+        self.assertEqual(self.pending_count(self.other_vet), 1)
+        self.assertCountersReconcile()
+
+    def test_role_change_to_vet_creates_counter(self):
+        user = make_user('new-vet@example.com')
+        make_treatment(self.farm, user)
+        VetWorkload.objects.filter(vet=user).delete()
+
+        user.role = 'vet'
+        user.save()
+        self.assertEqual(self.pending_count(user), 1)
+        user.save()
+        self.assertEqual(VetWorkload.objects.filter(vet=user).count(), 1)
+        self.assertCountersReconcile()
+
+
+class TreatmentListPaginationTests(TestCase):
+    def setUp(self):
+        self.farmer = make_user('farmer@example.com')
+        farm = make_farm(self.farmer)
+        # Several treatments share a date, so pages must break ties on id
+        for day in (1, 1, 1, 2, 2, 3, 3):
+            make_treatment(farm, date=datetime.date(2024, 5, day))
+        self.expected = list(Treatment.objects.order_by('-date', '-id').values_list('id', flat=True))
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {issue_access_token(self.farmer)}'}
+
+    def get(self, **params):
+        return self.client.get('/api/treatments/', params, **self.auth)
+
+    def test_pages_follow_date_then_id(self):
+        for page_size in (1, 2, 3, 7):
+            seen, cursor = [], None
+            while True:
+                params = {'page_size': page_size}
+                if cursor:
+                    params['cursor'] = cursor
+                page = self.get(**params).json()
+                self.assertLessEqual(len(page['results']), page_size)
+                seen += [treatment['id'] for treatment in page['results']]
+                cursor = page['next_cursor']
+                if cursor is None:
+                    break
+            with self.subTest(page_size=page_size):
+                self.assertEqual(seen, self.expected)
+
+    def test_cursor_inside_a_day(self):
+        last = Treatment.objects.get(pk=self.expected[3])
+        page = self.get(cursor=encode_cursor([last.date, last.id])).json()
+        self.assertEqual([treatment['id'] for treatment in page['results']], self.expected[4:])
+
+    def test_bad_cursors_are_rejected(self):
+        for values in ([{}, []], ['2024-05-01'], ['not a date', 1], ['2024-05-01', 'x'], [20240501, 1]):
+            with self.subTest(values=values):
+                response = self.get(cursor=encode_cursor(values))
+                self.assertEqual(response.status_code, 400)
+
+
+class ExportAccessTests(TestCase):
+    URLS = ('/api/treatments/export/', '/api/farms/export/')
+
+    def setUp(self):
+        self.regulator = make_user('regulator@example.com', 'regulator')
+        self.farmer = make_user('farmer@example.com')
+        make_treatment(make_farm(self.farmer))
+
+    def get(self, url, user=None, **params):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {issue_access_token(user)}'} if user else {}
+        return self.client.get(url, params, **headers)
+
+    def test_requires_a_token(self):
+        for url in self.URLS:
+            with self.subTest(url=url):
+                self.assertEqual(self.get(url).status_code, 401)
+                # The legacy ?email= identification is not accepted
+                self.assertEqual(self.get(url, email=self.regulator.email_address).status_code, 401)
+
+    def test_requires_the_regulator_role(self):
+        for url in self.URLS:
+            with self.subTest(url=url):
+                response = self.get(url, self.farmer)
+                self.assertEqual(response.status_code, 403)
+                self.assertFalse(response.streaming)
+
+    def test_regulator_gets_the_export(self):
+        for url in self.URLS:
+            with self.subTest(url=url):
+                response = self.get(url, self.regulator)
+                self.assertEqual(response.status_code, 200)
+                rows = b''.join(response.streaming_content).splitlines()
+                self.assertEqual(len(rows), 1)
+
+
+class TreatmentQuantityTests(TestCase):
+    def setUp(self):
+        self.farm = make_farm(make_user('farmer@example.com'))
+
+    def post(self, url='/api/treatments/', **fields):
+        data = {
+            'farm': self.farm.id, 'antibiotic_name': 'Amoxicillin', 'reason': 'treat_disease',
+            'treated_for': 'enteric', 'date': '2024-05-01', **fields,
+        }
+        if url.endswith('bulk/'):
+            data = [data]
+        return self.client.post(url, json.dumps(data), content_type='application/json')
+
+    def test_valid_quantities(self):
+        for url in ('/api/treatments/', '/api/treatments/bulk/'):
+            for fields, expected in (({}, None), ({'quantity_mg': None}, None), ({'quantity_mg': ''}, None),
+                                     ({'quantity_mg': 0}, 0.0), ({'quantity_mg': '12.5'}, 12.5)):
+                with self.subTest(url=url, fields=fields):
+                    response = self.post(url, **fields)
+                    self.assertEqual(response.status_code, 201)
+                    self.assertEqual(Treatment.objects.latest('id').quantity_mg, expected)
+
+    def test_invalid_quantities_are_rejected(self):
+        for url in ('/api/treatments/', '/api/treatments/bulk/'):
+            for quantity in (-1, '-0.5', 'ten', 'nan', True, [5]):
+                with self.subTest(url=url, quantity=quantity):
+                    response = self.post(url, quantity_mg=quantity)
+                    self.assertEqual(response.status_code, 400)
+        self.assertFalse(Treatment.objects.exists())
+
+
+def log_treatment(farm):
+    return create_treatment(farm, {
+        'antibiotic_name': 'Amoxicillin', 'reason': 'treat_disease', 'treated_for': 'enteric', 'date': '2024-05-01',
+    })
+
+
+class VetAssignmentTests(CounterAssertions, TestCase):
+    def setUp(self):
+        self.farm = make_farm(make_user('farmer@example.com'))
+        self.vets = [make_user(f'vet{i}@example.com', 'vet') for i in range(3)]
+
+    def test_spreads_work_across_the_district(self):
+        assigned = [log_treatment(self.farm).vet_id for _ in range(6)]
+        # Least loaded first, lowest id breaking ties
+        self.assertEqual(assigned, [vet.id for vet in self.vets] * 2)
+        self.assertCountersReconcile()
+
+    def test_prefers_the_least_loaded_vet(self):
+        for _ in range(3):
+            make_treatment(self.farm, self.vets[0])
+        make_treatment(self.farm, self.vets[1])
+        self.assertEqual(log_treatment(self.farm).vet_id, self.vets[2].id)
+        self.assertEqual(log_treatment(self.farm).vet_id, self.vets[1].id)
+
+    def test_full_vets_are_skipped(self):
+        for vet in self.vets[:2]:
+            for _ in range(MAX_PENDING_PER_VET):
+                make_treatment(self.farm, vet)
+        self.assertEqual(log_treatment(self.farm).vet_id, self.vets[2].id)
+
+    def test_queued_when_the_district_is_full(self):
+        for _ in range(MAX_PENDING_PER_VET * len(self.vets)):
+            log_treatment(self.farm)
+        treatment = log_treatment(self.farm)
+        self.assertIsNone(treatment.vet_id)
+        for vet in self.vets:
+            self.assertEqual(self.pending_count(vet), MAX_PENDING_PER_VET)
+        self.assertCountersReconcile()
+
+    def test_only_vets_in_the_farms_district(self):
+        other_farm = make_farm(make_user('south-farmer@example.com', district='South'), district='South')
+        self.assertIsNone(log_treatment(other_farm).vet_id)
+        south_vet = make_user('south-vet@example.com', 'vet', district='South')
+        self.assertEqual(log_treatment(other_farm).vet_id, south_vet.id)
+
+    def test_query_count_does_not_grow_with_the_district(self):
+        # The first one also loads the compliance index
+        log_treatment(self.farm)
+        with CaptureQueriesContext(connection) as few_vets:
+            log_treatment(self.farm)
+        for i in range(10):
+            make_user(f'extra-vet{i}@example.com', 'vet')
+        with CaptureQueriesContext(connection) as many_vets:
+            log_treatment(self.farm)
+        self.assertEqual(len(many_vets), len(few_vets))
+
+
+class QueueDrainTests(CounterAssertions, TestCase):
+    def setUp(self):
+        self.farmer = make_user('farmer@example.com')
+        self.farm = make_farm(self.farmer)
+        # Logged before any vet works the district, so all of them queue
+        self.queued = [log_treatment(self.farm) for _ in range(20)]
+
+    def unassigned(self):
+        return Treatment.objects.filter(vet__isnull=True, status='pending')
+
+    def test_fill_vet_takes_the_oldest_up_to_the_cap(self):
+        vet = make_user('vet@example.com', 'vet')
+        self.assertEqual(fill_vet(vet), MAX_PENDING_PER_VET)
+        assigned = Treatment.objects.filter(vet=vet).order_by('id').values_list('id', flat=True)
+        self.assertEqual(list(assigned), [t.id for t in self.queued[:MAX_PENDING_PER_VET]])
+        # Already full
+        self.assertEqual(fill_vet(vet), 0)
+        self.assertCountersReconcile()
+
+    def test_decision_tops_the_vet_back_up(self):
+        vet = make_user('vet@example.com', 'vet')
+        fill_vet(vet)
+        treatment = Treatment.objects.filter(vet=vet).first()
+        response = self.client.post(
+            f'/api/treatments/{treatment.id}/action/', json.dumps({'action': 'approve'}), content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.pending_count(vet), MAX_PENDING_PER_VET)
+        self.assertEqual(self.unassigned().count(), 20 - MAX_PENDING_PER_VET - 1)
+        self.assertCountersReconcile()
+
+    def test_redeciding_leaves_the_queue_alone(self):
+        vet = make_user('vet@example.com', 'vet')
+        treatment = make_treatment(self.farm, vet, status='approved')
+        with mock.patch('treatments.views.fill_vet') as fill:
+            for action in ('approve', 'reject'):
+                response = self.client.post(
+                    f'/api/treatments/{treatment.id}/action/', json.dumps({'action': action}),
+                    content_type='application/json',
+                )
+                self.assertEqual(response.status_code, 200)
+        fill.assert_not_called()
+        self.assertEqual(self.unassigned().count(), 20)
+        self.assertCountersReconcile()
+
+    def test_drain_spreads_the_backlog(self):
+        vets = [make_user(f'vet{i}@example.com', 'vet') for i in range(2)]
+        make_treatment(self.farm, vets[0])
+        other_farm = make_farm(make_user('south-farmer@example.com', district='South'), district='South')
+        log_treatment(other_farm)
+
+        out = StringIO()
+        call_command('drain_treatment_queue', '--batch-size', '3', stdout=out)
+        self.assertIn(f'Assigned {2 * MAX_PENDING_PER_VET - 1} queued treatments', out.getvalue())
+        for vet in vets:
+            self.assertEqual(self.pending_count(vet), MAX_PENDING_PER_VET)
+        # The rest stay queued, oldest assigned first
+        left = list(self.unassigned().filter(farm=self.farm).order_by('id').values_list('id', flat=True))
+        self.assertEqual(left, [t.id for t in self.queued[2 * MAX_PENDING_PER_VET - 1:]])
+        # No vet in the South, so its treatment waits
+        self.assertTrue(self.unassigned().filter(farm=other_farm).exists())
+        self.assertCountersReconcile()
+
+    def test_drain_one_district(self):
+        make_user('vet@example.com', 'vet')
+        self.assertEqual(drain_district('South'), 0)
+        call_command('drain_treatment_queue', '--district', 'North', stdout=StringIO())
+        self.assertEqual(self.unassigned().count(), 20 - MAX_PENDING_PER_VET)
+
+
+class BulkCreateTests(CounterAssertions, TestCase):
+    URL = '/api/treatments/bulk/'
+
+    def setUp(self):
+        self.farmer = make_user('farmer@example.com')
+        self.farm = make_farm(self.farmer)
+        self.vets = [make_user(f'vet{i}@example.com', 'vet') for i in range(2)]
+
+    def row(self, **fields):
+        return {
+            'farm': self.farm.id, 'antibiotic_name': 'Amoxicillin', 'reason': 'treat_disease',
+            'treated_for': 'enteric', 'date': '2024-05-01', **fields,
+        }
+
+    def post(self, rows, query='', user=None):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {issue_access_token(user)}'} if user else {}
+        return self.client.post(self.URL + query, json.dumps(rows), content_type='application/json', **headers)
+
+    def test_all_valid_is_201(self):
+        response = self.post([self.row() for _ in range(3)])
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual((body['created'], body['invalid']), (3, 0))
+        ids = [result['id'] for result in body['results']]
+        self.assertEqual(sorted(ids), sorted(Treatment.objects.values_list('id', flat=True)))
+        # Dealt out least loaded first, as for single submissions
+        self.assertEqual([result['vet_id'] for result in body['results']], [self.vets[0].id, self.vets[1].id, self.vets[0].id])
+        self.assertCountersReconcile()
+
+    def test_partial_success_is_207(self):
+        response = self.post([self.row(), self.row(reason='boredom'), self.row(date='May 1st')])
+        self.assertEqual(response.status_code, 207)
+        body = response.json()
+        self.assertEqual((body['created'], body['invalid']), (1, 2))
+        self.assertEqual([result['status'] for result in body['results']], ['created', 'invalid', 'invalid'])
+        self.assertIn('reason', body['results'][1]['errors'])
+        self.assertIn('date', body['results'][2]['errors'])
+        self.assertEqual(Treatment.objects.count(), 1)
+
+    def test_nothing_valid_is_400(self):
+        response = self.post([self.row(farm=999999), 'not an object'])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['created'], 0)
+        self.assertEqual(response.json()['results'][1]['errors'], {'row': 'Must be an object'})
+
+    def test_atomic_rejects_the_whole_submission(self):
+        response = self.post([self.row(), self.row(antibiotic_name='')], '?atomic=true')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([result['status'] for result in response.json()['results']], ['not_created', 'invalid'])
+        self.assertFalse(Treatment.objects.exists())
+        self.assertEqual(self.post([self.row()], '?atomic=true').status_code, 201)
+
+    def test_malformed_submissions_are_400(self):
+        for body in ([], {'treatments': 'nope'}, 'just a string'):
+            with self.subTest(body=body):
+                self.assertEqual(self.post(body).status_code, 400)
+        with self.settings(BULK_TREATMENT_MAX_ROWS=2):
+            self.assertEqual(self.post([self.row()] * 3).status_code, 400)
+
+    def test_csv_upload(self):
+        csv_body = (
+            'farm,antibiotic_name,reason,treated_for,date,quantity_mg\n'
+            f'{self.farm.id},Amoxicillin,treat_disease,enteric,2024-05-01,250\n'
+            f'{self.farm.id},Amoxicillin,treat_disease,enteric,2024-05-02,\n'
+        )
+        response = self.client.post(self.URL, csv_body, content_type='text/csv')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(sorted(Treatment.objects.values_list('quantity_mg', flat=True), key=str), [250.0, None])
+
+    def test_query_count_does_not_grow_with_the_rows(self):
+        # Load the compliance index first
+        validate_rows([self.row()])
+        # The farms, and the catalogue version once for all the rows
+        with self.assertNumQueries(2):
+            valid, invalid = validate_rows([self.row() for _ in range(100)])
+        self.assertEqual((len(valid), invalid), (100, {}))
+
+        # The first submission also creates the rollup rows
+        self.post([self.row()])
+        with CaptureQueriesContext(connection) as one_row:
+            self.assertEqual(self.post([self.row()]).status_code, 201)
+        with self.assertNumQueries(len(one_row)):
+            self.assertEqual(self.post([self.row() for _ in range(20)]).status_code, 201)
+
+    def test_farmers_can_only_log_for_their_own_farms(self):
+        other_farm = make_farm(make_user('neighbour@example.com'))
+        response = self.post([self.row(), self.row(farm=other_farm.id)], user=self.farmer)
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.json()['results'][1]['errors'], {'farm': 'Farm not found'})
+
+
+class ComplianceTests(TestCase):
+    def setUp(self):
+        family = AntimicrobialFamily.objects.create(name='Penicillins')
+        self.amoxicillin = Molecule.objects.create(name='Amoxicillin', family=family)
+        colistin = Molecule.objects.create(name='Colistin', family=family)
+        cattle, pigs = SpeciesGroup.objects.create(code='BOV'), SpeciesGroup.objects.create(code='SUI')
+        MoleculeSpecies.objects.create(molecule=self.amoxicillin, species_group=cattle)
+        MoleculeSpecies.objects.create(molecule=colistin, species_group=pigs)
+        for tissue, mrl in (('Muscle', 0.05), ('Milk', 0.004)):
+            MRLLimit.objects.create(
+                molecule=self.amoxicillin, species_group=cattle, tissue=Tissue.objects.create(name=tissue), mrl_mgkg=mrl,
+            )
+        # 40 animals x 500 kg
+        self.farm = make_farm(make_user('farmer@example.com'))
+
+    def post(self, **fields):
+        data = {
+            'farm': self.farm.id, 'antibiotic_name': 'Amoxicillin', 'reason': 'treat_disease',
+            'treated_for': 'enteric', 'date': '2024-05-01', **fields,
+        }
+        return self.client.post('/api/treatments/', json.dumps(data), content_type='application/json')
+
+    def test_approved(self):
+        result = check_treatment('BOV', ' amoxicillin ')
+        self.assertEqual((result.molecule_id, result.approved, result.message), (self.amoxicillin.id, True, ''))
+        self.assertEqual(result.mrl_limits, (('Milk', 0.004), ('Muscle', 0.05)))
+
+    def test_enforce_rejects_unapproved(self):
+        for species, name in (('SUI', 'Amoxicillin'), ('BOV', 'Colistin'), ('BOV', 'Mystery drug')):
+            with self.subTest(species=species, name=name):
+                with self.assertRaises(ComplianceError) as raised:
+                    check_treatment(species, name, mode='enforce')
+                self.assertIs(raised.exception.result.approved, False)
+
+        response = self.post(antibiotic_name='Colistin')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'Colistin is not approved for species BOV')
+        self.assertFalse(Treatment.objects.exists())
+
+    def test_warn_accepts_and_reports(self):
+        result = check_treatment('SUI', 'Amoxicillin', mode='warn')
+        self.assertEqual((result.approved, result.message), (False, 'Amoxicillin is not approved for species SUI'))
+
+        with self.settings(TREATMENT_COMPLIANCE_CHECK='warn'):
+            response = self.post(antibiotic_name='Colistin')
+        self.assertEqual(response.status_code, 201)
+        self.assertIs(response.json()['compliance']['approved'], False)
+
+    def test_off_skips_the_check(self):
+        self.assertIsNone(check_treatment('BOV', 'Mystery drug', mode='off'))
+        with self.settings(TREATMENT_COMPLIANCE_CHECK='off'):
+            response = self.post(antibiotic_name='Colistin')
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('compliance', response.json())
+        # The molecule is linked either way
+        self.assertEqual(Treatment.objects.get().molecule_id, Molecule.objects.get(name='Colistin').id)
+
+    def test_unknown_mode_is_a_configuration_error(self):
+        with self.assertRaises(ImproperlyConfigured):
+            check_treatment('BOV', 'Amoxicillin', mode='strict')
+        with self.settings(TREATMENT_COMPLIANCE_CHECK='Enforce'):
+            with self.assertRaises(ImproperlyConfigured):
+                check_treatment('BOV', 'Amoxicillin')
+
+    def test_species_without_reference_data(self):
+        result = check_treatment('EQU', 'Amoxicillin', mode='enforce')
+        self.assertEqual((result.approved, result.message), (None, 'No reference data for species EQU'))
+        self.farm.species_type = 'EQU'
+        self.farm.save()
+        self.assertEqual(self.post().status_code, 201)
+
+    def test_dose_above_the_mrl(self):
+        self.assertEqual(check_treatment('BOV', 'Amoxicillin', dose_mgkg=0.004).mrl_exceeded, ())
+        result = check_treatment('BOV', 'Amoxicillin', mode='enforce', dose_mgkg=0.06)
+        self.assertEqual((result.approved, result.mrl_exceeded), (True, ('Milk', 'Muscle')))
+
+        # 100 mg over 20000 kg is 0.005 mg/kg: above the milk limit only
+        response = self.post(quantity_mg=100)
+        self.assertEqual(response.status_code, 201)
+        compliance = response.json()['compliance']
+        self.assertTrue(compliance['approved'])
+        self.assertEqual(
+            [(limit['tissue'], limit['exceeded']) for limit in compliance['mrl_limits']],
+            [('Milk', True), ('Muscle', False)],
+        )
+        self.assertIn('observe the withdrawal period', compliance['message'])
+
+    def test_one_index_lookup_per_request(self):
+        get_compliance_index()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.post().status_code, 201)
+        version_queries = [q for q in queries if 'catalogueversion' in q['sql']]
+        self.assertEqual(len(version_queries), 1)
+        self.assertEqual(Treatment.objects.get().molecule_id, self.amoxicillin.id)
@@ -1,7 +1,10 @@
 from django.urls import path
-from .views import TreatmentListCreateView, TreatmentActionView
+from .views import TreatmentListCreateView, TreatmentActionView, TreatmentExportView, TreatmentBulkCreateView, AsyncVetDashboardView
 
 urlpatterns = [
     path('', TreatmentListCreateView.as_view(), name='treatment-list-create'),
+    path('bulk/', TreatmentBulkCreateView.as_view(), name='treatment-bulk-create'),
+    path('vet-dashboard/async/', AsyncVetDashboardView.as_view(), name='vet-dashboard-async'),
+    path('export/', TreatmentExportView.as_view(), name='treatment-export'),
     path('<int:treatment_id>/action/', TreatmentActionView.as_view(), name='treatment-action'),
 ]
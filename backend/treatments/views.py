@@ -1,13 +1,27 @@
+from django.conf import settings
 from django.views import View
-from django.http import JsonResponse
+from django.db import transaction
+from amu_monitoring.responses import JsonResponse
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from .models import Treatment
 from farms.models import Farm
 import json
-from django.core.serializers.json import DjangoJSONEncoder
+import datetime
 from amu_monitoring.users.models import User
-from django.db.models import Count, Q
+from amu_monitoring.users.middleware import aresolve_user_id, resolve_user_id, role_required
+from .assignment import create_treatment, create_treatments, fill_vet, parse_quantity_mg
+from .bulk import parse_rows, validate_rows
+from .dashboard import vet_history, vet_pending
+from functools import partial
+from amu_monitoring.concurrency import run_concurrently
+from .compliance import ComplianceError, check_treatment, dose_per_kg
+from reference_data.lookup import get_compliance_index
+from amu_monitoring.pagination import InvalidCursor, paginate, wants_pagination
+from amu_monitoring.streaming import EXPORT_FORMATS, export_response
+
+# Newest first, id breaks ties between treatments on the same day
+TREATMENT_PAGE_KEYS = [('date', True), ('id', True)]
 
 @method_decorator(csrf_exempt, name='dispatch')
 class TreatmentListCreateView(View):
@@ -15,54 +29,41 @@ class TreatmentListCreateView(View):
         farm_id = request.GET.get('farm_id')
         email = request.GET.get('email')
         vet_email = request.GET.get('vet_email') # For vet dashboard
+        principal = request.principal
 
-        if not farm_id and not email and not vet_email:
+        if not farm_id and not email and not vet_email and principal is None:
             return JsonResponse({'error': 'Farm ID, Email or Vet Email required'}, status=400)
         
         try:
             if farm_id:
-                treatments = Treatment.objects.filter(farm_id=farm_id).order_by('-date').values()
-            elif vet_email:
+                treatments = Treatment.objects.filter(farm_id=farm_id).values()
+                if wants_pagination(request):
+                    return JsonResponse(paginate(treatments, request, TREATMENT_PAGE_KEYS), status=200)
+                return JsonResponse(list(treatments.order_by('-date')), safe=False, status=200)
+            elif vet_email or (not email and principal.role == 'vet'):
                 # For Vet Dashboard: Get assigned treatments
                 try:
-                    vet = User.objects.get(email_address=vet_email, role='vet')
-                    # Check for unassigned treatments in vet's district if vet has capacity
-                    # This is "Lazy Assignment" to pick up queued items
-                    active_count = Treatment.objects.filter(vet=vet, status='pending').count()
-                    if active_count < 7 and vet.district:
-                         # Find unassigned pending treatments in district
-                         unassigned = Treatment.objects.filter(
-                             farm__district=vet.district,
-                             vet__isnull=True,
-                             status='pending'
-                         ).first() # Just pick one
-                         
-                         if unassigned:
-                             unassigned.vet = vet
-                             unassigned.save()
-
-                    pending_treatments = Treatment.objects.filter(vet=vet, status='pending').order_by('date').values(
-                        'id', 'antibiotic_name', 'reason', 'treated_for', 'date', 
-                        'farm__name', 'farm__farm_number', 'farm__village', 'farm__district', 'status'
-                    )
-                    
-                    history_treatments = Treatment.objects.filter(vet=vet, status='approved').order_by('-date')[:10].values(
-                        'id', 'antibiotic_name', 'reason', 'treated_for', 'date', 
-                        'farm__name', 'farm__farm_number', 'farm__village', 'farm__district', 'status'
-                    )
-                    
+                    vet_id = resolve_user_id(request, vet_email, role='vet')
                     return JsonResponse({
-                        'pending': list(pending_treatments),
-                        'history': list(history_treatments)
+                        'pending': vet_pending(vet_id),
+                        'history': vet_history(vet_id)
                     }, status=200)
                 except User.DoesNotExist:
                      return JsonResponse({'error': 'Vet not found'}, status=404)
             else:
-                # Filter by user email (Farmer Dashboard)
-                treatments = Treatment.objects.filter(farm__user__email_address=email).order_by('-date').values(
+                # Filter by the farmer's farms (Farmer Dashboard)
+                if principal is not None:
+                    treatments = Treatment.objects.filter(farm__user_id=principal.id)
+                else:
+                    treatments = Treatment.objects.filter(farm__user__email_address=email)
+                treatments = treatments.values(
                     'id', 'antibiotic_name', 'reason', 'treated_for', 'date', 'farm__name', 'farm__farm_number', 'status'
                 )
-                return JsonResponse(list(treatments), safe=False, status=200)
+                if wants_pagination(request):
+                    return JsonResponse(paginate(treatments, request, TREATMENT_PAGE_KEYS), status=200)
+                return JsonResponse(list(treatments.order_by('-date')), safe=False, status=200)
+        except InvalidCursor as e:
+            return JsonResponse({'error': str(e)}, status=400)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
 
@@ -75,34 +76,93 @@ class TreatmentListCreateView(View):
                 return JsonResponse({'error': 'Farm ID required'}, status=400)
 
             farm = Farm.objects.get(id=farm_id)
-            
-            # Auto-assign vet
-            assigned_vet = None
-            if farm.district:
-                # Find vets in district with < 7 pending treatments
-                vets = User.objects.filter(role='vet', district=farm.district)
-                for vet in vets:
-                    pending_count = Treatment.objects.filter(vet=vet, status='pending').count()
-                    if pending_count < 7:
-                        assigned_vet = vet
-                        break
-            
-            treatment = Treatment.objects.create(
-                farm=farm,
-                vet=assigned_vet,
-                status='pending',
-                antibiotic_name=data.get('antibiotic_name'),
-                reason=data.get('reason'),
-                treated_for=data.get('treated_for'),
-                date=data.get('date')
+            # One index for the check and the molecule link
+            compliance_index = get_compliance_index()
+            compliance = check_treatment(
+                farm.species_type, data.get('antibiotic_name'), index=compliance_index,
+                dose_mgkg=dose_per_kg(farm, parse_quantity_mg(data.get('quantity_mg'))),
             )
             
-            return JsonResponse({'message': 'Treatment logged successfully', 'id': treatment.id}, status=201)
+            # Auto-assign the least-loaded vet in the farm's district
+            treatment = create_treatment(farm, data, compliance_index)
+            
+            response = {'message': 'Treatment logged successfully', 'id': treatment.id}
+            if compliance is not None:
+                response['compliance'] = compliance.as_dict()
+            return JsonResponse(response, status=201)
         except Farm.DoesNotExist:
             return JsonResponse({'error': 'Farm not found'}, status=404)
+        except ComplianceError as e:
+            return JsonResponse({'error': str(e), 'compliance': e.result.as_dict()}, status=400)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=400)
 
+class AsyncVetDashboardView(View):
+    """
+    Async version of the vet dashboard branch of TreatmentListCreateView.get
+    (same parameters and response). Run it under an ASGI server: the pending
+    and history queries go out at the same time.
+    """
+
+    async def get(self, request):
+        vet_email = request.GET.get('vet_email')
+        if not vet_email and request.principal is None:
+            return JsonResponse({'error': 'Vet Email required'}, status=400)
+
+        try:
+            vet_id = await aresolve_user_id(request, vet_email, role='vet')
+            pending, history = await run_concurrently(partial(vet_pending, vet_id), partial(vet_history, vet_id))
+            return JsonResponse({'pending': pending, 'history': history}, status=200)
+        except User.DoesNotExist:
+            return JsonResponse({'error': 'Vet not found'}, status=404)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+
+@method_decorator(csrf_exempt, name='dispatch')
+class TreatmentBulkCreateView(View):
+    """
+    Log many treatments in one request. Returns one result per submitted row,
+    in order. Valid rows are inserted even if others fail unless ?atomic=true,
+    in which case any invalid row rejects the whole submission.
+    """
+
+    def post(self, request):
+        try:
+            rows = parse_rows(request)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        if not rows:
+            return JsonResponse({'error': 'No treatments submitted'}, status=400)
+        if len(rows) > settings.BULK_TREATMENT_MAX_ROWS:
+            return JsonResponse({'error': f'At most {settings.BULK_TREATMENT_MAX_ROWS} treatments per request'}, status=400)
+
+        try:
+            principal = request.principal
+            owner_id = principal.id if principal is not None and principal.role == 'farmer' else None
+            # One index for validating and linking every row
+            compliance_index = get_compliance_index()
+            valid, invalid = validate_rows(rows, owner_id, compliance_index)
+
+            results = [None] * len(rows)
+            for index, errors in invalid.items():
+                results[index] = {'row': index, 'status': 'invalid', 'errors': errors}
+            atomic = request.GET.get('atomic', '').lower() in ('1', 'true', 'yes')
+            if valid and not (atomic and invalid):
+                treatments = create_treatments([(farm, data) for _, farm, data, _ in valid], compliance_index)
+                for (index, _, _, compliance), treatment in zip(valid, treatments):
+                    results[index] = {'row': index, 'status': 'created', 'id': treatment.id, 'vet_id': treatment.vet_id}
+                    if compliance is not None:
+                        results[index]['compliance'] = compliance.as_dict()
+            else:
+                for index, _, _, _ in valid:
+                    results[index] = {'row': index, 'status': 'not_created'}
+
+            created = len(rows) - len(invalid) if valid and not (atomic and invalid) else 0
+            status = 201 if not invalid else (207 if created else 400)
+            return JsonResponse({'created': created, 'invalid': len(invalid), 'results': results}, status=status)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+
 @method_decorator(csrf_exempt, name='dispatch')
 class TreatmentActionView(View):
     def post(self, request, treatment_id):
@@ -113,17 +173,55 @@ class TreatmentActionView(View):
             if action not in ['approve', 'reject']:
                  return JsonResponse({'error': 'Invalid action'}, status=400)
 
-            treatment = Treatment.objects.get(id=treatment_id)
-            
-            if action == 'approve':
-                treatment.status = 'approved'
-            elif action == 'reject':
-                treatment.status = 'rejected'
-            
-            treatment.save()
+            # Lock the row so two concurrent decisions can't both release the
+            # vet's pending slot
+            with transaction.atomic():
+                treatment = Treatment.objects.select_for_update().get(id=treatment_id)
+                # Only a pending treatment holds one of its vet's slots
+                releases_slot = treatment.status == 'pending' and treatment.vet_id is not None
+
+                if action == 'approve':
+                    treatment.status = 'approved'
+                elif action == 'reject':
+                    treatment.status = 'rejected'
+                
+                treatment.save()
+
+            # The decision frees a slot, so top the vet back up from the
+            # district queue. Re-deciding a decided treatment frees nothing.
+            if releases_slot:
+                fill_vet(treatment.vet)
             return JsonResponse({'message': f'Treatment {action}d successfully'}, status=200)
 
         except Treatment.DoesNotExist:
             return JsonResponse({'error': 'Treatment not found'}, status=404)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
+
+@method_decorator(role_required('regulator'), name='dispatch')
+class TreatmentExportView(View):
+    EXPORT_FIELDS = (
+        'id', 'farm_id', 'farm__name', 'farm__farm_number', 'farm__state', 'farm__district',
+        'farm__species_type', 'vet_id', 'status', 'antibiotic_name', 'molecule_id', 'reason', 'treated_for',
+        'date', 'quantity_mg', 'created_at'
+    )
+
+    def get(self, request):
+        fmt = request.GET.get('format', 'ndjson')
+        if fmt not in EXPORT_FORMATS:
+            return JsonResponse({'error': f"format must be one of {', '.join(EXPORT_FORMATS)}"}, status=400)
+
+        filters = {}
+        if request.GET.get('state'): filters['farm__state'] = request.GET['state']
+        if request.GET.get('district'): filters['farm__district'] = request.GET['district']
+        if request.GET.get('status'): filters['status'] = request.GET['status']
+        try:
+            # Validate up front: the query only runs once streaming has started
+            if request.GET.get('date_from'): filters['date__gte'] = datetime.date.fromisoformat(request.GET['date_from'])
+            if request.GET.get('date_to'): filters['date__lte'] = datetime.date.fromisoformat(request.GET['date_to'])
+            if request.GET.get('farm_id'): filters['farm_id'] = int(request.GET['farm_id'])
+        except ValueError:
+            return JsonResponse({'error': 'Invalid farm_id, date_from or date_to'}, status=400)
+
+        treatments = Treatment.objects.filter(**filters).order_by('id').values(*self.EXPORT_FIELDS)
+        return export_response(treatments, fmt, 'treatments')
@@ -65,7 +65,8 @@ function AddFarm() {
         const response = await fetch('http://localhost:8000/api/farms/', {
             method: 'POST',
             headers: {
-                'Content-Type': 'application/json'
+                'Content-Type': 'application/json',
+                Authorization: `Bearer ${user.token}`
             },
             body: JSON.stringify({
                 ...formData,
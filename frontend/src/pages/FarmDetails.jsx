@@ -17,17 +17,23 @@ const speciesMapping = {
 function FarmDetails() {
   const navigate = useNavigate()
   const { id } = useParams()
+  const user = JSON.parse(localStorage.getItem('user'))
   const [farm, setFarm] = useState(null)
   const [loading, setLoading] = useState(true)
   const [activeTreatments, setActiveTreatments] = useState([]) // Placeholder for active treatments
+  const [nextCursor, setNextCursor] = useState(null)
+  const [loadingMore, setLoadingMore] = useState(false)
 
   useEffect(() => {
     const fetchFarm = async () => {
       try {
-        const response = await fetch(`http://localhost:8000/api/farms/${id}/`)
+        // The farm and its treatments come back together from the dashboard endpoint
+        const response = await fetch(`http://localhost:8000/api/dashboard/?email=${user.email}&farm_id=${id}`, { headers: { Authorization: `Bearer ${user.token}` } })
         if (response.ok) {
           const data = await response.json()
-          setFarm(data)
+          setFarm(data.farms[0])
+          setActiveTreatments(data.treatments)
+          setNextCursor(data.treatments_next_cursor)
         } else {
             alert('Failed to fetch farm details')
             navigate('/farmer-dashboard')
@@ -39,23 +45,28 @@ function FarmDetails() {
         setLoading(false)
       }
     }
-    
-    const fetchTreatments = async () => {
-        try {
-            const response = await fetch(`http://localhost:8000/api/treatments/?farm_id=${id}`)
-            if (response.ok) {
-                const data = await response.json()
-                setActiveTreatments(data)
-            }
-        } catch (error) {
-            console.error('Error fetching treatments:', error)
-        }
-    }
 
     fetchFarm()
-    fetchTreatments()
   }, [id, navigate])
 
+  // Only the most recent treatments come with the farm; page in the rest of
+  // its history from the treatment list
+  const loadMoreTreatments = async () => {
+    setLoadingMore(true)
+    try {
+      const response = await fetch(`http://localhost:8000/api/treatments/?farm_id=${id}&cursor=${nextCursor}`, { headers: { Authorization: `Bearer ${user.token}` } })
+      if (response.ok) {
+        const data = await response.json()
+        setActiveTreatments(treatments => [...treatments, ...data.results])
+        setNextCursor(data.next_cursor)
+      }
+    } catch (error) {
+      console.error('Error fetching treatments:', error)
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   if (loading) return <div className="p-6">Loading...</div>
   if (!farm) return <div className="p-6">Farm not found</div>
 
@@ -123,9 +134,10 @@ function FarmDetails() {
         <div className="border-t border-gray-200 px-4 py-5 sm:px-6">
             <h3 className="text-lg leading-6 font-medium text-gray-900 mb-4">Active Treatments</h3>
             {activeTreatments.length > 0 ? (
+                <>
                 <ul className="divide-y divide-gray-200">
-                    {activeTreatments.map((treatment, index) => (
-                        <li key={index} className="py-4">
+                    {activeTreatments.map((treatment) => (
+                        <li key={treatment.id} className="py-4">
                             <div className="flex justify-between">
                                 <div>
                                     <p className="text-sm font-medium text-gray-900 capitalize">{treatment.antibiotic_name}</p>
@@ -136,6 +148,18 @@ function FarmDetails() {
                         </li>
                     ))}
                 </ul>
+                {nextCursor && (
+                    <div className="pt-4 text-center">
+                        <button
+                            onClick={loadMoreTreatments}
+                            disabled={loadingMore}
+                            className="text-sm font-semibold text-primary-600 hover:text-primary-500 disabled:opacity-50"
+                        >
+                            {loadingMore ? 'Loading...' : 'Load older treatments'}
+                        </button>
+                    </div>
+                )}
+                </>
             ) : (
                 <div className="text-center py-8 bg-gray-50 rounded-lg border-2 border-dashed border-gray-300">
                     <svg className="mx-auto h-12 w-12 text-gray-400" fill="none" viewBox="0 0 24 24" stroke="currentColor" aria-hidden="true">
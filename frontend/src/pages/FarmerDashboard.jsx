@@ -17,6 +17,8 @@ const speciesMapping = {
 function FarmerDashboard() {
   const [farms, setFarms] = useState([])
   const [activeTreatments, setActiveTreatments] = useState([])
+  const [nextCursor, setNextCursor] = useState(null)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [loading, setLoading] = useState(true)
   const navigate = useNavigate()
   const user = JSON.parse(localStorage.getItem('user'))
@@ -27,38 +29,44 @@ function FarmerDashboard() {
       return
     }
 
-    const fetchFarms = async () => {
+    const fetchData = async () => {
       try {
-        const response = await fetch(`http://localhost:8000/api/farms/?email=${user.email}`)
+        // Farms, per-farm counts and recent treatments in one round trip
+        const response = await fetch(`http://localhost:8000/api/dashboard/?email=${user.email}`, { headers: { Authorization: `Bearer ${user.token}` } })
         if (response.ok) {
           const data = await response.json()
-          setFarms(data)
+          setFarms(data.farms)
+          setActiveTreatments(data.treatments)
+          setNextCursor(data.treatments_next_cursor)
         }
       } catch (error) {
-        console.error('Error fetching farms:', error)
-      }
-    }
-
-    const fetchTreatments = async () => {
-        try {
-            const response = await fetch(`http://localhost:8000/api/treatments/?email=${user.email}`)
-            if (response.ok) {
-                const data = await response.json()
-                setActiveTreatments(data)
-            }
-        } catch (error) {
-            console.error('Error fetching treatments:', error)
-        }
-    }
-
-    const fetchData = async () => {
-        await Promise.all([fetchFarms(), fetchTreatments()])
+        console.error('Error fetching dashboard:', error)
+      } finally {
         setLoading(false)
+      }
     }
 
     fetchData()
   }, [navigate, user?.email, user?.role])
 
+  // The dashboard only carries the most recent treatments; older ones are
+  // paged in from the treatment list, starting where the dashboard stopped
+  const loadMoreTreatments = async () => {
+    setLoadingMore(true)
+    try {
+      const response = await fetch(`http://localhost:8000/api/treatments/?email=${user.email}&cursor=${nextCursor}`, { headers: { Authorization: `Bearer ${user.token}` } })
+      if (response.ok) {
+        const data = await response.json()
+        setActiveTreatments(treatments => [...treatments, ...data.results])
+        setNextCursor(data.next_cursor)
+      }
+    } catch (error) {
+      console.error('Error fetching treatments:', error)
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   const handleLogout = () => {
     localStorage.removeItem('user')
     navigate('/')
@@ -176,6 +184,17 @@ function FarmerDashboard() {
                         ))}
                     </tbody>
                     </table>
+                    {nextCursor && (
+                        <div className="border-t border-gray-200 bg-gray-50 px-4 py-3 text-center">
+                            <button
+                                onClick={loadMoreTreatments}
+                                disabled={loadingMore}
+                                className="text-sm font-semibold text-primary-600 hover:text-primary-500 disabled:opacity-50"
+                            >
+                                {loadingMore ? 'Loading...' : 'Load older treatments'}
+                            </button>
+                        </div>
+                    )}
                 </div>
             ) : (
                 <p className="text-sm text-gray-500">No active treatments found.</p>
@@ -11,6 +11,7 @@ function LogTreatment() {
     antibiotic_name: '',
     reason: '',
     treated_for: '',
+    quantity_mg: '',
     date: new Date().toISOString().split('T')[0]
   })
   const [loading, setLoading] = useState(true)
@@ -23,7 +24,7 @@ function LogTreatment() {
 
     const fetchFarms = async () => {
       try {
-        const response = await fetch(`http://localhost:8000/api/farms/?email=${user.email}`)
+        const response = await fetch(`http://localhost:8000/api/farms/?email=${user.email}&paginate=false`, { headers: { Authorization: `Bearer ${user.token}` } })
         if (response.ok) {
           const data = await response.json()
           setFarms(data)
@@ -188,6 +189,22 @@ function LogTreatment() {
               </select>
             </div>
 
+            <div>
+              <label htmlFor="quantity_mg" className="block text-sm font-medium text-gray-700">
+                Total Quantity Administered (mg of active substance)
+              </label>
+              <input
+                id="quantity_mg"
+                name="quantity_mg"
+                type="number"
+                min="0"
+                step="any"
+                className="relative block w-full appearance-none rounded-md border border-gray-300 px-3 py-2 text-gray-900 placeholder-gray-500 focus:z-10 focus:border-primary-500 focus:outline-none focus:ring-primary-500 sm:text-sm"
+                value={formData.quantity_mg}
+                onChange={handleChange}
+              />
+            </div>
+
              <div>
               <label htmlFor="date" className="block text-sm font-medium text-gray-700">
                 Date
@@ -66,6 +66,7 @@ function Login() {
           email: data.email,
           role: data.role,
           token: data.token,
+          refresh_token: data.refresh_token,
           profile_completed: data.profile_completed,
           profile: data.profile
         }))
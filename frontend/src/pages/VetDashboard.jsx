@@ -62,7 +62,7 @@ function VetDashboard() {
 
     const fetchPendingTreatments = async () => {
         try {
-            const response = await fetch(`http://localhost:8000/api/treatments/?vet_email=${user.email}`)
+            const response = await fetch(`http://localhost:8000/api/treatments/?vet_email=${user.email}`, { headers: { Authorization: `Bearer ${user.token}` } })
             if (response.ok) {
                 const data = await response.json()
                 setPendingTreatments(data.pending)
@@ -93,6 +93,7 @@ function VetDashboard() {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
+                Authorization: `Bearer ${user.token}`,
             },
             body: JSON.stringify({
                 email: user.email,
@@ -105,6 +106,7 @@ function VetDashboard() {
             // Update local storage
             const updatedUser = {
                 ...user,
+                token: data.token || user.token,
                 profile_completed: true,
                 profile: data.user
             }